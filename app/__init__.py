@@ -9,6 +9,9 @@ from .core.interfaces import IFlaskAppFactory, IConfigProvider, ILogger
 from .core.container import container
 from .routes import _webhook_routes, api_routes, conta_azul_routes
 from .cli.sync_commands import sync_cli
+from .cli.auth_commands import conta_azul_cli
+from .cli.cnpj_commands import cnpj_cli
+from .cli.digisac_commands import digisac_cli
 
 
 class FlaskAppFactory(IFlaskAppFactory):
@@ -69,6 +72,9 @@ class FlaskAppFactory(IFlaskAppFactory):
     def _register_cli_commands(self, app: Flask) -> None:
         """Register CLI commands"""
         app.cli.add_command(sync_cli)
+        app.cli.add_command(conta_azul_cli)
+        app.cli.add_command(cnpj_cli)
+        app.cli.add_command(digisac_cli)
 
     def _validate_configuration(self, app: Flask) -> None:
         """Validate configuration after app creation"""
@@ -0,0 +1,47 @@
+# app/cli/auth_commands.py
+import json
+
+import click
+from flask.cli import AppGroup
+
+from app.services.conta_azul.auth_runner import (
+    AUTH_RUNNER_HOST,
+    AUTH_RUNNER_PORT,
+    CHROME_PROFILE_DIR,
+    AuthRunnerClient,
+    AuthRunnerServer,
+    AuthRunnerUnavailable,
+)
+
+conta_azul_cli = AppGroup("conta-azul")
+
+
+@conta_azul_cli.command("auth-runner")
+@click.option("--host", default=AUTH_RUNNER_HOST, show_default=True)
+@click.option("--port", default=AUTH_RUNNER_PORT, show_default=True)
+@click.option(
+    "--profile-dir",
+    default=CHROME_PROFILE_DIR,
+    show_default=True,
+    help="Perfil persistente do Chrome usado na autenticação",
+)
+def auth_runner(host, port, profile_dir):
+    """Processo dedicado que abre o navegador para autenticar na Conta Azul"""
+    server = AuthRunnerServer(address=(host, port), profile_dir=profile_dir)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+        click.echo("Auth runner encerrado")
+
+
+@conta_azul_cli.command("auth-runner-status")
+@click.option("--host", default=AUTH_RUNNER_HOST, show_default=True)
+@click.option("--port", default=AUTH_RUNNER_PORT, show_default=True)
+def auth_runner_status(host, port):
+    """Verifica se o auth runner está no ar e mostra suas métricas"""
+    try:
+        response = AuthRunnerClient(address=(host, port)).ping()
+    except (AuthRunnerUnavailable, TimeoutError) as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(response.get("stats", {}), indent=2))
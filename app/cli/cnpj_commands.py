@@ -0,0 +1,74 @@
+# app/cli/cnpj_commands.py
+import os
+
+import click
+from flask.cli import AppGroup
+
+from app.services.bitrix24.cnpj_enrichment import (
+    CNPJEnrichmentJob,
+    iter_bitrix_companies,
+    read_companies_csv,
+)
+
+cnpj_cli = AppGroup("cnpj")
+
+
+def _echo_progress(report):
+    click.echo(
+        f"⏳ {report['processed']} processadas | {report['updated']} atualizadas | "
+        f"{report['failed']} falhas | {report['not_found']} sem dados | "
+        f"{report['invalid']} inválidas | cache {report['from_cache']} / "
+        f"API {report['from_api']} | {report['companies_per_minute']}/min"
+    )
+
+
+@cnpj_cli.command("enrich")
+@click.option(
+    "--csv",
+    "csv_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV com colunas de ID da empresa (company_id/idEmpresa/id) e CNPJ",
+)
+@click.option(
+    "--from-bitrix",
+    is_flag=True,
+    help="Lista as empresas com CNPJ direto do Bitrix",
+)
+@click.option(
+    "--include-validated",
+    is_flag=True,
+    help="Com --from-bitrix, inclui empresas já marcadas como validadas",
+)
+@click.option(
+    "--run-name",
+    default=None,
+    help="Nome da execução para retomar (padrão: nome do CSV ou 'bitrix')",
+)
+@click.option("--restart", is_flag=True, help="Descarta o progresso salvo da execução")
+@click.option("--batch-size", default=50, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Busca e transforma, mas não grava")
+def enrich(
+    csv_path, from_bitrix, include_validated, run_name, restart, batch_size, dry_run
+):
+    """Enriquece empresas do Bitrix com os dados da Receita em massa"""
+    if bool(csv_path) == from_bitrix:
+        raise click.UsageError("Informe exatamente uma origem: --csv ou --from-bitrix")
+
+    if csv_path:
+        companies = read_companies_csv(csv_path)
+        run_name = run_name or os.path.splitext(os.path.basename(csv_path))[0]
+    else:
+        companies = iter_bitrix_companies(include_validated=include_validated)
+        run_name = run_name or "bitrix"
+
+    job = CNPJEnrichmentJob(run_name, batch_size=batch_size, dry_run=dry_run)
+    if restart:
+        job.progress.reset()
+
+    click.echo(f"🔎 Enriquecimento de CNPJ '{run_name}'")
+    report = job.run(companies, on_progress=_echo_progress)
+    click.echo(
+        f"✅ Concluído em {report['elapsed_seconds']}s "
+        f"({report['skipped']} puladas: já concluídas ou repetidas)"
+    )
+    click.echo(f"Progresso salvo: {job.progress.summary()}")
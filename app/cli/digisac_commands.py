@@ -0,0 +1,45 @@
+# app/cli/digisac_commands.py
+import click
+from flask.cli import AppGroup
+
+from app.database.dead_letters import (
+    delete_dead_letter,
+    get_dead_letter,
+    list_dead_letters,
+)
+from app.services.digisac.dispatcher import DigisacDispatcher
+
+digisac_cli = AppGroup("digisac")
+
+
+@digisac_cli.command("dead-letters")
+@click.option("--limit", default=50, show_default=True)
+def dead_letters(limit):
+    """Lista os envios ao Digisac que esgotaram as tentativas"""
+    entries = list_dead_letters(limit)
+    if not entries:
+        click.echo("✅ Nenhum envio pendente na dead-letter")
+        return
+    for entry in entries:
+        click.echo(
+            f"#{entry['id']} {entry['created_at']} {entry['kind']} "
+            f"contato={entry['contact_id']} tentativas={entry['attempts']} "
+            f"erro={entry['error']}"
+        )
+
+
+@digisac_cli.command("replay-dead-letter")
+@click.argument("dead_letter_id", type=int)
+def replay_dead_letter(dead_letter_id):
+    """Reenvia um envio da dead-letter agora e o remove se der certo"""
+    entry = get_dead_letter(dead_letter_id)
+    if not entry:
+        raise click.ClickException(f"Dead letter #{dead_letter_id} não encontrada")
+
+    dispatcher = DigisacDispatcher(mode="inline")
+    response = dispatcher.submit(entry["kind"], entry["payload"])
+    if isinstance(response, dict) and response.get("error"):
+        raise click.ClickException(f"Falhou de novo: {response['error']}")
+
+    delete_dead_letter(dead_letter_id)
+    click.echo(f"✅ Dead letter #{dead_letter_id} reenviada")
@@ -3,11 +3,17 @@ import click
 from flask.cli import AppGroup
 
 from app.cli.logging_setup import setup_sync_logger
+from app.database.identity_links import get_identity_links
 from app.services.sync.conta_azul_sync_manager import (
     PersonsSyncManager,
     AccountsSyncManager,
     ServicesSyncManager,
 )
+from app.services.sync.orchestrator import (
+    SyncOrchestrator,
+    SyncTask,
+    format_summary,
+)
 from app.services.sync.digisac_sync_manager import (
     ContactsSyncManager,
     DepartmentsSyncManager,
@@ -17,71 +23,189 @@ from app.services.sync.digisac_sync_manager import (
 sync_cli = AppGroup("sync")
 sync_logger = setup_sync_logger()
 
+concurrency_option = click.option(
+    "--concurrency",
+    default=1,
+    show_default=True,
+    help="Quantidade de páginas buscadas em paralelo",
+)
+gzip_option = click.option(
+    "--gzip/--no-gzip",
+    "export_gzip",
+    default=False,
+    help="Compacta o snapshot exportado (.gz)",
+)
+delta_option = click.option(
+    "--delta/--full",
+    default=False,
+    help="Busca apenas registros alterados desde o último sync completo",
+)
+export_json_option = click.option(
+    "--export-json/--no-export-json",
+    default=True,
+    show_default=True,
+    help="Também exporta o snapshot NDJSON (lido pelos índices em memória)",
+)
+
 
 @sync_cli.command("ca-pessoas")
 @click.option("--page-size", default=10)
-def ca_pessoas(page_size):
+@export_json_option
+@gzip_option
+@concurrency_option
+@delta_option
+def ca_pessoas(page_size, export_json, export_gzip, concurrency, delta):
     sync_logger.info("🔄 [CA] Pessoas")
-    PersonsSyncManager(page_size).run_sync()
+    PersonsSyncManager(page_size, export_json, export_gzip).run_sync(concurrency, delta)
 
 
 @sync_cli.command("ca-contas")
 @click.option("--page-size", default=10)
-def ca_contas(page_size):
+@export_json_option
+@gzip_option
+@concurrency_option
+@delta_option
+def ca_contas(page_size, export_json, export_gzip, concurrency, delta):
     sync_logger.info("🔄 [CA] Contas Financeiras")
-    AccountsSyncManager(page_size).run_sync()
+    AccountsSyncManager(page_size, export_json, export_gzip).run_sync(
+        concurrency, delta
+    )
 
 
 @sync_cli.command("ca-servicos")
 @click.option("--page-size", default=10)
-def ca_servicos(page_size):
+@export_json_option
+@gzip_option
+@concurrency_option
+@delta_option
+def ca_servicos(page_size, export_json, export_gzip, concurrency, delta):
     sync_logger.info("🔄 [CA] Serviços")
-    ServicesSyncManager(page_size).run_sync()
+    ServicesSyncManager(page_size, export_json, export_gzip).run_sync(
+        concurrency, delta
+    )
 
 
 @sync_cli.command("digisac-contatos")
 @click.option("--page-size", default=40)
-def dc_contatos(page_size):
+@export_json_option
+@gzip_option
+@concurrency_option
+@delta_option
+def dc_contatos(page_size, export_json, export_gzip, concurrency, delta):
     sync_logger.info("🔄 [DS] Contatos")
-    ContactsSyncManager(page_size).run_sync()
+    ContactsSyncManager(page_size, export_json, export_gzip).run_sync(
+        concurrency, delta
+    )
 
 
 @sync_cli.command("digisac-departamentos")
 @click.option("--page-size", default=40)
-def dc_departamentos(page_size):
+@export_json_option
+@gzip_option
+@concurrency_option
+@delta_option
+def dc_departamentos(page_size, export_json, export_gzip, concurrency, delta):
     sync_logger.info("🔄 [DS] Departamentos")
-    DepartmentsSyncManager(page_size).run_sync()
+    DepartmentsSyncManager(page_size, export_json, export_gzip).run_sync(
+        concurrency, delta
+    )
 
 
 @sync_cli.command("digisac-usuarios")
 @click.option("--page-size", default=40)
-def dc_usuarios(page_size):
+@export_json_option
+@gzip_option
+@concurrency_option
+@delta_option
+def dc_usuarios(page_size, export_json, export_gzip, concurrency, delta):
     sync_logger.info("🔄 [DS] Usuários")
-    UsersSyncManager(page_size).run_sync()
+    UsersSyncManager(page_size, export_json, export_gzip).run_sync(concurrency, delta)
+
+
+@sync_cli.command("identidades")
+def identidades():
+    sync_logger.info("🔄 Vínculos de identidade (Digisac ↔ Conta Azul ↔ Bitrix)")
+    total = get_identity_links().rebuild()
+    sync_logger.info(f"✅ {total} clientes vinculados")
 
 
 @sync_cli.command("all")
 @click.option("--ca-page-size", default=10)
 @click.option("--ds-page-size", default=40)
-def sync_all(ca_page_size, ds_page_size):
+@click.option(
+    "--ca-parallel",
+    default=1,
+    show_default=True,
+    help="Entidades da Conta Azul sincronizadas ao mesmo tempo",
+)
+@click.option(
+    "--ds-parallel",
+    default=2,
+    show_default=True,
+    help="Entidades do Digisac sincronizadas ao mesmo tempo",
+)
+@click.option(
+    "--rebuild-identities/--no-rebuild-identities",
+    default=False,
+    help="Reconstrói os vínculos de identidade após pessoas e contatos",
+)
+@export_json_option
+@gzip_option
+@concurrency_option
+@delta_option
+def sync_all(
+    ca_page_size,
+    ds_page_size,
+    ca_parallel,
+    ds_parallel,
+    rebuild_identities,
+    export_json,
+    export_gzip,
+    concurrency,
+    delta,
+):
     sync_logger.info("🚀 Iniciando sync ALL")
 
-    sync_logger.info("[CA] Pessoas")
-    PersonsSyncManager(ca_page_size).run_sync()
-
-    sync_logger.info("[CA] Contas")
-    AccountsSyncManager(ca_page_size).run_sync()
-
-    sync_logger.info("[CA] Serviços")
-    ServicesSyncManager(ca_page_size).run_sync()
-
-    sync_logger.info("[DS] Contatos")
-    ContactsSyncManager(ds_page_size).run_sync()
-
-    sync_logger.info("[DS] Departamentos")
-    DepartmentsSyncManager(ds_page_size).run_sync()
-
-    sync_logger.info("[DS] Usuários")
-    UsersSyncManager(ds_page_size).run_sync()
-
+    def sync_task(name, provider, manager_cls, page_size, depends_on=()):
+        def run():
+            sync_logger.info(f"[{name}] iniciado")
+            manager = manager_cls(page_size, export_json, export_gzip)
+            return manager.run_sync(concurrency, delta)
+
+        return SyncTask(name, provider, run, depends_on)
+
+    # As seis entidades não têm arestas entre si: cada manager só lê o próprio
+    # endpoint e grava a própria entidade no diretório, sem consultar outra.
+    # O que elas compartilham (token da Conta Azul, bucket do provedor) já é
+    # coordenado pelo lease e pelo provider_limits. Só os vínculos de
+    # identidade leem duas entidades, e por isso dependem delas.
+    tasks = [
+        sync_task("CA::Pessoas", "conta_azul", PersonsSyncManager, ca_page_size),
+        sync_task("CA::Contas", "conta_azul", AccountsSyncManager, ca_page_size),
+        sync_task("CA::Servicos", "conta_azul", ServicesSyncManager, ca_page_size),
+        sync_task("DS::Contacts", "digisac", ContactsSyncManager, ds_page_size),
+        sync_task("DS::Departments", "digisac", DepartmentsSyncManager, ds_page_size),
+        sync_task("DS::Users", "digisac", UsersSyncManager, ds_page_size),
+    ]
+    if rebuild_identities:
+        tasks.append(
+            SyncTask(
+                "Identidades",
+                "local",
+                lambda: get_identity_links().rebuild(),
+                depends_on=("CA::Pessoas", "DS::Contacts"),
+            )
+        )
+
+    results = SyncOrchestrator(
+        tasks, provider_limits={"conta_azul": ca_parallel, "digisac": ds_parallel}
+    ).run()
+
+    for line in format_summary(results):
+        sync_logger.info(line)
+        click.echo(line)
+
+    if any(r.status != "ok" for r in results):
+        sync_logger.error("❌ Sync ALL concluído com falhas")
+        raise SystemExit(1)
     sync_logger.info("✅ Sync ALL concluído")
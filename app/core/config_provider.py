@@ -67,8 +67,11 @@ class ServiceConfiguration:
     """Service-specific configuration following Open/Closed Principle"""
 
     DIGISAC_BASE_URL = "https://logicassessoria.digisac.chat/api/v1"
+    CONTA_AZUL_AUTH_BASE_URL = "https://auth.contaazul.com"
     CONTA_AZUL_TOKEN_URL = "https://auth.contaazul.com/oauth2/token"
     CONTA_AZUL_API_BASE_URL = "https://api-v2.contaazul.com"
+    BITRIX_BASE_URL = "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs"
+    CNPJ_API_BASE_URL = "https://publica.cnpj.ws"
 
     # Department IDs (could be moved to config later)
     CERT_DEPT_ID = "154521dc-71c0-4117-a697-bd978cd442aa"
@@ -4,8 +4,9 @@
 Health checker implementation following SOLID principles.
 """
 
+import os
+import sys
 import logging
-import requests
 from typing import Dict, Any, List
 from datetime import datetime
 
@@ -13,6 +14,25 @@ from app.core.interfaces import IHealthChecker, IConfigProvider
 
 logger = logging.getLogger(__name__)
 
+# Idade máxima (s) dos snapshots de contatos/pessoas antes de ficar unhealthy
+SYNC_MAX_SNAPSHOT_AGE = int(os.getenv("SYNC_MAX_SNAPSHOT_AGE", "3600"))
+
+# Estatísticas de módulo reportadas no health: (nome, módulo, função)
+RUNTIME_STATS = [
+    ("http_pools", "app.services.http_client", "get_http_stats"),
+    ("auth_leases", "app.database.lease_lock", "get_lease_stats"),
+]
+
+# Singletons reportados no health: (nome, módulo, variável global, método)
+RUNTIME_SINGLETONS = [
+    ("cnpj_cache", "app.services.external.cnpj_lookup", "_lookup_service", "get_stats"),
+    ("open_tickets", "app.services.digisac.open_tickets", "_snapshot", "get_stats"),
+    ("digisac_dispatch", "app.services.digisac.dispatcher", "_dispatcher", "get_stats"),
+    ("pdf_cache", "app.services.pdf_relay", "_relay", "get_stats"),
+    ("continuations", "app.services.continuations", "_runner", "get_stats"),
+    ("jobs", "app.services.jobs", "_store", "counts"),
+]
+
 
 class HealthChecker(IHealthChecker):
     """
@@ -40,6 +60,8 @@ class HealthChecker(IHealthChecker):
             ("configuration", self._check_configuration_health),
             ("external_apis", self._check_external_apis_health),
             ("flask_app", self._check_flask_app_health),
+            ("sync_snapshots", self._check_sync_snapshots_health),
+            ("runtime", self._check_runtime_stats),
         ]
 
         for check_name, check_function in checks:
@@ -144,6 +166,8 @@ class HealthChecker(IHealthChecker):
 
     def _check_external_apis_health(self) -> Dict[str, Any]:
         """Check external APIs health"""
+        from app.services.http_client import get_http_client
+
         api_checks = {}
         overall_healthy = True
 
@@ -152,7 +176,7 @@ class HealthChecker(IHealthChecker):
             bitrix_url = self.config.get("BITRIX_WEBHOOK_URL")
             if bitrix_url:
                 # Simple ping to check connectivity
-                response = requests.head(bitrix_url, timeout=5)
+                response = get_http_client("bitrix24").head(bitrix_url, timeout=5)
                 api_checks["bitrix24"] = {
                     "healthy": response.status_code < 500,
                     "status_code": response.status_code,
@@ -172,6 +196,41 @@ class HealthChecker(IHealthChecker):
             "checked_at": datetime.utcnow().isoformat(),
         }
 
+    def _check_runtime_stats(self) -> Dict[str, Any]:
+        """
+        Report stats of the pools, caches and queues already running.
+        Singletons not created yet are reported as not started instead of
+        being built here, and a failing getter only affects its own entry.
+        """
+        stats: Dict[str, Any] = {}
+
+        for name, module_name, func_name in RUNTIME_STATS:
+            module = sys.modules.get(module_name)
+            try:
+                stats[name] = getattr(module, func_name)() if module else {}
+            except Exception as e:
+                logger.warning(f"Stats '{name}' indisponíveis: {e}")
+                stats[name] = {"error": str(e)}
+
+        for name, module_name, attr, method in RUNTIME_SINGLETONS:
+            module = sys.modules.get(module_name)
+            instance = getattr(module, attr, None) if module else None
+            if instance is None:
+                stats[name] = {"status": "not_started"}
+                continue
+            try:
+                stats[name] = getattr(instance, method)()
+            except Exception as e:
+                logger.warning(f"Stats '{name}' indisponíveis: {e}")
+                stats[name] = {"error": str(e)}
+
+        # Estatísticas são informativas: não derrubam o health
+        return {
+            "healthy": True,
+            **stats,
+            "checked_at": datetime.utcnow().isoformat(),
+        }
+
     def _check_flask_app_health(self) -> Dict[str, Any]:
         """Check Flask app health"""
         try:
@@ -195,6 +254,30 @@ class HealthChecker(IHealthChecker):
                 "checked_at": datetime.utcnow().isoformat(),
             }
 
+    def _check_sync_snapshots_health(self) -> Dict[str, Any]:
+        """Check age of the synced contact/person snapshots"""
+        from app.database.contact_directory import (
+            CONTA_AZUL_PERSONS_ENTITY,
+            DIGISAC_CONTACTS_ENTITY,
+        )
+        from app.services.sync.freshness import get_snapshot_ages, lookup_miss_monitor
+
+        ages = get_snapshot_ages()
+        stale = [
+            entity
+            for entity in (CONTA_AZUL_PERSONS_ENTITY, DIGISAC_CONTACTS_ENTITY)
+            if ages.get(entity) is None or ages[entity] > SYNC_MAX_SNAPSHOT_AGE
+        ]
+
+        return {
+            "healthy": not stale,
+            "ages_seconds": ages,
+            "stale": stale,
+            "max_age_seconds": SYNC_MAX_SNAPSHOT_AGE,
+            "lookup_misses": lookup_miss_monitor.get_counts(),
+            "checked_at": datetime.utcnow().isoformat(),
+        }
+
     def _check_database_connectivity(self) -> bool:
         """Simple database connectivity check"""
         try:
@@ -67,6 +67,9 @@ class ApplicationLifecycle:
         """Start all registered workers"""
         logger.info("🚀 Starting background workers...")
 
+        # Digisac sends left over from the previous run go out first
+        self._recover_outbound_queue()
+
         for worker in self.workers:
             try:
                 worker.start()
@@ -111,6 +114,9 @@ class ApplicationLifecycle:
         # Stop workers first
         self._stop_workers()
 
+        # Give queued Digisac sends a chance to go out
+        self._drain_outbound_queue()
+
         # Cleanup services
         self._cleanup_services()
 
@@ -146,6 +152,33 @@ class ApplicationLifecycle:
                 except Exception as e:
                     logger.error(f"❌ Error stopping worker: {e}")
 
+    def _drain_outbound_queue(self) -> None:
+        """Wait (bounded) for the Digisac dispatcher to empty its queues"""
+        from app.services.digisac.dispatcher import (
+            DISPATCH_DRAIN_SECONDS,
+            get_digisac_dispatcher,
+        )
+
+        try:
+            dispatcher = get_digisac_dispatcher()
+            if not dispatcher.wait_idle(timeout=DISPATCH_DRAIN_SECONDS):
+                pending = dispatcher.get_stats()["pending"]
+                logger.warning(
+                    f"⚠️ {pending} Digisac operations still queued at exit; "
+                    "they will be sent on the next start"
+                )
+        except Exception as e:
+            logger.error(f"❌ Error draining Digisac dispatcher: {e}")
+
+    def _recover_outbound_queue(self) -> None:
+        """Re-queue the Digisac operations persisted by the previous run"""
+        from app.services.digisac.dispatcher import get_digisac_dispatcher
+
+        try:
+            get_digisac_dispatcher().recover()
+        except Exception as e:
+            logger.error(f"❌ Error recovering Digisac outbound queue: {e}")
+
     def _stop_worker_safely(self, worker: IWorker) -> None:
         """Safely stop a worker"""
         try:
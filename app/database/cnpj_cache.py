@@ -0,0 +1,106 @@
+# app/database/cnpj_cache.py
+"""
+Cache persistente das respostas brutas da API pública de CNPJ (cnpj.ws).
+
+Cada CNPJ guarda o JSON devolvido pela API e o instante da consulta; quem lê
+decide, pela idade, se o dado ainda é fresco, se pode ser servido enquanto é
+revalidado em segundo plano ou se precisa ir à API. Arquivo próprio
+(cnpj_cache.db, em WAL) para não inflar o integrations.db.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from app.database.database import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+CNPJ_CACHE_DB_PATH = os.path.join(DB_DIR, "cnpj_cache.db")
+
+
+@contextmanager
+def get_cnpj_cache_connection(db_path: str = CNPJ_CACHE_DB_PATH):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_cnpj_cache(db_path: str = CNPJ_CACHE_DB_PATH) -> None:
+    with get_cnpj_cache_connection(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cnpj_cache (
+                cnpj        TEXT PRIMARY KEY,
+                payload     TEXT NOT NULL,
+                fetched_at  REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+
+
+class CNPJCache:
+    """Respostas da API de CNPJ por CNPJ (só dígitos), com a idade de cada uma"""
+
+    def __init__(self, db_path: str = CNPJ_CACHE_DB_PATH):
+        self.db_path = db_path
+        init_cnpj_cache(db_path)
+
+    def get(self, cnpj: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(payload, idade em segundos) ou None se o CNPJ nunca foi consultado"""
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT payload, fetched_at FROM cnpj_cache WHERE cnpj = ?",
+                (cnpj,),
+            ).fetchone()
+        if not row:
+            return None
+        try:
+            payload = json.loads(row[0])
+        except ValueError:
+            logger.warning(f"Entrada corrompida no cache de CNPJ {cnpj}; ignorando")
+            return None
+        return payload, max(0.0, time.time() - row[1])
+
+    def set(self, cnpj: str, payload: Dict[str, Any]) -> None:
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            conn.execute(
+                """
+                INSERT INTO cnpj_cache (cnpj, payload, fetched_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(cnpj) DO UPDATE SET
+                    payload = excluded.payload,
+                    fetched_at = excluded.fetched_at
+                """,
+                (cnpj, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+            conn.commit()
+
+    def delete(self, cnpj: str) -> None:
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            conn.execute("DELETE FROM cnpj_cache WHERE cnpj = ?", (cnpj,))
+            conn.commit()
+
+    def purge_older_than(self, max_age_seconds: float) -> int:
+        """Remove entradas mais velhas que `max_age_seconds`; devolve quantas"""
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            cur = conn.execute(
+                "DELETE FROM cnpj_cache WHERE fetched_at < ?",
+                (time.time() - max_age_seconds,),
+            )
+            conn.commit()
+            return cur.rowcount
+
+    def count(self) -> int:
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM cnpj_cache").fetchone()[0]
@@ -0,0 +1,100 @@
+# app/database/cnpj_enrichment.py
+"""
+Progresso do enriquecimento em massa de empresas (`flask cnpj enrich`).
+
+Cada execução tem um nome; cada empresa processada fica registrada com o seu
+status. Ao repetir o comando com o mesmo nome, as empresas já atualizadas
+(ou com CNPJ inválido) são puladas e só o restante é processado.
+"""
+
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from app.database.cnpj_cache import CNPJ_CACHE_DB_PATH, get_cnpj_cache_connection
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_NOT_FOUND = "not_found"
+STATUS_INVALID = "invalid"
+
+# Status que não são reprocessados ao retomar uma execução
+FINAL_STATUSES = (STATUS_DONE, STATUS_INVALID)
+
+
+def init_cnpj_enrichment(db_path: str = CNPJ_CACHE_DB_PATH) -> None:
+    with get_cnpj_cache_connection(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cnpj_enrichment_progress (
+                run_name    TEXT NOT NULL,
+                company_id  TEXT NOT NULL,
+                cnpj        TEXT,
+                status      TEXT NOT NULL,
+                error       TEXT,
+                updated_at  REAL NOT NULL,
+                PRIMARY KEY (run_name, company_id)
+            )
+            """
+        )
+        conn.commit()
+
+
+class CNPJEnrichmentProgress:
+    """Status por empresa de uma execução nomeada do enriquecimento"""
+
+    def __init__(self, run_name: str, db_path: str = CNPJ_CACHE_DB_PATH):
+        self.run_name = run_name
+        self.db_path = db_path
+        init_cnpj_enrichment(db_path)
+
+    def completed_ids(self) -> Set[str]:
+        """Empresas que não precisam ser processadas de novo"""
+        placeholders = ", ".join("?" for _ in FINAL_STATUSES)
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT company_id FROM cnpj_enrichment_progress "
+                f"WHERE run_name = ? AND status IN ({placeholders})",
+                (self.run_name, *FINAL_STATUSES),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_many(
+        self, entries: Iterable[Tuple[str, Optional[str], str, Optional[str]]]
+    ) -> None:
+        """Grava (company_id, cnpj, status, erro) de um lote numa transação"""
+        now = time.time()
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            conn.executemany(
+                """
+                INSERT INTO cnpj_enrichment_progress
+                    (run_name, company_id, cnpj, status, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(run_name, company_id) DO UPDATE SET
+                    cnpj = excluded.cnpj,
+                    status = excluded.status,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                [
+                    (self.run_name, company_id, cnpj, status, error, now)
+                    for company_id, cnpj, status, error in entries
+                ],
+            )
+            conn.commit()
+
+    def summary(self) -> Dict[str, int]:
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM cnpj_enrichment_progress "
+                "WHERE run_name = ? GROUP BY status",
+                (self.run_name,),
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def reset(self) -> None:
+        with get_cnpj_cache_connection(self.db_path) as conn:
+            conn.execute(
+                "DELETE FROM cnpj_enrichment_progress WHERE run_name = ?",
+                (self.run_name,),
+            )
+            conn.commit()
@@ -0,0 +1,382 @@
+# app/database/contact_directory.py
+"""
+Diretório de contatos em SQLite alimentado pelos comandos `flask sync`.
+
+Os sync managers gravam cada página recebida com `executemany` em transações
+por lote; as buscas por telefone, documento ou ID passam a ser consultas
+pontuais em colunas indexadas, sem carregar snapshots JSON em memória.
+
+Fica em um banco irmão (directory.db) para que syncs grandes não disputem
+o lock de escrita com as tabelas transacionais de integrations.db.
+
+Um sync completo concluído remove as linhas que não foram regravadas nele
+(registros apagados na origem); nas buscas, o registro sincronizado mais
+recentemente vence.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.database.database import DB_DIR
+from app.utils.utils import standardize_phone_number
+
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_DB_PATH = os.path.join(DB_DIR, "directory.db")
+UPSERT_BATCH_SIZE = 500
+
+DIGISAC_CONTACTS_ENTITY = "DS::Contacts"
+CONTA_AZUL_PERSONS_ENTITY = "CA::Pessoas"
+
+
+# Uma conexão por thread e banco, reaproveitada entre as consultas pontuais
+_local = threading.local()
+
+
+@contextmanager
+def get_directory_connection(db_path: str = DIRECTORY_DB_PATH):
+    """
+    Conexão da thread atual com o diretório. Ao sair do bloco mais externo,
+    o que não foi commitado é descartado, como acontecia ao fechar a conexão.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    entry = connections.get(db_path)
+    if entry is None:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        entry = connections[db_path] = {"conn": conn, "depth": 0}
+
+    conn = entry["conn"]
+    entry["depth"] += 1
+    try:
+        yield conn
+    finally:
+        entry["depth"] -= 1
+        if entry["depth"] == 0 and conn.in_transaction:
+            conn.rollback()
+
+
+def init_directory(db_path: str = DIRECTORY_DB_PATH) -> None:
+    """
+    Inicializa o esquema do diretório:
+      - digisac_contacts: contatos do Digisac indexados por telefone canônico
+      - conta_azul_persons: pessoas da Conta Azul indexadas por documento/telefone
+      - sync_records: demais entidades sincronizadas, por (entity, record_id)
+    """
+    with get_directory_connection(db_path) as conn:
+        # WAL fica gravado no arquivo: leituras dos webhooks seguem enquanto
+        # um sync grava
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS digisac_contacts (
+                id          TEXT PRIMARY KEY,
+                name        TEXT,
+                number      TEXT,
+                std_number  TEXT,
+                payload     TEXT NOT NULL,
+                synced_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conta_azul_persons (
+                uuid        TEXT PRIMARY KEY,
+                name        TEXT,
+                document    TEXT,
+                phone       TEXT,
+                std_phone   TEXT,
+                payload     TEXT NOT NULL,
+                synced_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sync_records (
+                entity      TEXT NOT NULL,
+                record_id   TEXT NOT NULL,
+                payload     TEXT NOT NULL,
+                synced_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (entity, record_id)
+            );
+            """
+        )
+
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_digisac_contacts_std_number "
+            "ON digisac_contacts (std_number);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conta_azul_persons_document "
+            "ON conta_azul_persons (document);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conta_azul_persons_std_phone "
+            "ON conta_azul_persons (std_phone);"
+        )
+
+        conn.commit()
+
+
+def _digits(value: Any) -> Optional[str]:
+    """Retorna apenas os dígitos de um valor textual, ou None"""
+    if not isinstance(value, str):
+        return None
+    return re.sub(r"\D", "", value) or None
+
+
+def _sqlite_timestamp(moment: datetime) -> str:
+    """Instante no formato de CURRENT_TIMESTAMP (UTC, sem fuso)"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _chunks(rows: List[Tuple], size: int) -> Iterator[List[Tuple]]:
+    for i in range(0, len(rows), size):
+        yield rows[i : i + size]
+
+
+class ContactDirectory:
+    """
+    Repositório do diretório de contatos.
+    Escritas em lote pelos syncs; leituras pontuais pelos fluxos de webhook.
+    """
+
+    def __init__(
+        self, db_path: str = DIRECTORY_DB_PATH, batch_size: int = UPSERT_BATCH_SIZE
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        init_directory(db_path)
+
+    # --- Escrita (sync) ---
+    def upsert(self, entity: str, records: Iterable[Dict[str, Any]], id_key: str) -> int:
+        """Grava registros de uma entidade sincronizada; retorna a quantidade"""
+        records = list(records)
+        if entity == DIGISAC_CONTACTS_ENTITY:
+            return self.upsert_digisac_contacts(records)
+        if entity == CONTA_AZUL_PERSONS_ENTITY:
+            return self.upsert_conta_azul_persons(records)
+
+        rows = [
+            (entity, str(r[id_key]), json.dumps(r, ensure_ascii=False))
+            for r in records
+            if r.get(id_key) is not None
+        ]
+        return self._executemany(
+            """
+            INSERT INTO sync_records (entity, record_id, payload, synced_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(entity, record_id) DO UPDATE SET
+                payload = excluded.payload,
+                synced_at = excluded.synced_at
+            """,
+            rows,
+        )
+
+    def upsert_digisac_contacts(self, contacts: Iterable[Dict[str, Any]]) -> int:
+        rows = []
+        for contact in contacts:
+            contact_id = contact.get("id")
+            if not contact_id:
+                continue
+            number = (contact.get("data") or {}).get("number")
+            rows.append(
+                (
+                    contact_id,
+                    contact.get("name"),
+                    number,
+                    standardize_phone_number(number or ""),
+                    json.dumps(contact, ensure_ascii=False),
+                )
+            )
+
+        return self._executemany(
+            """
+            INSERT INTO digisac_contacts (id, name, number, std_number, payload, synced_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name,
+                number = excluded.number,
+                std_number = excluded.std_number,
+                payload = excluded.payload,
+                synced_at = excluded.synced_at
+            """,
+            rows,
+        )
+
+    def upsert_conta_azul_persons(self, persons: Iterable[Dict[str, Any]]) -> int:
+        rows = []
+        for person in persons:
+            uuid = person.get("uuid")
+            if not uuid:
+                continue
+            phone = person.get("telefone")
+            rows.append(
+                (
+                    uuid,
+                    person.get("nome"),
+                    _digits(person.get("documento")),
+                    phone,
+                    standardize_phone_number(phone or ""),
+                    json.dumps(person, ensure_ascii=False),
+                )
+            )
+
+        return self._executemany(
+            """
+            INSERT INTO conta_azul_persons (uuid, name, document, phone, std_phone, payload, synced_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(uuid) DO UPDATE SET
+                name = excluded.name,
+                document = excluded.document,
+                phone = excluded.phone,
+                std_phone = excluded.std_phone,
+                payload = excluded.payload,
+                synced_at = excluded.synced_at
+            """,
+            rows,
+        )
+
+    def prune(self, entity: str, synced_before: datetime) -> int:
+        """
+        Remove os registros da entidade não gravados desde `synced_before`.
+        Chamado ao fim de um sync completo com o instante em que ele começou:
+        o que sobra de antes foi apagado na origem.
+        """
+        if entity == DIGISAC_CONTACTS_ENTITY:
+            query, params = "DELETE FROM digisac_contacts WHERE synced_at < ?", ()
+        elif entity == CONTA_AZUL_PERSONS_ENTITY:
+            query, params = "DELETE FROM conta_azul_persons WHERE synced_at < ?", ()
+        else:
+            query = "DELETE FROM sync_records WHERE synced_at < ? AND entity = ?"
+            params = (entity,)
+
+        with get_directory_connection(self.db_path) as conn, conn:
+            cur = conn.execute(query, (_sqlite_timestamp(synced_before), *params))
+        if cur.rowcount:
+            logger.info(f"[{entity}] {cur.rowcount} registros removidos na origem")
+        return cur.rowcount
+
+    # --- Leitura (webhooks) ---
+    def has_entity(self, entity: str) -> bool:
+        """Indica se a entidade já foi sincronizada ao menos uma vez"""
+        if entity == DIGISAC_CONTACTS_ENTITY:
+            query, params = "SELECT 1 FROM digisac_contacts LIMIT 1", ()
+        elif entity == CONTA_AZUL_PERSONS_ENTITY:
+            query, params = "SELECT 1 FROM conta_azul_persons LIMIT 1", ()
+        else:
+            query, params = "SELECT 1 FROM sync_records WHERE entity = ? LIMIT 1", (
+                entity,
+            )
+        return self._fetch_value(query, params) is not None
+
+    def find_digisac_contact_id(self, phone: str) -> Optional[str]:
+        std_number = standardize_phone_number(phone)
+        if not std_number:
+            return None
+        # O contato sincronizado mais recentemente vence
+        return self._fetch_value(
+            "SELECT id FROM digisac_contacts WHERE std_number = ? "
+            "ORDER BY synced_at DESC, rowid DESC LIMIT 1",
+            (std_number,),
+        )
+
+    def find_digisac_contact_number(self, contact_id: str) -> Optional[str]:
+        if not contact_id:
+            return None
+        return self._fetch_value(
+            "SELECT number FROM digisac_contacts WHERE id = ?", (contact_id,)
+        )
+
+    def find_person_uuid_by_document(self, document: Optional[str]) -> Optional[str]:
+        digits = _digits(document)
+        if not digits:
+            return None
+        return self._fetch_value(
+            "SELECT uuid FROM conta_azul_persons WHERE document = ? "
+            "ORDER BY synced_at DESC, rowid DESC LIMIT 1",
+            (digits,),
+        )
+
+    def find_person_uuid_by_phone(self, phone: str) -> Optional[str]:
+        std_number = standardize_phone_number(phone)
+        if not std_number:
+            return None
+        return self._fetch_value(
+            "SELECT uuid FROM conta_azul_persons WHERE std_phone = ? "
+            "ORDER BY synced_at DESC, rowid DESC LIMIT 1",
+            (std_number,),
+        )
+
+    def iter_records(self, entity: str) -> Iterator[Dict[str, Any]]:
+        """
+        Itera os payloads de uma entidade do mais antigo ao mais recentemente
+        sincronizado: quem consome em ordem e deixa o último vencer (snapshot
+        dos índices, rebuild dos vínculos) segue a regra das buscas, em que o
+        registro sincronizado por último vence.
+        """
+        if entity == DIGISAC_CONTACTS_ENTITY:
+            query = "SELECT payload FROM digisac_contacts ORDER BY synced_at, rowid"
+            params = ()
+        elif entity == CONTA_AZUL_PERSONS_ENTITY:
+            query = "SELECT payload FROM conta_azul_persons ORDER BY synced_at, rowid"
+            params = ()
+        else:
+            query = (
+                "SELECT payload FROM sync_records WHERE entity = ? "
+                "ORDER BY synced_at, rowid"
+            )
+            params = (entity,)
+
+        with get_directory_connection(self.db_path) as conn:
+            for row in conn.execute(query, params):
+                yield json.loads(row["payload"])
+
+    # --- Internos ---
+    def _executemany(self, sql: str, rows: List[Tuple]) -> int:
+        if not rows:
+            return 0
+        with get_directory_connection(self.db_path) as conn:
+            for chunk in _chunks(rows, self.batch_size):
+                with conn:  # uma transação por lote
+                    conn.executemany(sql, chunk)
+        return len(rows)
+
+    def _fetch_value(self, query: str, params: Tuple) -> Any:
+        try:
+            with get_directory_connection(self.db_path) as conn:
+                row = conn.execute(query, params).fetchone()
+                return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao consultar diretório de contatos: {e}")
+            return None
+
+
+_directory: Optional[ContactDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_contact_directory() -> ContactDirectory:
+    """Retorna o diretório compartilhado pelo processo (esquema criado uma vez)"""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = ContactDirectory()
+    return _directory
@@ -0,0 +1,202 @@
+# app/database/continuations.py
+"""
+Continuações persistidas dos fluxos que esperam o Bitrix.
+
+Em vez de segurar uma thread com `time.sleep` até o workflow do Bitrix
+preencher um campo (URL da proposta, URL do boleto), o fluxo grava aqui o
+que falta fazer e retorna. O ContinuationWorker verifica o campo em
+intervalos crescentes ou na hora, quando o webhook de atualização do
+Bitrix antecipa `next_check_at`.
+
+Uma continuação só é executada por quem a "reivindica": a reivindicação
+grava `claimed_until` (lease), então processos diferentes não executam a
+mesma linha ao mesmo tempo. O webhook do Bitrix não antecipa linhas com
+reivindicação ativa; reagendar ou concluir libera a reivindicação.
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.database.database import get_db_connection
+
+STATUS_WAITING = "waiting"
+STATUS_DONE = "done"
+STATUS_EXPIRED = "expired"
+STATUS_FAILED = "failed"
+
+
+def add_continuation(
+    kind: str,
+    entity_type_id: int,
+    entity_id: str,
+    params: Dict[str, Any],
+    delay: float,
+    max_wait: float,
+) -> int:
+    """
+    Registra a continuação e retorna o id. Se já houver uma aguardando para
+    o mesmo tipo e entidade (webhook repetido), ela é atualizada em vez de
+    duplicada: os params novos entram por cima dos gravados, sem apagar o
+    progresso do resume, e o prazo original é mantido.
+    """
+    now = time.time()
+    with get_db_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT id, params FROM flow_continuations
+            WHERE kind = ? AND entity_type_id = ? AND entity_id = ? AND status = ?
+            """,
+            (kind, entity_type_id, str(entity_id), STATUS_WAITING),
+        ).fetchone()
+        if row:
+            merged = {**json.loads(row["params"]), **params}
+            conn.execute(
+                """
+                UPDATE flow_continuations
+                SET params = ?, next_check_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                (json.dumps(merged), now + delay, row["id"]),
+            )
+            conn.commit()
+            return row["id"]
+
+        cur = conn.execute(
+            """
+            INSERT INTO flow_continuations
+                (kind, entity_type_id, entity_id, params, next_check_at, deadline_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                kind,
+                entity_type_id,
+                str(entity_id),
+                json.dumps(params),
+                now + delay,
+                now + max_wait,
+            ),
+        )
+        conn.commit()
+        return cur.lastrowid
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    continuation = dict(row)
+    continuation["params"] = json.loads(continuation["params"])
+    return continuation
+
+
+def claim_due_continuations(lease_seconds: float, limit: int = 20) -> List[Dict]:
+    """Reivindica as continuações vencidas (cada uma por `lease_seconds`)"""
+    now = time.time()
+    claimed = []
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT * FROM flow_continuations
+            WHERE status = ? AND next_check_at <= ?
+              AND (claimed_until IS NULL OR claimed_until < ?)
+            ORDER BY next_check_at
+            LIMIT ?
+            """,
+            (STATUS_WAITING, now, now, limit),
+        ).fetchall()
+        for row in rows:
+            cur = conn.execute(
+                """
+                UPDATE flow_continuations SET claimed_until = ?
+                WHERE id = ? AND status = ?
+                  AND (claimed_until IS NULL OR claimed_until < ?)
+                """,
+                (now + lease_seconds, row["id"], STATUS_WAITING, now),
+            )
+            if cur.rowcount == 1:
+                claimed.append(_row_to_dict(row))
+        conn.commit()
+    return claimed
+
+
+def reschedule_continuation(
+    continuation_id: int, next_check_at: float, error: Optional[str] = None
+) -> None:
+    with get_db_connection() as conn:
+        conn.execute(
+            """
+            UPDATE flow_continuations
+            SET next_check_at = ?, claimed_until = NULL, checks = checks + 1,
+                last_error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = ?
+            """,
+            (next_check_at, error, continuation_id, STATUS_WAITING),
+        )
+        conn.commit()
+
+
+def save_continuation_params(continuation_id: int, params: Dict[str, Any]) -> None:
+    """Grava os params (com o progresso do resume) sem mexer no agendamento"""
+    with get_db_connection() as conn:
+        conn.execute(
+            """
+            UPDATE flow_continuations
+            SET params = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (json.dumps(params), continuation_id),
+        )
+        conn.commit()
+
+
+def finish_continuation(
+    continuation_id: int, status: str, error: Optional[str] = None
+) -> None:
+    with get_db_connection() as conn:
+        conn.execute(
+            """
+            UPDATE flow_continuations
+            SET status = ?, claimed_until = NULL, checks = checks + 1,
+                last_error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (status, error, continuation_id),
+        )
+        conn.commit()
+
+
+def wake_continuations(entity_type_id: int, entity_id: str) -> int:
+    """
+    Antecipa a próxima verificação das continuações da entidade. Linhas com
+    reivindicação ativa ficam de fora: estão sendo verificadas agora.
+    """
+    now = time.time()
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            """
+            UPDATE flow_continuations SET next_check_at = ?
+            WHERE entity_type_id = ? AND entity_id = ? AND status = ?
+              AND (claimed_until IS NULL OR claimed_until < ?)
+            """,
+            (now, entity_type_id, str(entity_id), STATUS_WAITING, now),
+        )
+        conn.commit()
+        return cur.rowcount
+
+
+def next_continuation_due_at() -> Optional[float]:
+    with get_db_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT MIN(MAX(next_check_at, COALESCE(claimed_until, 0)))
+            FROM flow_continuations WHERE status = ?
+            """,
+            (STATUS_WAITING,),
+        ).fetchone()
+    return row[0]
+
+
+def count_continuations_by_status() -> Dict[str, int]:
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) FROM flow_continuations GROUP BY status"
+        ).fetchall()
+    return {row[0]: row[1] for row in rows}
@@ -20,11 +20,21 @@ def get_db_connection():
         conn.close()
 
 
+def _ensure_column(conn, table: str, column: str, ddl: str) -> None:
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
 def init_db():
     """
     Inicializa o esquema de banco de dados para:
       - certif_pending_renewals: armazena estágios do negócio
       - message_events: rastreia mensagens e ações realizadas
+      - ticket_state: estado dos tickets do Digisac recebido por webhook
+      - digisac_dead_letters: envios ao Digisac que esgotaram as tentativas
+      - digisac_outbound: envios ao Digisac pendentes no dispatcher
+      - flow_continuations: etapas de fluxo aguardando um campo no Bitrix
 
     A deduplicação de webhooks se dá pelo _unique_ message_id em message_events.
     """
@@ -136,6 +146,77 @@ def init_db():
             """
         )
 
+        # Espelho do estado dos tickets do Digisac (webhook de eventos de ticket)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ticket_state (
+                ticket_id       TEXT    PRIMARY KEY,
+                contact_id      TEXT    NOT NULL,
+                department_id   TEXT,
+                user_id         TEXT,
+                is_open         INTEGER NOT NULL,
+                last_event      TEXT,
+                event_at        TEXT    NOT NULL,
+                updated_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+
+        # Envios ao Digisac que falharam em todas as tentativas do dispatcher
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS digisac_dead_letters (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind            TEXT    NOT NULL,
+                contact_id      TEXT,
+                payload         TEXT    NOT NULL,
+                error           TEXT,
+                attempts        INTEGER NOT NULL,
+                created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+
+        # Envios ao Digisac ainda não confirmados (recarregados no restart)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS digisac_outbound (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind            TEXT    NOT NULL,
+                contact_id      TEXT    NOT NULL,
+                payload         TEXT    NOT NULL,
+                attempts        INTEGER NOT NULL DEFAULT 0,
+                last_error      TEXT,
+                created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+
+        # Continuações de fluxo aguardando o Bitrix preencher um campo
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS flow_continuations (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind            TEXT    NOT NULL,
+                entity_type_id  INTEGER NOT NULL,
+                entity_id       TEXT    NOT NULL,
+                params          TEXT    NOT NULL,
+                status          TEXT    NOT NULL DEFAULT 'waiting' CHECK (
+                    status IN ('waiting', 'done', 'expired', 'failed')
+                ),
+                checks          INTEGER NOT NULL DEFAULT 0,
+                next_check_at   REAL    NOT NULL,
+                deadline_at     REAL    NOT NULL,
+                claimed_until   REAL,
+                last_error      TEXT,
+                created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        # Bancos criados antes da coluna de reivindicação
+        _ensure_column(conn, "flow_continuations", "claimed_until", "REAL")
+
         # Tabela de sessão por contato
         conn.execute(
             """
@@ -167,6 +248,22 @@ def init_db():
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_ticket_flow_spa ON ticket_flow_queue (spa_id);"
         )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ticket_flow_contact_status "
+            "ON ticket_flow_queue (contact_number, status);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ticket_state_contact "
+            "ON ticket_state (contact_id, is_open);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_flow_continuations_due "
+            "ON flow_continuations (status, next_check_at);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_flow_continuations_entity "
+            "ON flow_continuations (entity_type_id, entity_id, status);"
+        )
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_contact_sessions_status_created_at ON "
             "contact_sessions(status, created_at);"
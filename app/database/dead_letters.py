@@ -0,0 +1,75 @@
+# app/database/dead_letters.py
+"""
+Fila de "dead letters" dos envios ao Digisac.
+
+Quando o dispatcher esgota as tentativas de uma operação (mensagem, PDF,
+transferência ou encerramento), ela é gravada aqui com o payload original e
+o último erro, para ser inspecionada e reenviada com
+`flask digisac replay-dead-letter`.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.database.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def add_dead_letter(
+    kind: str,
+    contact_id: Optional[str],
+    payload: Dict[str, Any],
+    error: Optional[str],
+    attempts: int,
+) -> int:
+    """Grava a operação que falhou e retorna o id da linha"""
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO digisac_dead_letters
+                (kind, contact_id, payload, error, attempts)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (kind, contact_id, json.dumps(payload), error, attempts),
+        )
+        conn.commit()
+        return cur.lastrowid
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    entry = dict(row)
+    entry["payload"] = json.loads(entry["payload"])
+    return entry
+
+
+def get_dead_letter(dead_letter_id: int) -> Optional[Dict[str, Any]]:
+    with get_db_connection() as conn:
+        row = conn.execute(
+            "SELECT * FROM digisac_dead_letters WHERE id = ?", (dead_letter_id,)
+        ).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def list_dead_letters(limit: int = 50) -> List[Dict[str, Any]]:
+    """Mais recentes primeiro"""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT * FROM digisac_dead_letters ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+def count_dead_letters() -> int:
+    with get_db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM digisac_dead_letters").fetchone()[0]
+
+
+def delete_dead_letter(dead_letter_id: int) -> bool:
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            "DELETE FROM digisac_dead_letters WHERE id = ?", (dead_letter_id,)
+        )
+        conn.commit()
+        return cur.rowcount > 0
@@ -0,0 +1,426 @@
+# app/database/identity_links.py
+"""
+Tabela de identidade entre sistemas (Digisac ↔ Conta Azul ↔ Bitrix).
+
+Cada cliente tem uma chave canônica — o telefone no formato de
+`standardize_phone_number` (12 dígitos, sem o nono dígito), o mesmo usado em
+certif_pending_renewals — ou `doc:<dígitos>` quando a pessoa da Conta Azul não
+tem telefone. A chave aponta para o contato do Digisac, a pessoa da Conta Azul,
+os documentos e as SPAs do Bitrix, de modo que os fluxos de renovação resolvem
+tudo com uma única consulta.
+
+Os vínculos são atualizados incrementalmente a cada página sincronizada e a
+cada pendência registrada; `rebuild()` refaz as tabelas a partir do diretório
+em tabelas auxiliares e troca o conteúdo numa única transação, então as
+consultas nunca veem os vínculos vazios. Registros removidos do diretório
+pelo prune de um sync completo deixam de ser apontados (`unlink_missing`).
+"""
+
+import re
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.database.contact_directory import (
+    DIRECTORY_DB_PATH,
+    DIGISAC_CONTACTS_ENTITY,
+    CONTA_AZUL_PERSONS_ENTITY,
+    ContactDirectory,
+    get_contact_directory,
+    get_directory_connection,
+)
+from app.database.database import get_db_connection
+from app.utils.utils import standardize_phone_number
+
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_KEY_PREFIX = "doc:"
+
+# Nomes das tabelas de vínculo: as consultadas e as usadas pelo rebuild()
+LIVE_TABLES = {
+    "identities": "customer_identities",
+    "documents": "identity_documents",
+    "spas": "identity_spas",
+}
+REBUILD_TABLES = {name: f"{table}_rebuild" for name, table in LIVE_TABLES.items()}
+
+
+def _create_link_tables(conn, tables: Dict[str, str]) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {tables["identities"]} (
+            canonical_key           TEXT PRIMARY KEY,
+            digisac_contact_id      TEXT,
+            conta_azul_person_uuid  TEXT,
+            updated_at              TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {tables["documents"]} (
+            document        TEXT PRIMARY KEY,
+            canonical_key   TEXT NOT NULL
+        );
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {tables["spas"]} (
+            spa_id          INTEGER PRIMARY KEY,
+            canonical_key   TEXT NOT NULL
+        );
+        """
+    )
+
+
+def init_identity_links(db_path: str = DIRECTORY_DB_PATH) -> None:
+    """
+    Inicializa as tabelas de vínculo:
+      - customer_identities: chave canônica → contato Digisac / pessoa Conta Azul
+      - identity_documents: CPF/CNPJ → chave canônica
+      - identity_spas: SPA do Bitrix → chave canônica
+    """
+    with get_directory_connection(db_path) as conn:
+        _create_link_tables(conn, LIVE_TABLES)
+
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_customer_identities_digisac "
+            "ON customer_identities (digisac_contact_id);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_identity_documents_key "
+            "ON identity_documents (canonical_key);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_identity_spas_key "
+            "ON identity_spas (canonical_key);"
+        )
+
+        conn.commit()
+
+
+def _digits(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    return re.sub(r"\D", "", value) or None
+
+
+def canonical_key(
+    phone: Optional[str] = None, document: Optional[str] = None
+) -> Optional[str]:
+    """Chave canônica do cliente: telefone padronizado ou `doc:<dígitos>`"""
+    std_number = standardize_phone_number(phone or "")
+    if std_number:
+        return std_number
+    digits = _digits(document)
+    return f"{DOCUMENT_KEY_PREFIX}{digits}" if digits else None
+
+
+# O vínculo sincronizado mais recente vence, como nas buscas do diretório:
+# uma pessoa recriada ou revinculada na origem substitui a anterior
+# (formatados com os nomes de LIVE_TABLES ou REBUILD_TABLES)
+_UPSERT_DIGISAC = """
+    INSERT INTO {identities} (canonical_key, digisac_contact_id, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(canonical_key) DO UPDATE SET
+        digisac_contact_id = COALESCE(
+            excluded.digisac_contact_id, {identities}.digisac_contact_id
+        ),
+        updated_at = excluded.updated_at
+"""
+
+_UPSERT_CONTA_AZUL = """
+    INSERT INTO {identities} (canonical_key, conta_azul_person_uuid, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(canonical_key) DO UPDATE SET
+        conta_azul_person_uuid = COALESCE(
+            excluded.conta_azul_person_uuid, {identities}.conta_azul_person_uuid
+        ),
+        updated_at = excluded.updated_at
+"""
+
+_UPSERT_KEY = """
+    INSERT INTO {identities} (canonical_key) VALUES (?)
+    ON CONFLICT(canonical_key) DO NOTHING
+"""
+
+_LINK_DOCUMENT = """
+    INSERT INTO {documents} (document, canonical_key) VALUES (?, ?)
+    ON CONFLICT(document) DO UPDATE SET canonical_key = excluded.canonical_key
+"""
+
+_LINK_SPA = """
+    INSERT INTO {spas} (spa_id, canonical_key) VALUES (?, ?)
+    ON CONFLICT(spa_id) DO UPDATE SET canonical_key = excluded.canonical_key
+"""
+
+
+class IdentityLinks:
+    """Repositório dos vínculos de identidade entre sistemas"""
+
+    def __init__(
+        self,
+        db_path: str = DIRECTORY_DB_PATH,
+        directory: Optional[ContactDirectory] = None,
+    ):
+        self.db_path = db_path
+        self.directory = directory
+        init_identity_links(db_path)
+
+    # --- Vínculos incrementais ---
+    def link_batch(
+        self,
+        entity: str,
+        records: Iterable[Dict[str, Any]],
+        tables: Dict[str, str] = LIVE_TABLES,
+    ) -> None:
+        """Atualiza os vínculos a partir de uma página recém-sincronizada"""
+        if entity == DIGISAC_CONTACTS_ENTITY:
+            self.link_digisac_contacts(records, tables)
+        elif entity == CONTA_AZUL_PERSONS_ENTITY:
+            self.link_conta_azul_persons(records, tables)
+
+    def link_digisac_contacts(
+        self,
+        contacts: Iterable[Dict[str, Any]],
+        tables: Dict[str, str] = LIVE_TABLES,
+    ) -> None:
+        rows = []
+        for contact in contacts:
+            key = canonical_key(phone=(contact.get("data") or {}).get("number"))
+            if key and contact.get("id"):
+                rows.append((key, contact["id"]))
+
+        with get_directory_connection(self.db_path) as conn, conn:
+            conn.executemany(_UPSERT_DIGISAC.format(**tables), rows)
+
+    def link_conta_azul_persons(
+        self,
+        persons: Iterable[Dict[str, Any]],
+        tables: Dict[str, str] = LIVE_TABLES,
+    ) -> None:
+        identity_rows, document_rows = [], []
+        for person in persons:
+            uuid = person.get("uuid")
+            document = _digits(person.get("documento"))
+            key = canonical_key(phone=person.get("telefone"), document=document)
+            if not uuid or not key:
+                continue
+            identity_rows.append((key, uuid))
+            if document:
+                document_rows.append((document, key))
+
+        with get_directory_connection(self.db_path) as conn, conn:
+            conn.executemany(_UPSERT_CONTA_AZUL.format(**tables), identity_rows)
+            conn.executemany(_LINK_DOCUMENT.format(**tables), document_rows)
+
+    def link_renewal(
+        self,
+        contact_number: str,
+        document: Optional[str],
+        spa_id: int,
+        tables: Dict[str, str] = LIVE_TABLES,
+    ) -> Optional[str]:
+        """Vincula uma SPA (e seu documento) ao cliente; retorna a chave"""
+        key = canonical_key(phone=contact_number, document=document)
+        if not key:
+            return None
+
+        digits = _digits(document)
+        try:
+            with get_directory_connection(self.db_path) as conn, conn:
+                conn.execute(_UPSERT_KEY.format(**tables), (key,))
+                conn.execute(_LINK_SPA.format(**tables), (int(spa_id), key))
+                if digits:
+                    conn.execute(_LINK_DOCUMENT.format(**tables), (digits, key))
+        except Exception as e:
+            logger.error(f"Erro ao vincular SPA {spa_id} ao cliente {key}: {e}")
+            return None
+        return key
+
+    def unlink_missing(self, entity: str) -> int:
+        """
+        Desfaz os vínculos com contatos/pessoas que não estão mais no diretório
+        (removidos pelo prune de um sync completo)
+        """
+        if entity == DIGISAC_CONTACTS_ENTITY:
+            query = """
+                UPDATE customer_identities SET digisac_contact_id = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE digisac_contact_id IS NOT NULL
+                  AND digisac_contact_id NOT IN (SELECT id FROM digisac_contacts)
+            """
+        elif entity == CONTA_AZUL_PERSONS_ENTITY:
+            query = """
+                UPDATE customer_identities SET conta_azul_person_uuid = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE conta_azul_person_uuid IS NOT NULL
+                  AND conta_azul_person_uuid NOT IN (SELECT uuid FROM conta_azul_persons)
+            """
+        else:
+            return 0
+
+        with get_directory_connection(self.db_path) as conn, conn:
+            cur = conn.execute(query)
+        if cur.rowcount:
+            logger.info(f"[{entity}] {cur.rowcount} vínculos de identidade desfeitos")
+        return cur.rowcount
+
+    # --- Reconstrução completa ---
+    def rebuild(self) -> int:
+        """
+        Refaz os vínculos a partir do diretório e das pendências de renovação.
+        Monta tudo nas tabelas *_rebuild e só então troca o conteúdo das
+        tabelas consultadas, numa única transação.
+        """
+        directory = self.directory or get_contact_directory()
+
+        with get_directory_connection(self.db_path) as conn, conn:
+            for table in REBUILD_TABLES.values():
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            _create_link_tables(conn, REBUILD_TABLES)
+
+        for entity in (DIGISAC_CONTACTS_ENTITY, CONTA_AZUL_PERSONS_ENTITY):
+            batch: List[Dict[str, Any]] = []
+            for record in directory.iter_records(entity):
+                batch.append(record)
+                if len(batch) >= directory.batch_size:
+                    self.link_batch(entity, batch, REBUILD_TABLES)
+                    batch = []
+            self.link_batch(entity, batch, REBUILD_TABLES)
+
+        with get_db_connection() as conn:
+            renewals = conn.execute(
+                "SELECT spa_id, contact_number, document FROM certif_pending_renewals"
+            ).fetchall()
+        for row in renewals:
+            self.link_renewal(
+                row["contact_number"], row["document"], row["spa_id"], REBUILD_TABLES
+            )
+
+        with get_directory_connection(self.db_path) as conn, conn:
+            for name, table in LIVE_TABLES.items():
+                conn.execute(f"DELETE FROM {table}")
+                conn.execute(f"INSERT INTO {table} SELECT * FROM {REBUILD_TABLES[name]}")
+            for table in REBUILD_TABLES.values():
+                conn.execute(f"DROP TABLE {table}")
+            total = conn.execute("SELECT COUNT(*) FROM customer_identities").fetchone()[0]
+        logger.info(f"Vínculos de identidade reconstruídos: {total} clientes")
+        return total
+
+    # --- Consultas ---
+    def resolve(
+        self, phone: Optional[str] = None, document: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Retorna a identidade do cliente pelo telefone e/ou documento.
+        Campos ausentes na chave do telefone são completados pela chave
+        vinculada ao documento (pessoa Conta Azul cadastrada sem telefone).
+        """
+        keys = []
+        std_number = standardize_phone_number(phone or "")
+        if std_number:
+            keys.append(std_number)
+
+        digits = _digits(document)
+        if digits:
+            key = self._fetch_value(
+                "SELECT canonical_key FROM identity_documents WHERE document = ?",
+                (digits,),
+            )
+            if key and key not in keys:
+                keys.append(key)
+
+        identity = None
+        for key in keys:
+            found = self._load_identity(key)
+            if found is None:
+                continue
+            if identity is None:
+                identity = found
+                continue
+            for field in ("digisac_contact_id", "conta_azul_person_uuid"):
+                identity[field] = identity[field] or found[field]
+            identity["documents"] += [
+                d for d in found["documents"] if d not in identity["documents"]
+            ]
+            identity["spa_ids"] += [
+                s for s in found["spa_ids"] if s not in identity["spa_ids"]
+            ]
+        return identity
+
+    def find_by_digisac_contact(self, contact_id: str) -> Optional[Dict[str, Any]]:
+        if not contact_id:
+            return None
+        key = self._fetch_value(
+            "SELECT canonical_key FROM customer_identities "
+            "WHERE digisac_contact_id = ? "
+            "ORDER BY updated_at DESC, rowid DESC LIMIT 1",
+            (contact_id,),
+        )
+        return self._load_identity(key) if key else None
+
+    def find_by_spa(self, spa_id: int) -> Optional[Dict[str, Any]]:
+        key = self._fetch_value(
+            "SELECT canonical_key FROM identity_spas WHERE spa_id = ?", (spa_id,)
+        )
+        return self._load_identity(key) if key else None
+
+    def _load_identity(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with get_directory_connection(self.db_path) as conn:
+                row = conn.execute(
+                    """
+                    SELECT
+                        i.canonical_key,
+                        i.digisac_contact_id,
+                        i.conta_azul_person_uuid,
+                        (SELECT group_concat(document) FROM identity_documents
+                          WHERE canonical_key = i.canonical_key) AS documents,
+                        (SELECT group_concat(spa_id) FROM identity_spas
+                          WHERE canonical_key = i.canonical_key) AS spa_ids
+                    FROM customer_identities i
+                    WHERE i.canonical_key = ?
+                    """,
+                    (key,),
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Erro ao consultar identidade {key}: {e}")
+            return None
+
+        if not row:
+            return None
+        return {
+            "canonical_key": row["canonical_key"],
+            "digisac_contact_id": row["digisac_contact_id"],
+            "conta_azul_person_uuid": row["conta_azul_person_uuid"],
+            "documents": row["documents"].split(",") if row["documents"] else [],
+            "spa_ids": (
+                [int(s) for s in row["spa_ids"].split(",")] if row["spa_ids"] else []
+            ),
+        }
+
+    def _fetch_value(self, query: str, params: tuple) -> Any:
+        try:
+            with get_directory_connection(self.db_path) as conn:
+                row = conn.execute(query, params).fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Erro ao consultar vínculos de identidade: {e}")
+            return None
+
+
+_links: Optional[IdentityLinks] = None
+_links_lock = threading.Lock()
+
+
+def get_identity_links() -> IdentityLinks:
+    """Retorna o repositório de vínculos compartilhado pelo processo"""
+    global _links
+    if _links is None:
+        with _links_lock:
+            if _links is None:
+                _links = IdentityLinks()
+    return _links
@@ -0,0 +1,294 @@
+# app/database/job_queue.py
+"""
+Fila de jobs persistente em SQLite (jobs.db, em WAL).
+
+Cada job tem tarefa, payload JSON, prioridade (maior sai primeiro), `run_at`
+(não roda antes disso), tentativas e uma chave de idempotência opcional: um
+job com a mesma chave nunca é enfileirado duas vezes.
+
+Consumidores reivindicam jobs numa transação `BEGIN IMMEDIATE`, então dois
+processos não pegam o mesmo job. A reivindicação vale por um lease
+(`lease_until`); se o processo morrer no meio, o job volta a ficar visível
+quando o lease vence. Conclusão e reagendamento só valem para o dono atual
+do lease.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.database.database import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.path.join(DB_DIR, "jobs.db")
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+@contextmanager
+def get_jobs_connection(db_path: str = JOBS_DB_PATH):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    # Autocommit: as transações são abertas explicitamente
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_job_queue(db_path: str = JOBS_DB_PATH) -> None:
+    with get_jobs_connection(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                task            TEXT    NOT NULL,
+                payload         TEXT    NOT NULL,
+                priority        INTEGER NOT NULL DEFAULT 0,
+                status          TEXT    NOT NULL DEFAULT 'queued',
+                attempts        INTEGER NOT NULL DEFAULT 0,
+                max_attempts    INTEGER NOT NULL,
+                run_at          REAL    NOT NULL,
+                lease_until     REAL,
+                locked_by       TEXT,
+                idempotency_key TEXT    UNIQUE,
+                last_error      TEXT,
+                created_at      REAL    NOT NULL,
+                updated_at      REAL    NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_ready "
+            "ON jobs (status, priority DESC, run_at)"
+        )
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+class JobStore:
+    """Operações da fila de jobs; seguras entre threads e processos"""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH):
+        self.db_path = db_path
+        init_job_queue(db_path)
+
+    def enqueue(
+        self,
+        task: str,
+        payload: Dict[str, Any],
+        max_attempts: int,
+        priority: int = 0,
+        delay: float = 0,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[int, bool]:
+        """
+        (id, criado). Com chave já usada devolve o job existente e False;
+        se esse job tinha falhado de vez, ele volta para a fila do zero.
+        """
+        now = time.time()
+        with get_jobs_connection(self.db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = conn.execute(
+                    """
+                    INSERT INTO jobs
+                        (task, payload, priority, max_attempts, run_at,
+                         idempotency_key, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(idempotency_key) DO NOTHING
+                    """,
+                    (
+                        task,
+                        json.dumps(payload),
+                        priority,
+                        max_attempts,
+                        now + delay,
+                        idempotency_key,
+                        now,
+                        now,
+                    ),
+                )
+                if cur.rowcount == 1:
+                    conn.execute("COMMIT")
+                    return cur.lastrowid, True
+
+                revived = conn.execute(
+                    """
+                    UPDATE jobs
+                    SET status = ?, payload = ?, priority = ?, max_attempts = ?,
+                        run_at = ?, attempts = 0, last_error = NULL, updated_at = ?
+                    WHERE idempotency_key = ? AND status = ?
+                    """,
+                    (
+                        STATUS_QUEUED,
+                        json.dumps(payload),
+                        priority,
+                        max_attempts,
+                        now + delay,
+                        now,
+                        idempotency_key,
+                        STATUS_FAILED,
+                    ),
+                ).rowcount
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return row["id"], revived == 1
+
+    def claim(self, worker_id: str, limit: int, lease_seconds: float) -> List[Dict]:
+        """
+        Reivindica até `limit` jobs prontos (ou com lease vencido), por
+        prioridade e run_at. Cada reivindicação conta como uma tentativa.
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        with get_jobs_connection(self.db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Lease vencido sem tentativas sobrando: o processo morreu
+                # em todas elas, não adianta insistir
+                conn.execute(
+                    """
+                    UPDATE jobs
+                    SET status = ?, last_error = 'lease expired', updated_at = ?
+                    WHERE status = ? AND lease_until < ? AND attempts >= max_attempts
+                    """,
+                    (STATUS_FAILED, now, STATUS_RUNNING, now),
+                )
+                ids = [
+                    row["id"]
+                    for row in conn.execute(
+                        """
+                        SELECT id FROM jobs
+                        WHERE (status = ? AND run_at <= ?)
+                           OR (status = ? AND lease_until < ?)
+                        ORDER BY priority DESC, run_at, id
+                        LIMIT ?
+                        """,
+                        (STATUS_QUEUED, now, STATUS_RUNNING, now, limit),
+                    )
+                ]
+                if not ids:
+                    conn.execute("COMMIT")
+                    return []
+                placeholders = ", ".join("?" for _ in ids)
+                conn.execute(
+                    f"""
+                    UPDATE jobs
+                    SET status = ?, attempts = attempts + 1, lease_until = ?,
+                        locked_by = ?, updated_at = ?
+                    WHERE id IN ({placeholders})
+                    """,
+                    (STATUS_RUNNING, now + lease_seconds, worker_id, now, *ids),
+                )
+                rows = conn.execute(
+                    f"SELECT * FROM jobs WHERE id IN ({placeholders}) "
+                    "ORDER BY priority DESC, run_at, id",
+                    ids,
+                ).fetchall()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [_row_to_dict(row) for row in rows]
+
+    def extend_leases(
+        self, job_ids: Iterable[int], worker_id: str, lease_seconds: float
+    ) -> None:
+        """Renova o lease dos jobs ainda em execução por este consumidor"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        with get_jobs_connection(self.db_path) as conn:
+            conn.execute(
+                f"""
+                UPDATE jobs SET lease_until = ?
+                WHERE locked_by = ? AND status = ? AND id IN ({placeholders})
+                """,
+                (time.time() + lease_seconds, worker_id, STATUS_RUNNING, *job_ids),
+            )
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        return self._finish(job_id, worker_id, STATUS_DONE, None, None)
+
+    def retry(self, job_id: int, worker_id: str, error: str, run_at: float) -> bool:
+        return self._finish(job_id, worker_id, STATUS_QUEUED, error, run_at)
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        return self._finish(job_id, worker_id, STATUS_FAILED, error, None)
+
+    def _finish(
+        self,
+        job_id: int,
+        worker_id: str,
+        status: str,
+        error: Optional[str],
+        run_at: Optional[float],
+    ) -> bool:
+        """False se o lease já não é deste consumidor (job reivindicado por outro)"""
+        with get_jobs_connection(self.db_path) as conn:
+            cur = conn.execute(
+                """
+                UPDATE jobs
+                SET status = ?, last_error = ?, run_at = COALESCE(?, run_at),
+                    lease_until = NULL, locked_by = NULL, updated_at = ?
+                WHERE id = ? AND locked_by = ? AND status = ?
+                """,
+                (status, error, run_at, time.time(), job_id, worker_id, STATUS_RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def next_run_at(self) -> Optional[float]:
+        """Instante do próximo job que ficará pronto (ou lease que vence)"""
+        with get_jobs_connection(self.db_path) as conn:
+            row = conn.execute(
+                """
+                SELECT MIN(CASE WHEN status = ? THEN run_at ELSE lease_until END)
+                FROM jobs WHERE status IN (?, ?)
+                """,
+                (STATUS_QUEUED, STATUS_QUEUED, STATUS_RUNNING),
+            ).fetchone()
+        return row[0]
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with get_jobs_connection(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with get_jobs_connection(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """Remove jobs concluídos há mais de `older_than_seconds` (falhas ficam)"""
+        with get_jobs_connection(self.db_path) as conn:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE status = ? AND updated_at < ?",
+                (STATUS_DONE, time.time() - older_than_seconds),
+            )
+            return cur.rowcount
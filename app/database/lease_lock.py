@@ -0,0 +1,256 @@
+# app/database/lease_lock.py
+"""
+Lease entre processos gravado em SQLite (integrations.db).
+
+Protege operações que só podem rodar uma vez por vez em toda a instalação,
+como a reautenticação da Conta Azul via Selenium. O dono do lease renova a
+validade em segundo plano enquanto trabalha; se o processo morrer, o lease
+expira sozinho após `ttl` segundos. Threads do mesmo processo esperam num
+lock local antes de disputar a linha no banco.
+
+Funciona igual no Windows e no Linux (sem fcntl/msvcrt).
+"""
+
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from app.database.database import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_TTL = 300  # segundos
+POLL_INTERVAL = 1.0
+
+
+class LeaseTimeoutError(TimeoutError):
+    """O lease não foi obtido dentro do tempo de espera"""
+
+
+def init_leases(db_path: str = DB_PATH) -> None:
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS service_leases (
+                name        TEXT PRIMARY KEY,
+                owner       TEXT NOT NULL,
+                acquired_at REAL NOT NULL,
+                expires_at  REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class LeaseLock:
+    """Lock nomeado com validade (lease), compartilhado entre processos"""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = DEFAULT_LEASE_TTL,
+        db_path: str = DB_PATH,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "acquisitions": 0,
+            "waiters": 0,
+            "wait_timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "last_hold_seconds": None,
+            "max_hold_seconds": 0.0,
+        }
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        init_leases(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transações explícitas com BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def try_acquire(self) -> bool:
+        """Tenta obter (ou renovar) o lease sem esperar"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT owner, expires_at FROM service_leases WHERE name = ?",
+                (self.name,),
+            ).fetchone()
+            if row and row[0] != self.owner and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                """
+                INSERT INTO service_leases (name, owner, acquired_at, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    owner = excluded.owner,
+                    acquired_at = excluded.acquired_at,
+                    expires_at = excluded.expires_at
+                """,
+                (self.name, self.owner, now, now + self.ttl),
+            )
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def renew(self) -> bool:
+        """Estende a validade; False se o lease não é mais nosso"""
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "UPDATE service_leases SET expires_at = ? WHERE name = ? AND owner = ?",
+                (time.time() + self.ttl, self.name, self.owner),
+            )
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM service_leases WHERE name = ? AND owner = ?",
+                (self.name, self.owner),
+            )
+        finally:
+            conn.close()
+
+    def current_holder(self) -> Optional[Dict[str, Any]]:
+        """Dono e validade do lease ativo, se houver"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT owner, acquired_at, expires_at FROM service_leases "
+                "WHERE name = ? AND expires_at > ?",
+                (self.name, time.time()),
+            ).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        return {"owner": row[0], "acquired_at": row[1], "expires_at": row[2]}
+
+    @contextmanager
+    def hold(self, timeout: float) -> Iterator[bool]:
+        """
+        Aguarda até `timeout` segundos pelo lease e o mantém (renovando em
+        segundo plano) durante o bloco. Produz True se precisou esperar por
+        outro dono — sinal de que o trabalho pode já ter sido feito por ele.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = not self._local_lock.acquire(blocking=False)
+        if waited:
+            self._record_waiter()
+            if not self._local_lock.acquire(timeout=max(0.0, deadline - started)):
+                self._record_timeout(started)
+                raise LeaseTimeoutError(f"Lease {self.name} ocupado neste processo")
+        try:
+            while not self.try_acquire():
+                if not waited:
+                    waited = True
+                    self._record_waiter()
+                    holder = self.current_holder() or {}
+                    logger.info(
+                        f"⏳ Lease {self.name} em uso por {holder.get('owner')}; "
+                        "aguardando"
+                    )
+                if time.monotonic() >= deadline:
+                    self._record_timeout(started)
+                    raise LeaseTimeoutError(
+                        f"Lease {self.name} não liberado em {timeout:.0f}s"
+                    )
+                time.sleep(self.poll_interval)
+
+            waited_seconds = time.monotonic() - started
+            held_at = time.monotonic()
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat,
+                args=(stop,),
+                name=f"lease-{self.name}",
+                daemon=True,
+            )
+            heartbeat.start()
+            with self._stats_lock:
+                self._stats["acquisitions"] += 1
+                if waited:
+                    self._stats["total_wait_seconds"] += waited_seconds
+            try:
+                yield waited
+            finally:
+                stop.set()
+                heartbeat.join(timeout=5)
+                self.release()
+                self._record_hold(time.monotonic() - held_at)
+        finally:
+            self._local_lock.release()
+
+    def _heartbeat(self, stop: threading.Event) -> None:
+        while not stop.wait(self.ttl / 3):
+            if not self.renew():
+                logger.warning(f"Lease {self.name} perdido durante a execução")
+                return
+
+    def _record_waiter(self) -> None:
+        with self._stats_lock:
+            self._stats["waiters"] += 1
+
+    def _record_timeout(self, started: float) -> None:
+        with self._stats_lock:
+            self._stats["wait_timeouts"] += 1
+            self._stats["total_wait_seconds"] += time.monotonic() - started
+
+    def _record_hold(self, seconds: float) -> None:
+        with self._stats_lock:
+            self._stats["last_hold_seconds"] = round(seconds, 3)
+            self._stats["max_hold_seconds"] = max(
+                self._stats["max_hold_seconds"], round(seconds, 3)
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["total_wait_seconds"] = round(stats["total_wait_seconds"], 3)
+        stats["holder"] = self.current_holder()
+        return stats
+
+
+_leases: Dict[str, LeaseLock] = {}
+_leases_lock = threading.Lock()
+
+
+def get_lease_lock(name: str, ttl: float = DEFAULT_LEASE_TTL) -> LeaseLock:
+    """Lease compartilhado pelo processo para o nome informado"""
+    with _leases_lock:
+        lease = _leases.get(name)
+        if lease is None:
+            lease = LeaseLock(name, ttl=ttl)
+            _leases[name] = lease
+        return lease
+
+
+def get_lease_stats() -> Dict[str, Dict[str, Any]]:
+    """Métricas de todos os leases usados neste processo"""
+    with _leases_lock:
+        leases = list(_leases.values())
+    return {lease.name: lease.get_stats() for lease in leases}
@@ -0,0 +1,107 @@
+# app/database/outbound_queue.py
+"""
+Fila persistente dos envios ao Digisac.
+
+O dispatcher grava cada operação aqui antes de enfileirá-la em memória e só
+apaga a linha quando o envio dá certo (ou quando ela vai para as dead
+letters). Assim um restart não perde mensagens: as linhas que sobraram são
+recarregadas, na ordem original, quando o servidor sobe.
+
+PDFs do cache do relay entram no payload só como caminho e sha256; enquanto
+uma linha pendente (ou uma dead letter) referencia o blob, o relay não o
+remove (`pinned_pdf_blobs`).
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from app.database.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def add_outbound(kind: str, contact_id: str, payload: Dict[str, Any]) -> int:
+    """Grava a operação pendente e retorna o id da linha"""
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO digisac_outbound (kind, contact_id, payload)
+            VALUES (?, ?, ?)
+            """,
+            (kind, contact_id, json.dumps(payload)),
+        )
+        conn.commit()
+        return cur.lastrowid
+
+
+def update_outbound_attempt(
+    outbound_id: int, attempts: int, error: Optional[str]
+) -> None:
+    with get_db_connection() as conn:
+        conn.execute(
+            """
+            UPDATE digisac_outbound
+            SET attempts = ?, last_error = ?
+            WHERE id = ?
+            """,
+            (attempts, error, outbound_id),
+        )
+        conn.commit()
+
+
+def delete_outbound(outbound_id: int) -> None:
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM digisac_outbound WHERE id = ?", (outbound_id,))
+        conn.commit()
+
+
+def dead_letter_outbound(
+    outbound_id: int,
+    kind: str,
+    contact_id: Optional[str],
+    payload: Dict[str, Any],
+    error: Optional[str],
+    attempts: int,
+) -> int:
+    """
+    Move a operação para digisac_dead_letters numa única transação e retorna
+    o id da dead letter
+    """
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO digisac_dead_letters
+                (kind, contact_id, payload, error, attempts)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (kind, contact_id, json.dumps(payload), error, attempts),
+        )
+        conn.execute("DELETE FROM digisac_outbound WHERE id = ?", (outbound_id,))
+        conn.commit()
+        return cur.lastrowid
+
+
+def list_outbound() -> List[Dict[str, Any]]:
+    """Operações pendentes, na ordem em que foram enfileiradas"""
+    with get_db_connection() as conn:
+        rows = conn.execute("SELECT * FROM digisac_outbound ORDER BY id").fetchall()
+    entries = []
+    for row in rows:
+        entry = dict(row)
+        entry["payload"] = json.loads(entry["payload"])
+        entries.append(entry)
+    return entries
+
+
+def pinned_pdf_blobs() -> Set[str]:
+    """sha256 dos PDFs do relay referenciados por envios pendentes ou dead letters"""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT json_extract(payload, '$.file.sha256') FROM digisac_outbound
+            UNION
+            SELECT json_extract(payload, '$.file.sha256') FROM digisac_dead_letters
+            """
+        ).fetchall()
+    return {row[0] for row in rows if row[0]}
@@ -0,0 +1,80 @@
+# app/database/ticket_state.py
+"""
+Espelho local do estado dos tickets do Digisac.
+
+Alimentado pelo webhook de eventos de ticket (aberto, transferido, fechado).
+Eventos fora de ordem são descartados comparando o `updatedAt` do ticket
+com o do último evento aplicado.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.database.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def upsert_ticket_state(
+    ticket_id: str,
+    contact_id: str,
+    is_open: bool,
+    department_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    event: Optional[str] = None,
+    event_at: Optional[str] = None,
+) -> bool:
+    """
+    Grava o estado do ticket. Retorna False se o evento é mais antigo que o
+    último aplicado (nada muda).
+    """
+    event_at = event_at or datetime.now(timezone.utc).isoformat()
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO ticket_state
+                (ticket_id, contact_id, department_id, user_id,
+                 is_open, last_event, event_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(ticket_id) DO UPDATE SET
+                contact_id = excluded.contact_id,
+                department_id = excluded.department_id,
+                user_id = excluded.user_id,
+                is_open = excluded.is_open,
+                last_event = excluded.last_event,
+                event_at = excluded.event_at,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE excluded.event_at >= ticket_state.event_at
+            """,
+            (
+                ticket_id,
+                contact_id,
+                department_id,
+                user_id,
+                1 if is_open else 0,
+                event,
+                event_at,
+            ),
+        )
+        conn.commit()
+        return cur.rowcount == 1
+
+
+def get_ticket_state(ticket_id: str) -> Optional[Dict[str, Any]]:
+    with get_db_connection() as conn:
+        row = conn.execute(
+            "SELECT * FROM ticket_state WHERE ticket_id = ?", (ticket_id,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def get_open_tickets_by_contact(contact_id: str) -> List[Dict[str, Any]]:
+    """Tickets do contato que, pelos eventos recebidos, seguem abertos"""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT * FROM ticket_state WHERE contact_id = ? AND is_open = 1 "
+            "ORDER BY event_at DESC",
+            (contact_id,),
+        ).fetchall()
+    return [dict(row) for row in rows]
@@ -2,10 +2,12 @@
 
 """Rotas de webhook para integração com Bitrix24 e validação de CNPJ."""
 from datetime import datetime
+from typing import Optional
 import logging
 import json
 from flask import Blueprint, request, jsonify
 from app.services.conta_azul.conta_azul_services import (
+    SaleValidationError,
     extract_billing_info,
     handle_sale_creation_certif_digital,
 )
@@ -22,14 +24,21 @@ from app.services.digisac.digisac_services import (
     close_ticket_digisac,
 )
 from app.services.bitrix24.bitrix_services import (
-    add_comment_crm_timeline,
     verify_webhook_signature,
     update_company_process_cnpj,
-    get_cnpj_receita,
+    lookup_cnpj_receita,
     post_destination_api,
+    add_comment_crm_timeline,
     update_crm_item,
     update_deal_item,
 )
+from app.services.continuations import ENTITY_DEAL, wake_continuations
+from app.services.jobs import (
+    PRIORITY_HIGH,
+    PermanentJobError,
+    enqueue_job,
+    job_task,
+)
 from app.services.renewal_services import (
     get_pending,
     update_pending,
@@ -43,7 +52,15 @@ from app.services.renewal_services import (
     get_or_create_session,
     record_command,
     try_finalize_session,
+    count_waiting_ticket_flows,
+)
+from app.services.digisac.open_tickets import (
+    get_open_ticket_snapshot,
+    ticket_flow_wakeup,
+    verify_ticket_event_token,
 )
+from app.database.ticket_state import upsert_ticket_state
+from app.database.identity_links import DOCUMENT_KEY_PREFIX, get_identity_links
 from app.utils.utils import respond_with_200_on_exception, standardize_phone_number
 
 
@@ -62,6 +79,10 @@ VALID_STATUSES = [
     "complete",
 ]
 
+# Tarefas da fila de jobs disparadas por estes webhooks
+JOB_DIGISAC_MESSAGE = "digisac_message"
+JOB_COBRANCA_GERADA = "cobranca_gerada"
+
 
 @webhook_bp.route("/consulta-receita", methods=["POST"])
 def valida_cnpj_receita_bitrix():
@@ -81,16 +102,23 @@ def valida_cnpj_receita_bitrix():
 
     id_empresa = request.args["idEmpresa"]
     cnpj = request.args["CNPJ"]
-    raw = get_cnpj_receita(cnpj)
-    if not raw:
+    lookup = lookup_cnpj_receita(cnpj)
+    if not lookup:
         return jsonify({"error": "Dados do CNPJ não encontrados"}), 502
 
-    processed = update_company_process_cnpj(raw, id_empresa)
-    api_url = (
-        "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs/crm.company.update"
+    processed = update_company_process_cnpj(lookup["data"], id_empresa)
+    response = post_destination_api(processed, "crm.company.update")
+    return (
+        jsonify(
+            {
+                "status": "received",
+                "response": response,
+                "cnpj_source": lookup["source"],
+                "cnpj_age_seconds": lookup["age_seconds"],
+            }
+        ),
+        200,
     )
-    response = post_destination_api(processed, api_url)
-    return jsonify({"status": "received", "response": response}), 200
 
 
 @webhook_bp.route("/aviso-certificado", methods=["POST"])
@@ -149,6 +177,7 @@ def envia_comunicado_para_cliente_certif_digital_digisac():
         logger.info(f"Duplicado: {webhook_id} para SPA {spa_id}")
         return jsonify({"status": "ignored", "message": "Evento já processado"}), 200
 
+    # O vínculo de identidade da SPA é gravado pelo add_pending do decorator
     std_number = standardize_phone_number(contact_number)
 
     # Notificações
@@ -179,6 +208,91 @@ def envia_comunicado_para_cliente_certif_digital_digisac():
     return jsonify({"status": "success", "spa_id": spa_id}), 200
 
 
+def _contact_number_for_digisac_contact(contact_id: str) -> Optional[str]:
+    """Traduz contato para número (chave canônica = formato das pendências)"""
+    identity = get_identity_links().find_by_digisac_contact(contact_id)
+    if identity and not identity["canonical_key"].startswith(DOCUMENT_KEY_PREFIX):
+        return identity["canonical_key"]
+    return _get_contact_number_by_id(contact_id)
+
+
+@webhook_bp.route("/digisac/ticket-event", methods=["POST"])
+@respond_with_200_on_exception
+def evento_ticket_digisac():
+    """
+    Eventos de ticket do Digisac (aberto, transferido, fechado): atualiza
+    ticket_state e o snapshot de tickets abertos; ao fechar, libera na hora
+    os fluxos do contato que aguardam em ticket_flow_queue.
+    """
+    token = request.headers.get("X-Webhook-Token") or request.args.get("token")
+    if not verify_ticket_event_token(token):
+        logger.warning("Token inválido recebido em /digisac/ticket-event.")
+        return jsonify({"error": "Token inválido"}), 403
+
+    payload = request.get_json(silent=True) or {}
+    event = str(payload.get("event") or "")
+    data = payload.get("data", {}) or {}
+    ticket_id = data.get("id")
+    contact_id = data.get("contactId")
+
+    if not event.startswith("ticket") or not ticket_id or not contact_id:
+        return jsonify({"status": "ignored", "reason": "Evento sem ticket"}), 200
+
+    is_open = data.get("isOpen")
+    if is_open is None:
+        is_open = not event.endswith("closed")
+
+    applied = upsert_ticket_state(
+        ticket_id=ticket_id,
+        contact_id=contact_id,
+        is_open=bool(is_open),
+        department_id=data.get("departmentId"),
+        user_id=data.get("userId"),
+        event=event,
+        event_at=data.get("updatedAt"),
+    )
+    if not applied:
+        logger.info(f"Evento {event} do ticket {ticket_id} fora de ordem; ignorado")
+        return jsonify({"status": "stale"}), 200
+
+    get_open_ticket_snapshot().apply_event(
+        contact_id,
+        (
+            {
+                "id": ticket_id,
+                "departmentId": data.get("departmentId"),
+                "userId": data.get("userId"),
+            }
+            if is_open
+            else None
+        ),
+    )
+
+    released = 0
+    if not is_open:
+        contact_number = _contact_number_for_digisac_contact(contact_id)
+        if contact_number:
+            released = count_waiting_ticket_flows(contact_number)
+        if released:
+            logger.info(
+                f"Ticket {ticket_id} fechado: liberando {released} fluxo(s) "
+                f"de {contact_number}"
+            )
+            ticket_flow_wakeup.set()
+
+    return (
+        jsonify(
+            {
+                "status": "ok",
+                "ticket_id": ticket_id,
+                "is_open": bool(is_open),
+                "released": released,
+            }
+        ),
+        200,
+    )
+
+
 @webhook_bp.route("/digisac", methods=["POST"])
 @respond_with_200_on_exception
 @queue_if_open_ticket_route()
@@ -190,8 +304,7 @@ def resposta_certificado_digisac():
     message_id = message.get("id")
     contact_id = data.get("contactId")
 
-    # Traduz contato para número
-    contact_number = _get_contact_number_by_id(contact_id)
+    contact_number = _contact_number_for_digisac_contact(contact_id)
     if not contact_number:
         return jsonify({"status": "ignored", "reason": "Contato não encontrado"}), 200
 
@@ -226,6 +339,23 @@ def resposta_certificado_digisac():
     # Cria/atualiza sessão ANTES de processar a mensagem
     get_or_create_session(contact_number)
 
+    # Renovação, venda no Conta Azul e escritas no CRM rodam no JobQueueWorker
+    job_id = enqueue_job(
+        JOB_DIGISAC_MESSAGE,
+        {"spa_id": spa_id, "webhook": payload},
+        priority=PRIORITY_HIGH,
+        idempotency_key=f"{JOB_DIGISAC_MESSAGE}:{spa_id}:{message_id}",
+    )
+    return jsonify({"status": "queued", "spa_id": spa_id, "job_id": job_id}), 200
+
+
+@job_task(JOB_DIGISAC_MESSAGE)
+def _run_digisac_message_job(job: dict):
+    """Processa uma mensagem do /digisac fora da requisição do webhook"""
+    spa_id = job["spa_id"]
+    payload = job["webhook"]
+    message = (payload.get("data", {}) or {}).get("message", {}) or {}
+
     # Se já estiver processando, enfileira e notifica (se for primeira vez)
     if not try_lock_processing(spa_id):
         add_pending_message(spa_id, payload)
@@ -241,8 +371,7 @@ def resposta_certificado_digisac():
         except Exception:
             logger.exception("Falha ao enviar notificação de processamento")
         """
-
-        return jsonify({"status": "queued"}), 200
+        return
 
     # Lock obtido → processa, libera e esvazia fila
     try:
@@ -251,8 +380,6 @@ def resposta_certificado_digisac():
         set_processing_status(spa_id, False)
         process_pending_messages(spa_id, _process_digisac_message)
 
-    return jsonify({"status": "processed", "spa_id": spa_id}), 200
-
 
 def _process_digisac_message(spa_id: int, user_message: str):
     """Processa a mensagem do usuário e atualiza o estado do negócio"""
@@ -267,11 +394,6 @@ def _process_digisac_message(spa_id: int, user_message: str):
     # Interpretar a resposta do usuário
     action = interpret_certification_response(user_message)
     logger.info(f"Ação detectada: {action} (Estado atual: {current_status})")
-    if action in ["renew", "info", "refuse"]:
-        from app.services.renewal_services import record_command, try_finalize_session
-
-        record_command(pending["contact_number"])
-        try_finalize_session(pending["contact_number"])
 
     # Executar ações com base na intenção
     if action == "renew" and current_status in ["pending", "info_sent"]:
@@ -285,9 +407,22 @@ def _process_digisac_message(spa_id: int, user_message: str):
         # //Melhorar o handle de comandos inválidos
         # _send_invalid_response_notification(contact_number)
 
+    # Só depois da ação: se ela falhar, a nova tentativa do job não conta o
+    # comando duas vezes
+    if action in ["renew", "info", "refuse"]:
+        from app.services.renewal_services import record_command, try_finalize_session
+
+        record_command(pending["contact_number"])
+        try_finalize_session(pending["contact_number"])
+
 
 def _handle_renew_action(spa_id: int, pending: dict):
-    """Trata solicitação de renovação - fluxo revisado."""
+    """
+    Trata solicitação de renovação - fluxo revisado.
+    A mensagem de cobrança só sai depois que a venda e o stage foram
+    gravados, então uma nova tentativa do job não a reenvia. Dados de venda
+    inválidos (SaleValidationError) viram PermanentJobError.
+    """
     logger.info(f"Iniciando renovação para SPA ID {spa_id}")
     contact_number = pending["contact_number"]
     company_name = pending["company_name"]
@@ -303,18 +438,23 @@ def _handle_renew_action(spa_id: int, pending: dict):
             last_interaction=datetime.now(),
         )
 
-        build_send_billing_message(
-            contact_number=contact_number, company_name=company_name
-        )
-
-        # Cria a venda (idempotente)
+        # Cria a venda (idempotente: com sale_id gravado, reaproveita a venda)
         result = handle_sale_creation_certif_digital(
             contact_number, pending["document"], pending["deal_type"]
         )
         sale_id = result["sale"]["id"]
 
-        # Atualiza CRM com o novo stage e sale_id
-        update_crm_item(137, spa_id, {"stageId": "DT137_36:UC_90X241"})
+        # Grava o sale_id já: se o CRM falhar, a nova tentativa não cria
+        # outra venda
+        update_pending(
+            spa_id,
+            status="sale_creating",
+            sale_id=sale_id,
+            last_interaction=datetime.now(),
+        )
+
+        # Atualiza CRM com o novo stage; o estado local só muda se o CRM aceitou
+        _update_spa_stage(spa_id, "DT137_36:UC_90X241")
         update_pending(
             spa_id,
             status="sale_created",
@@ -331,14 +471,37 @@ def _handle_renew_action(spa_id: int, pending: dict):
             retry_count=pending.get("retry_count", 0) + 1,
             last_interaction=datetime.now(),
         )
+        # Só dados inválidos da venda são definitivos; cliente não encontrado
+        # (snapshot defasado), auth e rede seguem com retry
+        if isinstance(e, SaleValidationError):
+            raise PermanentJobError(str(e)) from e
         raise
     finally:
         set_processing_status(spa_id, False)
+
+    # Venda criada e gravada: só agora avisa o cliente. Uma falha aqui não
+    # refaz a venda (o status já é sale_created), então só é registrada
+    try:
+        build_send_billing_message(
+            contact_number=contact_number, company_name=company_name
+        )
+    except Exception:
+        logger.exception(
+            f"Venda criada para SPA {spa_id}, mas a mensagem de cobrança falhou"
+        )
+
     # Só depois de tudo: envia a proposta via Digisac
     # send_proposal_file(contact_number, company_name, spa_id)
     # logger.info(f"Proposta enviada para SPA {spa_id}")
 
 
+def _update_spa_stage(spa_id: int, stage_id: str) -> None:
+    """Move o card SPA de stage; levanta erro se o Bitrix não aceitou"""
+    result = update_crm_item(137, spa_id, {"stageId": stage_id})
+    if "error" in result:
+        raise RuntimeError(f"Falha ao mover o SPA {spa_id} para {stage_id}: {result}")
+
+
 def _handle_info_action(spa_id: int, pending: dict):
     """Trata solicitação de informações"""
     logger.info(f"Enviando informações para SPA ID {spa_id}")
@@ -362,15 +525,15 @@ def _handle_refuse_action(spa_id: int):
     """Trata recusa do cliente"""
     logger.info(f"Registrando recusa para SPA ID {spa_id}")
 
+    # Atualizar CRM primeiro: o estado local só muda se o CRM aceitou
+    _update_spa_stage(spa_id, "DT137_36:UC_AY5334")
+
     # Atualizar estado
     update_pending(
         spa_id,
         status="customer_retention",
         last_interaction=datetime.now(),
     )
-
-    # Atualizar CRM
-    update_crm_item(137, spa_id, {"stageId": "DT137_36:UC_AY5334"})
     logger.info(f"Recusa registrada para SPA ID {spa_id}")
 
 
@@ -410,39 +573,56 @@ def cobranca_gerada():
     if not pending:
         return jsonify({"error": "Nenhuma solicitação pendente"}), 404
 
-    try:
-        info = extract_billing_info(contact_number)
-        update_pending(
-            pending.get("spa_id"),
-            status="billing_generated",
-            financial_event_id=info["financial_event_id"],
-            last_interaction=datetime.now(),
-        )
+    spa_id = pending.get("spa_id")
+    job_id = enqueue_job(
+        JOB_COBRANCA_GERADA,
+        {"contact_number": contact_number, "deal_id": deal_id, "spa_id": spa_id},
+        idempotency_key=f"{JOB_COBRANCA_GERADA}:{spa_id}:{deal_id}",
+    )
+    return (
+        jsonify(
+            {
+                "status": "queued",
+                "message": "Cobrança será identificada e o status atualizado",
+                "job_id": job_id,
+            }
+        ),
+        200,
+    )
 
-        update_deal_item(
-            entity_type_id=18,
-            deal_id=deal_id,
-            fields={
-                "UF_CRM_1751478607": info["boleto_url"],
-            },
-        )
 
-        close_ticket_digisac(contact_number)
+@job_task(JOB_COBRANCA_GERADA)
+def _run_cobranca_gerada_job(job: dict):
+    """Registra a cobrança do Conta Azul, grava o boleto no negócio e encerra o ticket"""
+    contact_number = job["contact_number"]
+    deal_id = job["deal_id"]
 
-        return (
-            jsonify(
-                {
-                    "status": "billing_generated",
-                    "message": "Cobrança identificada e status atualizado",
-                    "event_id": info["financial_event_id"],
-                }
-            ),
-            200,
-        )
+    # Falha aqui (venda ainda sem cobrança no Conta Azul) é retentada pelo worker
+    info = extract_billing_info(contact_number)
+    update_pending(
+        job["spa_id"],
+        status="billing_generated",
+        financial_event_id=info["financial_event_id"],
+        last_interaction=datetime.now(),
+    )
 
-    except Exception as e:
-        logger.exception("Erro ao processar cobrança: %s", e)
-        return jsonify({"error": str(e)}), 500
+    result = update_deal_item(
+        entity_type_id=18,
+        deal_id=deal_id,
+        fields={
+            "UF_CRM_1751478607": info["boleto_url"],
+        },
+    )
+    if "error" in result:
+        raise RuntimeError(f"Falha ao gravar o boleto no negócio {deal_id}: {result}")
+
+    close_ticket_digisac(contact_number)
+
+    # O boleto acabou de ser gravado: o envio aguardando esse campo já pode seguir
+    wake_continuations(ENTITY_DEAL, deal_id)
+    logger.info(
+        f"Cobrança {info['financial_event_id']} registrada para SPA {job['spa_id']}"
+    )
 
 
 @webhook_bp.route("/envio-cobranca", methods=["POST"])
@@ -467,34 +647,22 @@ def envio_cobranca():
         return jsonify({"error": "Nenhuma solicitação pendente"}), 404
 
     try:
-        build_billing_certification_pdf(
+        # Envio, mudança de etapa e encerramento do ticket acontecem na
+        # continuação, assim que a URL do boleto estiver no negócio
+        result = build_billing_certification_pdf(
             contact_number=pending.get("contact_number"),
             company_name=pending.get("company_name"),
             deal_id=deal_id,
             filename=f"Cobrança_certificado_digital_-_{pending.get('company_name', '')}.pdf",
+            spa_id=pending.get("spa_id"),
         )
 
-        update_pending(
-            pending.get("spa_id"),
-            status="billing_pdf_sent",
-            last_interaction=datetime.now(),
-        )
-
-        update_deal_item(
-            entity_type_id=18,
-            deal_id=deal_id,
-            fields={
-                "STAGE_ID": "C18:PREPARATION",
-            },
-        )
-
-        close_ticket_digisac(pending.get("contact_number"))
-
         return (
             jsonify(
                 {
-                    "status": "billing_sent",
-                    "message": "Boleto enviado com sucesso via Digisac",
+                    "status": "billing_scheduled",
+                    "message": "Boleto será enviado via Digisac assim que disponível",
+                    "continuation_id": result.get("continuation_id"),
                 }
             ),
             200,
@@ -505,6 +673,33 @@ def envio_cobranca():
         return jsonify({"error": str(e)}), 500
 
 
+@webhook_bp.route("/crm-atualizado", methods=["POST"])
+def crm_item_atualizado():
+    """
+    Webhook de saída do Bitrix (ONCRMDEALUPDATE / ONCRMDYNAMICITEMUPDATE ou
+    regra de automação com ?entityTypeId=&id=): antecipa a verificação das
+    continuações que aguardam um campo dessa entidade.
+    """
+    signature = request.form.get("auth[member_id]", "")
+    if not verify_webhook_signature(signature):
+        return jsonify({"error": "Assinatura inválida"}), 403
+
+    params = {**request.form.to_dict(), **request.args.to_dict()}
+    entity_id = params.get("data[FIELDS][ID]") or params.get("id")
+    entity_type_id = params.get("data[FIELDS][ENTITY_TYPE_ID]") or params.get(
+        "entityTypeId"
+    )
+    if not entity_type_id and params.get("event", "").upper() == "ONCRMDEALUPDATE":
+        entity_type_id = ENTITY_DEAL
+
+    if not entity_id or not str(entity_type_id or "").isdigit():
+        return jsonify({"error": "Entidade não informada"}), 400
+
+    woken = wake_continuations(int(entity_type_id), entity_id)
+    logger.debug(f"/crm-atualizado {entity_type_id}/{entity_id}: {woken} continuações")
+    return jsonify({"status": "received", "continuations": woken}), 200
+
+
 @webhook_bp.route("/agendamento-certificado", methods=["POST"])
 @respond_with_200_on_exception
 @queue_if_open_ticket_route()
@@ -12,7 +12,7 @@ def auto_auth():
     """Endpoint para executar todo fluxo automatizado de OAuth e retornar tokens."""
     try:
         # Executa Selenium, troca code por token e captura dados
-        token_data = auto_authenticate()
+        token_data = auto_authenticate(force=True)
         # Retorna apenas o access_token para simplicidade
         return (
             jsonify(
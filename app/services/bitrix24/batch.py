@@ -0,0 +1,222 @@
+# app/services/bitrix24/batch.py
+"""
+Bitrix24 batch builder following Single Responsibility Principle.
+
+Collects up to 50 REST commands and sends them to the portal in a single
+`batch` call, mapping each command's result or error back to its key.
+`execute()` reports errors per command; `flush()` raises when any failed.
+
+Meant for bulk work (CNPJ enrichment, BitrixCRMService.batch()); webhook
+handlers write one or two fields and call the REST methods directly.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+
+from app.services.http_client import HTTPClient, get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+def _flatten_params(value: Any, prefix: str) -> List[Tuple[str, str]]:
+    """Flatten nested params PHP-style (fields[stageId]=...), as Bitrix expects"""
+    if isinstance(value, dict):
+        pairs = []
+        for key, item in value.items():
+            pairs.extend(_flatten_params(item, f"{prefix}[{key}]"))
+        return pairs
+    if isinstance(value, (list, tuple)):
+        pairs = []
+        for index, item in enumerate(value):
+            pairs.extend(_flatten_params(item, f"{prefix}[{index}]"))
+        return pairs
+    if value is None:
+        return [(prefix, "")]
+    if isinstance(value, bool):
+        return [(prefix, "1" if value else "0")]
+    return [(prefix, str(value))]
+
+
+def build_command(method: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Encode a REST call as a batch command string (method?query)"""
+    pairs = []
+    for key, value in (params or {}).items():
+        pairs.extend(_flatten_params(value, key))
+    return f"{method}?{urlencode(pairs)}" if pairs else method
+
+
+class BitrixBatchError(RuntimeError):
+    """A batch could not be sent or some of its commands failed"""
+
+    def __init__(self, errors: Dict[str, Dict[str, Any]]):
+        self.errors = errors
+        super().__init__(f"Bitrix batch failed: {errors}")
+
+
+class BitrixBatch:
+    """
+    Builder for Bitrix24 `batch` requests.
+    Commands are keyed; a later command may reference an earlier result
+    with Bitrix's `$result[key]` syntax inside its params.
+    """
+
+    MAX_COMMANDS = 50
+
+    def __init__(self, http: Optional[HTTPClient] = None, halt_on_error: bool = False):
+        self.http = http or get_http_client("bitrix24")
+        self.halt_on_error = halt_on_error
+        self._commands: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def add(
+        self,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        key: Optional[str] = None,
+    ) -> str:
+        """Queue a command and return its key"""
+        if len(self._commands) >= self.MAX_COMMANDS:
+            raise ValueError(f"Bitrix batch is limited to {self.MAX_COMMANDS} commands")
+        key = key or f"cmd{len(self._commands)}"
+        if key in self._commands:
+            raise ValueError(f"Duplicate batch command key: {key}")
+        self._commands[key] = (method, params or {})
+        return key
+
+    def get_item(
+        self, entity_type_id: int, item_id: int, key: Optional[str] = None
+    ) -> str:
+        """Queue crm.item.get"""
+        return self.add(
+            "crm.item.get",
+            {
+                "entityTypeId": entity_type_id,
+                "id": item_id,
+                "useOriginalUfNames": "Y",
+            },
+            key,
+        )
+
+    def update_item(
+        self,
+        entity_type_id: int,
+        item_id: int,
+        fields: Dict[str, Any],
+        key: Optional[str] = None,
+    ) -> str:
+        """Queue crm.item.update"""
+        return self.add(
+            "crm.item.update",
+            {"entityTypeId": entity_type_id, "id": item_id, "fields": fields},
+            key,
+        )
+
+    def get_deal(self, deal_id: int, key: Optional[str] = None) -> str:
+        """Queue crm.deal.get"""
+        return self.add("crm.deal.get", {"id": deal_id}, key)
+
+    def update_deal(
+        self,
+        entity_type_id: int,
+        deal_id: int,
+        fields: Dict[str, Any],
+        key: Optional[str] = None,
+    ) -> str:
+        """Queue crm.deal.update"""
+        return self.add(
+            "crm.deal.update",
+            {"entityTypeId": entity_type_id, "id": deal_id, "fields": fields},
+            key,
+        )
+
+    def add_timeline_comment(
+        self, fields: Dict[str, Any], key: Optional[str] = None
+    ) -> str:
+        """Queue crm.timeline.comment.add"""
+        return self.add("crm.timeline.comment.add", {"fields": fields}, key)
+
+    def start_workflow(
+        self,
+        template_id: int,
+        document_id: List[str],
+        parameters: Dict[str, Any] = None,
+        key: Optional[str] = None,
+    ) -> str:
+        """Queue bizproc.workflow.start"""
+        return self.add(
+            "bizproc.workflow.start",
+            {
+                "TEMPLATE_ID": template_id,
+                "DOCUMENT_ID": document_id,
+                "PARAMETERS": parameters or {},
+            },
+            key,
+        )
+
+    def execute(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Send the queued commands in one round-trip.
+        Returns {key: {"result": ...}} or {key: {"error": ..., ...}} per
+        command; the builder is emptied so it can be reused.
+        """
+        commands, self._commands = self._commands, {}
+        if not commands:
+            self.results = {}
+            return self.results
+
+        payload = {
+            "halt": 1 if self.halt_on_error else 0,
+            "cmd": {
+                key: build_command(method, params)
+                for key, (method, params) in commands.items()
+            },
+        }
+
+        try:
+            response = self.http.post("batch", json=payload)
+            response.raise_for_status()
+            body = response.json().get("result", {}) or {}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error executing Bitrix batch: {str(e)}")
+            self.results = {key: {"error": str(e)} for key in commands}
+            return self.results
+
+        # Bitrix returns [] instead of {} for empty maps
+        results = body.get("result") or {}
+        errors = body.get("result_error") or {}
+        self.results = {}
+        for key, (method, _) in commands.items():
+            if key in errors:
+                error = errors[key]
+                if not isinstance(error, dict):
+                    error = {"error": error}
+                logger.error(f"Bitrix batch command {key} ({method}) failed: {error}")
+                self.results[key] = error
+            elif key in results:
+                self.results[key] = {"result": results[key]}
+            else:
+                self.results[key] = {"error": "NOT_EXECUTED"}
+
+        logger.debug(
+            f"Bitrix batch: {len(commands)} commands, "
+            f"{sum(1 for r in self.results.values() if 'error' in r)} errors"
+        )
+        return self.results
+
+    def flush(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Send the queued commands like execute(), but raise BitrixBatchError
+        if the request or any command failed. Use it before recording local
+        state that depends on the CRM write.
+        """
+        results = self.execute()
+        errors = {key: result for key, result in results.items() if "error" in result}
+        if errors:
+            raise BitrixBatchError(errors)
+        return results
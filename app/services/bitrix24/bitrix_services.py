@@ -13,6 +13,8 @@ from typing import Optional, Dict
 import requests
 from flask import request, jsonify
 from app.config import Config
+from app.services.http_client import get_http_client
+from app.services.external.cnpj_lookup import get_cnpj_lookup_service
 from app.utils.utils import debug
 
 
@@ -75,13 +77,12 @@ def verify_webhook_signature(signature: str) -> bool:
 
 
 def get_cnpj_receita(cnpj: str) -> Optional[Dict]:
-    """Obtém dados de CNPJ da API pública da Receita WS.
+    """Obtém dados de CNPJ da API pública da Receita WS (via cache).
 
     :param cnpj: CNPJ a ser consultado (formatado ou não)
     :type cnpj: str
     :return: Dados do CNPJ ou None em caso de erro
     :rtype: dict or None
-    :raises: requests.exceptions.RequestException: Em caso de erro na requisição
 
     .. rubric:: Exemplo de Retorno
 
@@ -95,25 +96,18 @@ def get_cnpj_receita(cnpj: str) -> Optional[Dict]:
             }
         }
     """
-    cnpj_int = re.sub(r"[\.\/-]", "", str(cnpj))
-    url = f"https://publica.cnpj.ws/cnpj/{cnpj_int}"
+    result = lookup_cnpj_receita(cnpj)
+    return result["data"] if result else None
 
-    try:
-        response = requests.get(url=url, timeout=60)
-        response.raise_for_status()
-        data = response.json()
 
-        if "error" in data:
-            logger.error("Erro na API: %s", json.dumps(data["error"], indent=2))
-            return None
+def lookup_cnpj_receita(cnpj: str) -> Optional[Dict]:
+    """Consulta de CNPJ com cache persistente e limite de taxa.
 
-        logger.info("Dados CNPJ %s obtidos com sucesso", cnpj)
-        logger.debug("\nPayload:\n%s", json.dumps(data, indent=2, ensure_ascii=False))
-        return data
-
-    except requests.exceptions.RequestException as e:
-        logger.error("Falha na requisição: %s", str(e))
-        return None
+    :param cnpj: CNPJ a ser consultado (formatado ou não)
+    :return: ``{"data": <resposta da API>, "source": "cache" | "stale" | "api",
+        "age_seconds": <idade do dado>}`` ou None se indisponível
+    """
+    return get_cnpj_lookup_service().lookup(cnpj)
 
 
 def _safe_get(data: Dict, key: str, default: str = "") -> str:
@@ -222,7 +216,7 @@ def post_destination_api(processed_data: Dict, api_url: str) -> Dict:
 
     :param processed_data: Dados processados para envio
     :type processed_data: dict
-    :param api_url: URL da API de destino
+    :param api_url: Método REST do Bitrix24 (ex.: ``crm.company.update``) ou URL completa
     :type api_url: str
     :return: Resposta da API com status e conteúdo
     :rtype: dict
@@ -240,7 +234,9 @@ def post_destination_api(processed_data: Dict, api_url: str) -> Dict:
         }
     """
     try:
-        response = requests.post(api_url, json=processed_data, timeout=10)
+        response = get_http_client("bitrix24").post(
+            api_url, json=processed_data, timeout=10
+        )
         response.raise_for_status()
 
         return {
@@ -260,7 +256,7 @@ def post_destination_api(processed_data: Dict, api_url: str) -> Dict:
 
 @debug
 def update_crm_item(entity_type_id: int, spa_id: int, fields: Optional[dict]) -> dict:
-    url = "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs/crm.item.update"
+    url = "crm.item.update"
     payload = {
         "entityTypeId": entity_type_id,
         "id": spa_id,
@@ -268,7 +264,7 @@ def update_crm_item(entity_type_id: int, spa_id: int, fields: Optional[dict]) ->
     }
 
     try:
-        response = requests.post(url, json=payload, timeout=60)
+        response = get_http_client("bitrix24").post(url, json=payload, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -278,7 +274,7 @@ def update_crm_item(entity_type_id: int, spa_id: int, fields: Optional[dict]) ->
 
 @debug
 def get_crm_item(entity_type_id: int, spa_id: int) -> dict:
-    url = "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs/crm.item.get"
+    url = "crm.item.get"
     query = {
         "entityTypeId": entity_type_id,
         "id": spa_id,
@@ -286,7 +282,7 @@ def get_crm_item(entity_type_id: int, spa_id: int) -> dict:
     }
 
     try:
-        response = requests.get(url, params=query, timeout=60)
+        response = get_http_client("bitrix24").get(url, params=query, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -296,11 +292,11 @@ def get_crm_item(entity_type_id: int, spa_id: int) -> dict:
 
 @debug
 def get_deal_item(deal_id: int) -> dict:
-    url = "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs/crm.deal.get"
+    url = "crm.deal.get"
     query = {"id": deal_id}
 
     try:
-        response = requests.get(url, params=query, timeout=60)
+        response = get_http_client("bitrix24").get(url, params=query, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -310,7 +306,7 @@ def get_deal_item(deal_id: int) -> dict:
 
 @debug
 def update_deal_item(entity_type_id: int, deal_id: int, fields: Optional[dict]) -> dict:
-    url = "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs/crm.deal.update"
+    url = "crm.deal.update"
     payload = {
         "entityTypeId": entity_type_id,
         "id": deal_id,
@@ -318,7 +314,7 @@ def update_deal_item(entity_type_id: int, deal_id: int, fields: Optional[dict])
     }
 
     try:
-        response = requests.post(url, json=payload, timeout=60)
+        response = get_http_client("bitrix24").post(url, json=payload, timeout=60)
         response.raise_for_status()
         logger.debug(f"Response:\n{response.json}")
         return response.json()
@@ -329,11 +325,11 @@ def update_deal_item(entity_type_id: int, deal_id: int, fields: Optional[dict])
 
 @debug
 def add_comment_crm_timeline(fields: Optional[dict]) -> dict:
-    url = "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs/crm.timeline.comment.add"
+    url = "crm.timeline.comment.add"
     payload = {"fields": fields}
 
     try:
-        response = requests.post(url, json=payload, timeout=60)
+        response = get_http_client("bitrix24").post(url, json=payload, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -348,14 +344,12 @@ def start_bitrix_workflow(
     """
     Inicia um business process no Bitrix24 via REST.
     """
-    url = (
-        "https://logic.bitrix24.com.br/rest/260/af4o31dew3vzuphs/bizproc.workflow.start"
-    )
+    url = "bizproc.workflow.start"
     payload = {
         "TEMPLATE_ID": template_id,
         "DOCUMENT_ID": document_id,
         "PARAMETERS": parameters or {},
     }
-    response = requests.post(url, json=payload, timeout=60)
+    response = get_http_client("bitrix24").post(url, json=payload, timeout=60)
     response.raise_for_status()
     return response.json()
@@ -0,0 +1,220 @@
+# app/services/bitrix24/cnpj_enrichment.py
+"""
+Bulk CNPJ enrichment of Bitrix24 companies following Single Responsibility Principle.
+
+Reads (company id, CNPJ) pairs from a CSV file or from the Bitrix company
+listing, fetches each CNPJ through the cached, rate-limited lookup service,
+transforms the records with the same mapping as the /consulta-receita
+webhook (`update_company_process_cnpj`) and pushes the updates
+with one `batch` call per chunk of 50 companies. Progress is recorded per
+company, so an interrupted run resumes where it stopped.
+"""
+
+import csv
+import time
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.database.cnpj_enrichment import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_INVALID,
+    STATUS_NOT_FOUND,
+    CNPJEnrichmentProgress,
+)
+from app.services.bitrix24.batch import BitrixBatch
+from app.services.bitrix24.bitrix_services import update_company_process_cnpj
+from app.services.external.cnpj_lookup import (
+    SOURCE_API,
+    CNPJLookupService,
+    get_cnpj_lookup_service,
+    normalize_cnpj,
+)
+from app.services.http_client import HTTPClient, get_http_client
+
+logger = logging.getLogger(__name__)
+
+# Campo de CNPJ e flag "dados validados na Receita" da empresa no Bitrix
+CNPJ_FIELD = "UF_CRM_1708977581412"
+VALIDATED_FIELD = "UF_CRM_1720974662288"
+
+CSV_ID_COLUMNS = ("company_id", "idEmpresa", "id", "ID")
+CSV_CNPJ_COLUMNS = ("cnpj", "CNPJ", CNPJ_FIELD)
+
+CompanyRow = Tuple[str, str]
+
+
+def read_companies_csv(path: str) -> Iterator[CompanyRow]:
+    """Yield (company_id, cnpj) from a CSV with id and CNPJ columns"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(f, dialect=dialect)
+        fields = reader.fieldnames or []
+        id_column = next((c for c in CSV_ID_COLUMNS if c in fields), None)
+        cnpj_column = next((c for c in CSV_CNPJ_COLUMNS if c in fields), None)
+        if not id_column or not cnpj_column:
+            raise ValueError(
+                f"CSV must have one of {CSV_ID_COLUMNS} and one of "
+                f"{CSV_CNPJ_COLUMNS} as columns (found: {fields})"
+            )
+        for row in reader:
+            company_id = (row.get(id_column) or "").strip()
+            if company_id:
+                yield company_id, (row.get(cnpj_column) or "").strip()
+
+
+def iter_bitrix_companies(
+    http: Optional[HTTPClient] = None, include_validated: bool = False
+) -> Iterator[CompanyRow]:
+    """
+    Yield (company_id, cnpj) for every Bitrix company with a CNPJ.
+    Pages by ID (`>ID` filter with start=-1), which Bitrix serves without
+    counting the total and keeps stable while companies are updated.
+    """
+    http = http or get_http_client("bitrix24")
+    company_filter: Dict[str, Any] = {f"!{CNPJ_FIELD}": ""}
+    if not include_validated:
+        company_filter[f"!{VALIDATED_FIELD}"] = "Y"
+
+    last_id = 0
+    while True:
+        response = http.post(
+            "crm.company.list",
+            json={
+                "order": {"ID": "ASC"},
+                "filter": {**company_filter, ">ID": last_id},
+                "select": ["ID", CNPJ_FIELD],
+                "start": -1,
+            },
+        )
+        response.raise_for_status()
+        companies = response.json().get("result") or []
+        if not companies:
+            return
+        for company in companies:
+            yield str(company["ID"]), str(company.get(CNPJ_FIELD) or "")
+        last_id = int(companies[-1]["ID"])
+
+
+class CNPJEnrichmentJob:
+    """Enrich Bitrix companies with CNPJ data, resumable by run name"""
+
+    def __init__(
+        self,
+        run_name: str,
+        lookup: Optional[CNPJLookupService] = None,
+        transform: Callable[[Dict, str], Dict] = update_company_process_cnpj,
+        http: Optional[HTTPClient] = None,
+        batch_size: int = BitrixBatch.MAX_COMMANDS,
+        dry_run: bool = False,
+    ):
+        self.progress = CNPJEnrichmentProgress(run_name)
+        self.lookup = lookup or get_cnpj_lookup_service()
+        self.transform = transform
+        self.http = http or get_http_client("bitrix24")
+        self.batch_size = min(batch_size, BitrixBatch.MAX_COMMANDS)
+        self.dry_run = dry_run
+        self.stats: Dict[str, int] = {
+            "processed": 0,
+            "updated": 0,
+            "skipped": 0,
+            "failed": 0,
+            "not_found": 0,
+            "invalid": 0,
+            "from_cache": 0,
+            "from_api": 0,
+        }
+
+    def run(
+        self,
+        companies: Iterator[CompanyRow],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Process every company not completed in a previous run of this name"""
+        completed = self.progress.completed_ids()
+        started = time.monotonic()
+        chunk: List[CompanyRow] = []
+
+        for company_id, cnpj in companies:
+            if company_id in completed:
+                self.stats["skipped"] += 1
+                continue
+            completed.add(company_id)  # ignora repetições na origem
+            chunk.append((company_id, cnpj))
+            if len(chunk) >= self.batch_size:
+                self._process_chunk(chunk)
+                chunk = []
+                if on_progress:
+                    on_progress(self._report(started))
+
+        report = self._report(started)
+        if chunk:
+            self._process_chunk(chunk)
+            report = self._report(started)
+            if on_progress:
+                on_progress(report)
+        return report
+
+    def _process_chunk(self, chunk: List[CompanyRow]) -> None:
+        batch = BitrixBatch(http=self.http)
+        entries: List[Tuple[str, Optional[str], str, Optional[str]]] = []
+        queued: Dict[str, Tuple[str, str]] = {}
+
+        for company_id, cnpj in chunk:
+            digits = normalize_cnpj(cnpj)
+            if len(digits) != 14:
+                entries.append((company_id, cnpj, STATUS_INVALID, "CNPJ inválido"))
+                self.stats["invalid"] += 1
+                continue
+
+            result = self.lookup.lookup(digits)
+            if not result:
+                entries.append((company_id, digits, STATUS_NOT_FOUND, None))
+                self.stats["not_found"] += 1
+                continue
+            source = "from_api" if result["source"] == SOURCE_API else "from_cache"
+            self.stats[source] += 1
+
+            processed = self.transform(result["data"], company_id)
+            key = batch.add(
+                "crm.company.update",
+                {
+                    "id": processed["id"],
+                    "fields": processed["fields"],
+                    "params": processed.get("params", {}),
+                },
+                key=f"company{company_id}",
+            )
+            queued[key] = (company_id, digits)
+
+        if queued and not self.dry_run:
+            results = batch.execute()
+            for key, (company_id, digits) in queued.items():
+                outcome = results.get(key, {})
+                if "error" in outcome:
+                    error = outcome.get("error_description") or outcome["error"]
+                    entries.append((company_id, digits, STATUS_FAILED, str(error)))
+                    self.stats["failed"] += 1
+                else:
+                    entries.append((company_id, digits, STATUS_DONE, None))
+                    self.stats["updated"] += 1
+        elif queued:
+            logger.info(f"Dry run: {len(queued)} company updates not sent")
+
+        self.stats["processed"] += len(chunk)
+        if not self.dry_run:
+            self.progress.mark_many(entries)
+
+    def _report(self, started: float) -> Dict[str, Any]:
+        elapsed = time.monotonic() - started
+        report: Dict[str, Any] = dict(self.stats)
+        report["elapsed_seconds"] = round(elapsed, 1)
+        report["companies_per_minute"] = (
+            round(self.stats["processed"] * 60 / elapsed, 1) if elapsed else 0.0
+        )
+        return report
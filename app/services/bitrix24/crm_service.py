@@ -8,6 +8,8 @@ from typing import Dict, Any, Optional, List
 import requests
 
 from app.core.interfaces import ICRMService
+from app.services.bitrix24.batch import BitrixBatch
+from app.services.http_client import get_http_client
 from app.utils.utils import debug
 
 
@@ -19,6 +21,11 @@ class BitrixCRMService(ICRMService):
 
     def __init__(self, base_url: str):
         self.base_url = base_url
+        self.http = get_http_client("bitrix24")
+
+    def batch(self, halt_on_error: bool = False) -> BitrixBatch:
+        """Create a batch builder sharing this service's connection pool"""
+        return BitrixBatch(self.http, halt_on_error=halt_on_error)
 
     @debug
     def get_item(self, entity_type_id: int, item_id: int) -> Dict[str, Any]:
@@ -31,7 +38,7 @@ class BitrixCRMService(ICRMService):
         }
 
         try:
-            response = requests.get(url, params=query, timeout=60)
+            response = self.http.get(url, params=query, timeout=60)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -51,7 +58,7 @@ class BitrixCRMService(ICRMService):
         }
 
         try:
-            response = requests.post(url, json=payload, timeout=60)
+            response = self.http.post(url, json=payload, timeout=60)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -65,7 +72,7 @@ class BitrixCRMService(ICRMService):
         query = {"id": deal_id}
 
         try:
-            response = requests.get(url, params=query, timeout=60)
+            response = self.http.get(url, params=query, timeout=60)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -85,7 +92,7 @@ class BitrixCRMService(ICRMService):
         }
 
         try:
-            response = requests.post(url, json=payload, timeout=60)
+            response = self.http.post(url, json=payload, timeout=60)
             response.raise_for_status()
             logger.debug(f"Response: {response.json()}")
             return response.json()
@@ -100,7 +107,7 @@ class BitrixCRMService(ICRMService):
         payload = {"fields": fields}
 
         try:
-            response = requests.post(url, json=payload, timeout=60)
+            response = self.http.post(url, json=payload, timeout=60)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -123,7 +130,7 @@ class BitrixCRMService(ICRMService):
         }
 
         try:
-            response = requests.post(url, json=payload, timeout=60)
+            response = self.http.post(url, json=payload, timeout=60)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
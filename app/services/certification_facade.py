@@ -4,8 +4,7 @@ Certification facade following Facade Pattern and SOLID principles.
 """
 
 import logging
-import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from app.core.interfaces import (
     IMessageService,
@@ -16,6 +15,16 @@ from app.core.interfaces import (
     ICRMService,
 )
 from app.core.config_provider import ServiceConfiguration
+from app.database.identity_links import IdentityLinks, get_identity_links
+from app.services.continuations import (
+    ENTITY_CERT_SPA,
+    ENTITY_DEAL,
+    KIND_BILLING_PDF,
+    KIND_PROPOSAL_FILE,
+    PROPOSAL_FIRST_CHECK_SECONDS,
+    schedule_continuation,
+)
+from app.services.pdf_relay import get_pdf_relay
 from app.services.renewal_services import update_pending_status
 from app.utils.utils import debug
 
@@ -39,6 +48,7 @@ class CertificationDigitalFacade:
         conta_azul_contact_service: IContactService,
         crm_service: ICRMService,
         user_id: str,
+        identity_links: Optional[IdentityLinks] = None,
     ):
         self.digisac_message = digisac_message_service
         self.digisac_ticket = digisac_ticket_service
@@ -48,6 +58,7 @@ class CertificationDigitalFacade:
         self.conta_azul_contact = conta_azul_contact_service
         self.crm_service = crm_service
         self.user_id = user_id
+        self.identity_links = identity_links or get_identity_links()
 
     @debug
     def send_renewal_notification(
@@ -59,7 +70,7 @@ class CertificationDigitalFacade:
         deal_type: str,
     ) -> Dict[str, Any]:
         """Send renewal notification message"""
-        contact_id = self.digisac_contact.find_contact_by_phone(contact_number)
+        contact_id = self._find_digisac_contact_id(contact_number)
         if not contact_id:
             raise ValueError(f"Contact not found for number: {contact_number}")
 
@@ -79,7 +90,7 @@ class CertificationDigitalFacade:
         self, contact_number: str, to_queue: bool = False
     ) -> Dict[str, Any]:
         """Transfer ticket to certification department"""
-        contact_id = self.digisac_contact.find_contact_by_phone(contact_number)
+        contact_id = self._find_digisac_contact_id(contact_number)
         if not contact_id:
             raise ValueError(f"Contact not found for number: {contact_number}")
 
@@ -97,7 +108,7 @@ class CertificationDigitalFacade:
         self, contact_number: str, company_name: str, spa_id: int
     ) -> Dict[str, Any]:
         """Send commercial proposal for certification"""
-        contact_id = self.digisac_contact.find_contact_by_phone(contact_number)
+        contact_id = self._find_digisac_contact_id(contact_number)
         if not contact_id:
             raise ValueError(f"Contact not found for number: {contact_number}")
 
@@ -119,41 +130,30 @@ class CertificationDigitalFacade:
             f"DYNAMIC_137_{spa_id}",
         ]
         self.crm_service.start_workflow(template_id=556, document_id=doc_id)
-        time.sleep(45)
-
-        # Get proposal PDF from CRM
-        pdf_content = self._get_proposal_pdf_from_crm(spa_id)
 
-        # Send PDF
+        # PDF and final message are sent by the continuation once the
+        # workflow fills the document field (no thread waits here)
         filename = "Proposta_certificado_digital_-_Logic_Assessoria_Empresarial.pdf"
-        self.digisac_message.send_file_message(
-            contact_id=contact_id,
-            file_content=pdf_content,
-            filename=filename,
-            message="Proposta",
-            user_id=self.user_id,
-        )
-
-        # Send final message
-        final_message = (
-            "*Bot*\n"
-            "Olá! Segue a proposta comercial para renovação do "
-            f"certificado digital da empresa *{company_name}*.\n"
-            "Qualquer dúvida, estamos à disposição."
-        )
-        return self.digisac_message.send_text_message(
-            contact_id=contact_id,
-            message=final_message,
-            department_id=ServiceConfiguration.CERT_DEPT_ID,
-            user_id=self.user_id,
+        continuation_id = schedule_continuation(
+            KIND_PROPOSAL_FILE,
+            ENTITY_CERT_SPA,
+            spa_id,
+            {
+                "contact_number": contact_number,
+                "company_name": company_name,
+                "filename": filename,
+            },
+            delay=PROPOSAL_FIRST_CHECK_SECONDS,
         )
+        return {"status": "pending", "continuation_id": continuation_id}
 
     @debug
     def create_sale_and_billing(
         self, contact_number: str, document: str, deal_type: str
     ) -> Dict[str, Any]:
         """Create sale and generate billing for certification"""
-        # Find client in Conta Azul
+        # Find client in Conta Azul strictly by document: one phone may serve
+        # several companies, so the phone never picks who is billed
         client_uuid = self.conta_azul_contact.find_contact_by_document(document)
         if not client_uuid:
             raise ValueError(f"Client not found for document: {document}")
@@ -180,19 +180,31 @@ class CertificationDigitalFacade:
         self, contact_number: str, company_name: str, deal_id: int
     ) -> Dict[str, Any]:
         """Send billing notification with PDF"""
-        contact_id = self.digisac_contact.find_contact_by_phone(contact_number)
+        contact_id = self._find_digisac_contact_id(contact_number)
         if not contact_id:
             raise ValueError(f"Contact not found for number: {contact_number}")
 
-        # Get billing URL from CRM
-        billing_url = self._get_billing_url_from_crm(deal_id)
+        filename = f"Cobranca_{company_name}.pdf"
 
-        # Download billing PDF
-        import requests
+        # Get billing URL from CRM; if Conta Azul has not published it yet,
+        # a continuation sends the boleto as soon as it shows up
+        billing_url = self._get_billing_url_from_crm(deal_id)
+        if not billing_url:
+            continuation_id = schedule_continuation(
+                KIND_BILLING_PDF,
+                ENTITY_DEAL,
+                deal_id,
+                {
+                    "contact_number": contact_number,
+                    "company_name": company_name,
+                    "deal_id": deal_id,
+                    "filename": filename,
+                },
+            )
+            return {"status": "pending", "continuation_id": continuation_id}
 
-        response = requests.get(billing_url, timeout=60)
-        response.raise_for_status()
-        pdf_content = response.content
+        # Download billing PDF (streamed; re-sends reuse the cached file)
+        pdf_content = get_pdf_relay().fetch(billing_url)
 
         # Send text message
         message = (
@@ -208,7 +220,6 @@ class CertificationDigitalFacade:
         )
 
         # Send PDF
-        filename = f"Cobranca_{company_name}.pdf"
         return self.digisac_message.send_file_message(
             contact_id=contact_id,
             file_content=pdf_content,
@@ -219,7 +230,7 @@ class CertificationDigitalFacade:
 
     def has_open_ticket_in_other_department(self, contact_number: str) -> bool:
         """Check if contact has open ticket in other department"""
-        contact_id = self.digisac_contact.find_contact_by_phone(contact_number)
+        contact_id = self._find_digisac_contact_id(contact_number)
         if not contact_id:
             return False
 
@@ -227,6 +238,13 @@ class CertificationDigitalFacade:
             contact_id, exclude_department_id=ServiceConfiguration.CERT_DEPT_ID
         )
 
+    def _find_digisac_contact_id(self, contact_number: str) -> Optional[str]:
+        """Resolve Digisac contact ID via identity links, then contact service"""
+        identity = self.identity_links.resolve(phone=contact_number)
+        if identity and identity["digisac_contact_id"]:
+            return identity["digisac_contact_id"]
+        return self.digisac_contact.find_contact_by_phone(contact_number)
+
     def _build_certification_message_text(
         self, contact_name: str, company_name: str, days_to_expire: int, deal_type: str
     ) -> str:
@@ -259,52 +277,13 @@ class CertificationDigitalFacade:
             "❌ Digite: *RECUSAR* → Não deseja renovar o certificado no momento"
         )
 
-    def _get_proposal_pdf_from_crm(self, spa_id: int) -> bytes:
-        """Get proposal PDF from CRM"""
-        max_retries = 6
-        retries = 0
-
-        while retries < max_retries:
-            crm_item = self.crm_service.get_item(entity_type_id=137, item_id=spa_id)
-            doc_info = (
-                crm_item.get("result", {}).get("item", {}).get("UF_CRM_18_1752245366")
-            )
-
-            if doc_info and isinstance(doc_info, dict) and "urlMachine" in doc_info:
-                import requests
-
-                response = requests.get(doc_info["urlMachine"], timeout=60)
-                response.raise_for_status()
-                return response.content
+    def _get_billing_url_from_crm(self, deal_id: int) -> Optional[str]:
+        """Billing URL from the CRM deal, or None while it is not filled"""
+        deal = self.crm_service.get_deal(deal_id)
+        doc_url = deal.get("result", {}).get("UF_CRM_1751478607")
 
-            retries += 1
-            if retries >= max_retries:
-                raise Exception("Max retries exceeded while getting proposal PDF")
-
-            logger.warning(
-                f"Proposal not available yet (attempt {retries}), waiting 30s"
-            )
-            time.sleep(30)
-
-    def _get_billing_url_from_crm(self, deal_id: int) -> str:
-        """Get billing URL from CRM"""
-        max_retries = 6
-        retries = 0
-
-        while retries < max_retries:
-            deal = self.crm_service.get_deal(deal_id)
-            doc_url = deal.get("result", {}).get("UF_CRM_1751478607")
-
-            if isinstance(doc_url, str) and doc_url.startswith(
-                "https://public.contaazul.com"
-            ):
-                return doc_url
-
-            retries += 1
-            if retries >= max_retries:
-                raise Exception("Max retries exceeded while getting billing URL")
-
-            logger.warning(
-                f"Billing URL not found for Deal ID {deal_id} (attempt {retries})"
-            )
-            time.sleep(30)
+        if isinstance(doc_url, str) and doc_url.startswith(
+            "https://public.contaazul.com"
+        ):
+            return doc_url
+        return None
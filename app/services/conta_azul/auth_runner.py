@@ -0,0 +1,200 @@
+# app/services/conta_azul/auth_runner.py
+"""
+Runner de autenticação da Conta Azul fora do processo web.
+
+`flask conta-azul auth-runner` sobe um processo dedicado que mantém o perfil
+persistente do Chrome e o chromedriver em cache e atende pedidos de código
+de autorização por um socket local (multiprocessing.connection, autenticado
+por chave). Os processos web só falam com o runner: nunca abrem navegador.
+
+Pedidos são atendidos um por vez (um navegador); cada um recebe seu próprio
+código, já que o authorization code só pode ser trocado uma vez.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AUTH_RUNNER_HOST = os.getenv("CONTA_AZUL_AUTH_RUNNER_HOST", "127.0.0.1")
+AUTH_RUNNER_PORT = int(os.getenv("CONTA_AZUL_AUTH_RUNNER_PORT", "6010"))
+AUTH_RUNNER_AUTHKEY = (
+    os.getenv("CONTA_AZUL_AUTH_RUNNER_KEY") or "conta-azul-auth-runner"
+).encode()
+# Inclui o tempo para o usuário digitar o 2FA no navegador do runner
+AUTH_RUNNER_TIMEOUT = int(os.getenv("CONTA_AZUL_AUTH_RUNNER_TIMEOUT", "300"))
+CHROME_PROFILE_DIR = os.getenv(
+    "CONTA_AZUL_CHROME_PROFILE_DIR",
+    os.path.join(os.getcwd(), "app", "database", "conta_azul", "chrome_profile"),
+)
+
+
+class AuthRunnerUnavailable(ConnectionError):
+    """O runner de autenticação não está rodando ou recusou a conexão"""
+
+
+class AuthRunnerServer:
+    """Processo dono do navegador: recebe pedidos e devolve códigos"""
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = (AUTH_RUNNER_HOST, AUTH_RUNNER_PORT),
+        authkey: bytes = AUTH_RUNNER_AUTHKEY,
+        profile_dir: str = CHROME_PROFILE_DIR,
+        authorize: Optional[Callable[[str], Optional[str]]] = None,
+    ):
+        self.address = address
+        self.authkey = authkey
+        self.profile_dir = profile_dir
+        self._authorize = authorize
+        self._browser_lock = threading.Lock()
+        self._listener: Optional[Listener] = None
+        self._running = False
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "codes": 0,
+            "failures": 0,
+            "last_seconds": None,
+        }
+
+    def serve_forever(self) -> None:
+        """Atende conexões até stop(); cada conexão em sua própria thread"""
+        if self._authorize is None:
+            # Import tardio: só o runner depende de selenium
+            from app.services.conta_azul.conta_azul_auto_auth import (
+                automate_auth,
+                get_driver_path,
+            )
+
+            get_driver_path()  # baixa/resolve o driver antes do primeiro pedido
+            self._authorize = automate_auth
+
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self._running = True
+        logger.info(
+            f"🔐 Auth runner ouvindo em {self.address[0]}:{self.address[1]} "
+            f"(perfil: {self.profile_dir})"
+        )
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._running:
+                    logger.exception("Erro aceitando conexão no auth runner")
+                continue
+            except Exception as e:
+                # Ex.: AuthenticationError de cliente com chave errada
+                logger.warning(f"Conexão recusada no auth runner: {e}")
+                continue
+            threading.Thread(
+                target=self._handle, args=(conn,), name="auth-runner-conn", daemon=True
+            ).start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._listener is not None:
+            self._listener.close()
+
+    def _handle(self, conn: Connection) -> None:
+        try:
+            request = conn.recv()
+            action = request.get("action")
+            if action == "ping":
+                conn.send({"id": request.get("id"), "ok": True, "stats": self.stats})
+            elif action == "authorize":
+                conn.send(self._run_authorization(request.get("id")))
+            else:
+                conn.send(
+                    {"id": request.get("id"), "ok": False, "error": "ação inválida"}
+                )
+        except (EOFError, OSError):
+            logger.warning("Cliente do auth runner desconectou antes da resposta")
+        finally:
+            conn.close()
+
+    def _run_authorization(self, request_id: Optional[str]) -> Dict[str, Any]:
+        with self._browser_lock:
+            self.stats["requests"] += 1
+            started = time.monotonic()
+            try:
+                code = self._authorize(self.profile_dir)
+                error = None if code else "automação não retornou código"
+            except Exception as e:
+                logger.exception("Falha na automação de autenticação")
+                code, error = None, str(e)
+            seconds = round(time.monotonic() - started, 1)
+            self.stats["last_seconds"] = seconds
+            self.stats["codes" if code else "failures"] += 1
+
+        logger.info(f"🔐 Pedido {request_id}: {'ok' if code else error} em {seconds}s")
+        if code:
+            return {"id": request_id, "ok": True, "code": code, "seconds": seconds}
+        return {"id": request_id, "ok": False, "error": error, "seconds": seconds}
+
+
+class AuthRunnerClient:
+    """Cliente usado pelos processos web para pedir códigos ao runner"""
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = (AUTH_RUNNER_HOST, AUTH_RUNNER_PORT),
+        authkey: bytes = AUTH_RUNNER_AUTHKEY,
+    ):
+        self.address = address
+        self.authkey = authkey
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="auth-runner-client"
+        )
+
+    def _call(self, action: str, timeout: float) -> Dict[str, Any]:
+        request_id = uuid.uuid4().hex
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except (ConnectionRefusedError, FileNotFoundError) as e:
+            raise AuthRunnerUnavailable(
+                f"Auth runner indisponível em {self.address[0]}:{self.address[1]} "
+                "(inicie com `flask conta-azul auth-runner`)"
+            ) from e
+        try:
+            conn.send({"action": action, "id": request_id})
+            if not conn.poll(timeout):
+                raise TimeoutError(f"Auth runner não respondeu em {timeout:.0f}s")
+            return conn.recv()
+        finally:
+            conn.close()
+
+    def ping(self, timeout: float = 5) -> Dict[str, Any]:
+        """Estado e métricas do runner; AuthRunnerUnavailable se parado"""
+        return self._call("ping", timeout)
+
+    def request_code(self, timeout: float = AUTH_RUNNER_TIMEOUT) -> str:
+        """Pede um código de autorização e aguarda até `timeout` segundos"""
+        response = self._call("authorize", timeout)
+        if not response.get("ok"):
+            raise PermissionError(
+                f"Auth runner não obteve código: {response.get('error')}"
+            )
+        return response["code"]
+
+    def request_code_async(self, timeout: float = AUTH_RUNNER_TIMEOUT) -> Future:
+        """Versão assíncrona: o Future resolve com o código (ou a exceção)"""
+        return self._executor.submit(self.request_code, timeout)
+
+
+_client: Optional[AuthRunnerClient] = None
+_client_lock = threading.Lock()
+
+
+def get_auth_runner_client() -> AuthRunnerClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AuthRunnerClient()
+    return _client
@@ -4,15 +4,14 @@ Conta Azul authentication service following Single Responsibility Principle.
 """
 
 import base64
-import json
-import os
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any
-import requests
 
 from app.core.interfaces import IAuthenticationService, ITokenManager, IConfigProvider
 from app.core.config_provider import ServiceConfiguration
+from app.services.http_client import get_http_client
+from app.services.token_store import get_token_store
 
 
 logger = logging.getLogger(__name__)
@@ -23,36 +22,18 @@ class ContaAzulTokenManager(ITokenManager):
 
     def __init__(self, tokens_file_path: str):
         self.tokens_file_path = tokens_file_path
-        self.tokens = {
-            "access_token": None,
-            "refresh_token": None,
-            "id_token": None,
-            "expires_at": None,
-        }
-        os.makedirs(os.path.dirname(tokens_file_path), exist_ok=True)
-        self.load_tokens()
+        # Mesmo store em memória usado por conta_azul_services
+        self._store = get_token_store(tokens_file_path)
+        self.tokens = self._store.get()
 
     def save_tokens(self, tokens: Dict[str, Any]) -> None:
-        """Save tokens to file"""
-        data = tokens.copy()
-        if isinstance(data.get("expires_at"), datetime):
-            data["expires_at"] = data["expires_at"].isoformat()
-
-        with open(self.tokens_file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        logger.info("Conta Azul tokens saved to file: %s", self.tokens_file_path)
+        """Save tokens (file is rewritten atomically, only on change)"""
+        self._store.set(tokens)
+        self.tokens = self._store.get()
 
     def load_tokens(self) -> Dict[str, Any]:
-        """Load tokens from file"""
-        if os.path.exists(self.tokens_file_path):
-            with open(self.tokens_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.tokens["access_token"] = data.get("access_token")
-                self.tokens["refresh_token"] = data.get("refresh_token")
-                self.tokens["id_token"] = data.get("id_token")
-                expires_at = data.get("expires_at")
-                if expires_at:
-                    self.tokens["expires_at"] = datetime.fromisoformat(expires_at)
+        """Load tokens from the in-memory store"""
+        self.tokens = self._store.get()
         return self.tokens
 
     def get_auth_headers(self) -> Dict[str, str]:
@@ -71,6 +52,7 @@ class ContaAzulAuthenticationService(IAuthenticationService):
     def __init__(self, config: IConfigProvider, token_manager: ITokenManager):
         self.config = config
         self.token_manager = token_manager
+        self.http = get_http_client("conta_azul_auth")
 
     def authenticate(self) -> Dict[str, Any]:
         """Authenticate using authorization code (requires Selenium automation)"""
@@ -107,7 +89,7 @@ class ContaAzulAuthenticationService(IAuthenticationService):
             f"&code={refresh_token}"
         )
 
-        response = requests.post(
+        response = self.http.post(
             ServiceConfiguration.CONTA_AZUL_TOKEN_URL,
             data=body,
             headers=headers,
@@ -182,7 +164,7 @@ class ContaAzulAuthenticationService(IAuthenticationService):
             f"&redirect_uri={self.config.get('CONTA_AZUL_REDIRECT_URI')}"
         )
 
-        response = requests.post(
+        response = self.http.post(
             ServiceConfiguration.CONTA_AZUL_TOKEN_URL,
             data=body,
             headers=headers,
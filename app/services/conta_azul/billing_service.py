@@ -10,6 +10,7 @@ import requests
 
 from app.core.interfaces import IBillingService, ITokenManager
 from app.core.config_provider import ServiceConfiguration
+from app.services.http_client import get_http_client
 from app.utils.utils import debug
 
 
@@ -23,6 +24,7 @@ class ContaAzulBillingService(IBillingService):
         self.token_manager = token_manager
         self.bank_account_uuid = bank_account_uuid
         self.base_url = ServiceConfiguration.CONTA_AZUL_API_BASE_URL
+        self.http = get_http_client("conta_azul")
 
     @debug
     def generate_billing(
@@ -51,7 +53,7 @@ class ContaAzulBillingService(IBillingService):
         logger.debug(f"POST {url}")
         logger.debug(f"Payload: {payload}")
 
-        response = requests.post(url, json=payload, headers=headers, timeout=60)
+        response = self.http.post(url, json=payload, headers=headers, timeout=60)
 
         if response.status_code >= 400:
             logger.error(f"Detailed error: {response.text}")
@@ -86,7 +88,7 @@ class ContaAzulBillingService(IBillingService):
         headers = self.token_manager.get_auth_headers()
 
         try:
-            response = requests.get(url, headers=headers, timeout=60)
+            response = self.http.get(url, headers=headers, timeout=60)
             response.raise_for_status()
             sale_details = response.json()
 
@@ -121,7 +123,7 @@ class ContaAzulBillingService(IBillingService):
 
         try:
             logger.debug(f"GET {url}")
-            response = requests.get(url, headers=headers, timeout=60)
+            response = self.http.get(url, headers=headers, timeout=60)
             response.raise_for_status()
             logger.debug(f"Response: {response.json()}")
             return response.json()
@@ -1,7 +1,10 @@
 # app/services/conta_azul_auto_auth.py
+import os
 import time
 import logging
 import socket
+import threading
+from typing import Optional
 from urllib.parse import urlparse, parse_qs, urlencode
 from selenium_stealth import stealth
 from selenium import webdriver
@@ -20,6 +23,22 @@ logger = logging.getLogger(__name__)
 # Endpoints da Conta Azul
 AUTH_URL = "https://auth.contaazul.com/oauth2/authorize"
 
+# Caminho fixo do chromedriver (opcional); sem ele o download do
+# webdriver_manager é feito uma vez por processo e reutilizado
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")
+_driver_path: Optional[str] = CHROMEDRIVER_PATH
+_driver_path_lock = threading.Lock()
+
+
+def get_driver_path() -> str:
+    """Resolve o chromedriver uma única vez por processo"""
+    global _driver_path
+    with _driver_path_lock:
+        if not _driver_path:
+            _driver_path = ChromeDriverManager().install()
+            logger.info(f"🧩 chromedriver em cache: {_driver_path}")
+        return _driver_path
+
 
 def find_free_port():
     """Encontra uma porta TCP livre para usar com o Chrome"""
@@ -77,8 +96,27 @@ def get_auth_url(state: str = "security_token") -> str:
     )
 
 
-def automate_auth():
-    """Automatiza o processo de autenticação OAuth2 com Selenium"""
+def _extract_auth_code(driver) -> str:
+    """Extrai o código de autorização da URL de callback"""
+    parsed_url = urlparse(driver.current_url)
+    query_params = parse_qs(parsed_url.query)
+    auth_code = query_params.get("code", [None])[0]
+
+    if not auth_code:
+        raise ValueError("❌ Código de autorização não encontrado na URL de callback")
+
+    logger.info(f"🔑 Código de autorização obtido com sucesso: {auth_code}")
+    return auth_code
+
+
+def automate_auth(profile_dir: Optional[str] = None):
+    """
+    Automatiza o processo de autenticação OAuth2 com Selenium.
+
+    Com `profile_dir` o Chrome usa um perfil persistente: a sessão da Conta
+    Azul sobrevive entre execuções e, se ainda válida, o callback chega sem
+    passar pelo formulário de login.
+    """
     ### VERIFICAR O COMPORTAMENTO DA 2FA ###
     logger.info("🚀 Iniciando automação de autenticação com Selenium")
 
@@ -98,6 +136,9 @@ def automate_auth():
     )
 
     chrome_options.add_argument(f"--remote-debugging-port={debug_port}")
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
     chrome_options.add_argument("start-maximized")
     # chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--ignore-certificate-errors")
@@ -110,7 +151,7 @@ def automate_auth():
         "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36"
     )
 
-    service = Service(ChromeDriverManager().install())
+    service = Service(get_driver_path())
     driver = webdriver.Chrome(service=service, options=chrome_options)
     stealth(
         driver,
@@ -135,6 +176,18 @@ def automate_auth():
         # Verificar e lidar com aviso do LocalTunnel
         localtunnel_detected = handle_localtunnel_warning(driver)
 
+        # Perfil persistente com sessão válida: vai direto ao callback
+        callback_prefix = Config.CONTA_AZUL_REDIRECT_URI.rstrip("/")
+        if profile_dir:
+            try:
+                WebDriverWait(driver, 5).until(
+                    lambda d: d.current_url.startswith(callback_prefix)
+                )
+                logger.info("♻️ Sessão do perfil ainda válida — login dispensado")
+                return _extract_auth_code(driver)
+            except TimeoutException:
+                pass
+
         # Se o LocalTunnel foi detectado, esperar o carregamento da página de login
         if localtunnel_detected:
             WebDriverWait(driver, 15).until(
@@ -185,7 +238,6 @@ def automate_auth():
             )
 
         # Aguardar redirecionamento para o callback (válido com ou sem 2FA)
-        callback_prefix = Config.CONTA_AZUL_REDIRECT_URI.rstrip("/")
         try:
             WebDriverWait(driver, 60).until(
                 lambda d: d.current_url.startswith(callback_prefix)
@@ -199,17 +251,7 @@ def automate_auth():
             return None
 
         # Extrair o código da URL
-        parsed_url = urlparse(driver.current_url)
-        query_params = parse_qs(parsed_url.query)
-        auth_code = query_params.get("code", [None])[0]
-
-        if not auth_code:
-            raise ValueError(
-                "❌ Código de autorização não encontrado na URL de callback"
-            )
-
-        logger.info(f"🔑 Código de autorização obtido com sucesso: {auth_code}")
-        return auth_code
+        return _extract_auth_code(driver)
 
     except Exception as e:
         # Salvar diagnóstico detalhado
@@ -1,15 +1,22 @@
 # app/services/conta_azul_service.
 import os
-import json
 import re
-from pathlib import Path
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Optional, Union
+from typing import Optional
 import base64
 import requests
 from app.config import Config
-from app.services.conta_azul.conta_azul_auto_auth import automate_auth
+from app.services.http_client import get_http_client
+from app.services.token_store import get_token_store
+from app.services.conta_azul.auth_runner import get_auth_runner_client
+from app.services.conta_azul.person_index import get_person_index
+from app.database.contact_directory import (
+    CONTA_AZUL_PERSONS_ENTITY,
+    get_contact_directory,
+)
+from app.database.lease_lock import get_lease_lock
+from app.services.sync.freshness import record_lookup_miss
 from app.services.renewal_services import get_pending
 from app.utils.utils import standardize_phone_number, debug
 
@@ -26,27 +33,77 @@ TOKEN_FILE_PATH = os.path.join(
 )
 REFRESH_MARGIN_SECONDS = 300  # margem de segurança de 5 minutos
 
+# Lease da reautenticação via Selenium (um navegador por vez na instalação)
+CONTA_AZUL_AUTH_LEASE = "conta_azul_auto_auth"
+AUTH_LEASE_TTL_SECONDS = int(os.getenv("CONTA_AZUL_AUTH_LEASE_TTL", "300"))
+AUTH_LEASE_WAIT_SECONDS = int(os.getenv("CONTA_AZUL_AUTH_LEASE_WAIT", "360"))
+# "runner": código obtido do processo `flask conta-azul auth-runner`;
+# "inline": Selenium no próprio processo (desenvolvimento)
+AUTH_MODE = os.getenv("CONTA_AZUL_AUTH_MODE", "runner")
+
+# Snapshot de pessoas gerado por `flask sync ca-pessoas`
+PERSONS_FILE_PATH = os.path.join(
+    os.getcwd(), "app", "database", "conta_azul", "person.json"
+)
+
 
-# Armazenamento de tokens (em memória - para produção use persistência)
-conta_azul_tokens: Dict[str, Optional[Union[str, datetime]]] = {
-    "access_token": None,
-    "refresh_token": None,
-    "id_token": None,
-    "expires_at": None,
-}
+# Tokens em memória, compartilhados entre threads; o arquivo só é regravado
+# (atomicamente) quando mudam
+conta_azul_token_store = get_token_store(TOKEN_FILE_PATH)
 
 
-########################################################################### CONTA AZUL AUTH SERVICES
-def auto_authenticate():
-    """Obtém tokens através da automação Selenium"""
-    # Obter código de autorização via Selenium
-    auth_code = automate_auth()
+class SaleValidationError(ValueError):
+    """Dados da venda inválidos: tentar de novo não resolve"""
 
-    # Trocar código por tokens
-    token_data = get_tokens(auth_code)
-    set_tokens(token_data)
 
-    return token_data
+########################################################################### CONTA AZUL AUTH SERVICES
+def auto_authenticate(force: bool = False):
+    """
+    Obtém tokens através da automação Selenium.
+
+    Um lease no SQLite garante um único navegador por vez entre threads e
+    processos; quem chega enquanto outro autentica espera até
+    AUTH_LEASE_WAIT_SECONDS e reaproveita o token que ele gravou.
+    """
+    lease = get_lease_lock(CONTA_AZUL_AUTH_LEASE, ttl=AUTH_LEASE_TTL_SECONDS)
+    with lease.hold(timeout=AUTH_LEASE_WAIT_SECONDS) as waited:
+        # Outro dono do lease pode ter acabado de autenticar
+        tokens = conta_azul_token_store.reload()
+        remaining = conta_azul_token_store.seconds_to_expiry(tokens)
+        if (
+            (waited or not force)
+            and tokens.get("access_token")
+            and remaining is not None
+            and remaining > REFRESH_MARGIN_SECONDS
+        ):
+            logger.info(
+                "✅ Token renovado por outra instância"
+                if waited
+                else "✅ Token ainda válido — auto_authenticate dispensado"
+            )
+            return tokens
+
+        # Obter código de autorização via Selenium
+        auth_code = _obtain_auth_code()
+        if not auth_code:
+            raise PermissionError(
+                "Automação Selenium não retornou código de autorização"
+            )
+
+        # Trocar código por tokens
+        token_data = get_tokens(auth_code)
+        set_tokens(token_data)
+
+        return token_data
+
+
+def _obtain_auth_code() -> str | None:
+    """Código de autorização do runner dedicado (ou inline, se configurado)"""
+    if AUTH_MODE == "inline":
+        from app.services.conta_azul.conta_azul_auto_auth import automate_auth
+
+        return automate_auth()
+    return get_auth_runner_client().request_code()
 
 
 def get_tokens(code: str) -> dict:
@@ -73,7 +130,7 @@ def get_tokens(code: str) -> dict:
     logger.debug(f"Request data: {body}")
     logger.debug(f"Authorization: Basic {encoded_credentials}")
 
-    response = requests.post(
+    response = get_http_client("conta_azul_auth").post(
         TOKEN_URL,
         data=body,  # Enviar como dicionário, não urlencode
         headers=headers,
@@ -100,7 +157,8 @@ def get_tokens(code: str) -> dict:
 
 def refresh_tokens() -> dict:
     """Renova os tokens de acesso usando o refresh token."""
-    if not conta_azul_tokens["refresh_token"]:
+    refresh_token = conta_azul_token_store.get().get("refresh_token")
+    if not refresh_token:
         raise ValueError("Nenhum refresh token disponível")
 
     # Preparar credenciais para Basic Auth
@@ -117,11 +175,13 @@ def refresh_tokens() -> dict:
         f"client_id={Config.CONTA_AZUL_CLIENT_ID}"
         f"&client_secret={Config.CONTA_AZUL_CLIENT_SECRET}"
         f"&grant_type=refresh_token"
-        f"&code={conta_azul_tokens['refresh_token']}"
+        f"&code={refresh_token}"
     )
 
     # Fazer requisição com parâmetros devidamente codificados
-    response = requests.post(TOKEN_URL, data=body, headers=headers, timeout=60)
+    response = get_http_client("conta_azul_auth").post(
+        TOKEN_URL, data=body, headers=headers, timeout=60
+    )
 
     # Adicionar logs para debug
     if response.status_code != 200:
@@ -134,15 +194,45 @@ def refresh_tokens() -> dict:
 
 def set_tokens(token_data: dict):
     """Armazena os tokens e calcula o tempo de expiração."""
-    conta_azul_tokens["access_token"] = token_data["access_token"]
-    conta_azul_tokens["refresh_token"] = token_data["refresh_token"]
-    conta_azul_tokens["id_token"] = token_data.get("id_token")
-    conta_azul_tokens["expires_at"] = datetime.now() + timedelta(
-        seconds=token_data["expires_in"]
-    )
+    tokens = _tokens_from_response(token_data)
+    logger.debug("Conta azul tokens:\n%s", tokens)
+    conta_azul_token_store.set(tokens)
+
+
+def _tokens_from_response(token_data: dict) -> dict:
+    return {
+        "access_token": token_data["access_token"],
+        "refresh_token": token_data["refresh_token"],
+        "id_token": token_data.get("id_token"),
+        "expires_at": datetime.now() + timedelta(seconds=token_data["expires_in"]),
+    }
 
-    logger.debug("Conta azul tokens:\n%s", conta_azul_tokens)
-    save_tokens_to_file()
+
+def _refresh_with_refresh_token(current: dict) -> dict:
+    """Renovação simples via refresh_token (chamada pelo token store)"""
+    return _tokens_from_response(refresh_tokens())
+
+
+def _renew_conta_azul_tokens(current: dict) -> dict:
+    """
+    Renovação chamada pelo token store (uma thread por vez): tenta o
+    refresh_token e, só se o token já venceu, recorre ao auto_authenticate().
+    """
+    if current.get("refresh_token"):
+        try:
+            return _refresh_with_refresh_token(current)
+        except Exception as e:
+            remaining = conta_azul_token_store.seconds_to_expiry(current)
+            if remaining is not None and remaining > 0:
+                # Ainda válido: o store mantém o token atual e tenta depois
+                raise
+            logger.error(f"❌ Erro ao renovar token — tentando auto_authenticate: {e}")
+
+    logger.info(
+        "Token ausente ou expirado e não renovável — executando auto_authenticate()"
+    )
+    auto_authenticate()
+    return conta_azul_token_store.get()
 
 
 @debug
@@ -169,28 +259,12 @@ def refresh_tokens_safe() -> dict:
             return auto_authenticate()
 
     logger.info("✅ Token ainda válido — nenhuma ação necessária")
-    return conta_azul_tokens
-
-def save_tokens_to_file():
-    data = conta_azul_tokens.copy()
-    if isinstance(data["expires_at"], datetime):
-        data["expires_at"] = data["expires_at"].isoformat()
-    os.makedirs(os.path.dirname(TOKEN_FILE_PATH), exist_ok=True)
-    with open(TOKEN_FILE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
-    logger.info("Conta azul tokens salvo no arquivo: %s", TOKEN_FILE_PATH)
-
-
-def load_tokens_from_file():
-    if os.path.exists(TOKEN_FILE_PATH):
-        with open(TOKEN_FILE_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            conta_azul_tokens["access_token"] = data.get("access_token")
-            conta_azul_tokens["refresh_token"] = data.get("refresh_token")
-            conta_azul_tokens["id_token"] = data.get("id_token")
-            expires_at = data.get("expires_at")
-            if expires_at:
-                conta_azul_tokens["expires_at"] = datetime.fromisoformat(expires_at)
+    return conta_azul_token_store.get()
+
+
+def load_tokens_from_file() -> dict:
+    """Relê o arquivo de tokens (ex.: atualizado por outro processo)"""
+    return conta_azul_token_store.reload()
 
 
 def is_authenticated() -> bool:
@@ -201,24 +275,19 @@ def is_authenticated() -> bool:
         True se o token estiver válido ou foi renovado com sucesso.
         False se não houver token ou falha ao renovar.
     """
-    access_token = conta_azul_tokens.get("access_token")
-    if not access_token:
+    tokens = conta_azul_token_store.get()
+    if not tokens.get("access_token"):
         return False
 
-    delay = get_token_expiry_delay()
-    if delay is None:
+    if get_token_expiry_delay() is None:
         return False
 
-    if delay <= 0:
-        try:
-            token_data = refresh_tokens()
-            set_tokens(token_data)
-            return True
-        except requests.exceptions.RequestException as e:
-            logger.error("❌ Falha ao renovar token: %s", e)
-            return False
-
-    return True
+    try:
+        conta_azul_token_store.ensure_fresh(_refresh_with_refresh_token)
+        return True
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error("❌ Falha ao renovar token: %s", e)
+        return False
 
 
 def get_token_expiry_delay() -> Optional[float]:
@@ -229,32 +298,22 @@ def get_token_expiry_delay() -> Optional[float]:
         Optional[float]: Tempo restante em segundos (>= 0),
         ou None se a data de expiração for inválida.
     """
-    expires_at = conta_azul_tokens.get("expires_at")
-    if not isinstance(expires_at, datetime):
+    delay = conta_azul_token_store.seconds_to_expiry()
+    if delay is None:
         return None
-
-    delay = (expires_at - datetime.now()).total_seconds()
     return max(delay, 0)
 
 
 def get_auth_headers_conta_azul() -> dict:
     """
-    Retorna os headers de autenticação:
-     1) tenta is_authenticated() (que chama refresh_tokens() internamente)
-     2) se ainda não autenticado, chama auto_authenticate()
+    Retorna os headers de autenticação a partir do token em memória.
+    Perto do vencimento uma única thread renova (refresh_token e, se o token
+    já venceu, auto_authenticate()); as demais só esperam se o token expirou.
     """
-    # carrega tokens persistidos (se houver)
-    load_tokens_from_file()
-
-    # 1) tenta usar o token ou renová‑lo
-    if not is_authenticated():
-        logger.info(
-            "Token ausente ou expirado e não renovável — executando auto_authenticate()"
-        )
-        auto_authenticate()
-
-    # 2) agora devemos ter um access_token válido
-    token = conta_azul_tokens.get("access_token")
+    tokens = conta_azul_token_store.ensure_fresh(
+        _renew_conta_azul_tokens, REFRESH_MARGIN_SECONDS
+    )
+    token = tokens.get("access_token")
     if not token:
         raise PermissionError("Não autenticado na Conta Azul após auto_authenticate()")
 
@@ -267,40 +326,23 @@ def get_auth_headers_conta_azul() -> dict:
 ########################################################################## CONTA AZUL MATCH SERVICES
 @debug
 def find_person_uuid_by_phone(phone: str) -> str | None:
-    # Padroniza o número para formato internacional completo
+    # Padroniza o número para o formato canônico usado no índice
     std_number = standardize_phone_number(phone, debug=True)
     if not std_number:
         logger.warning(f"Número {phone} não pôde ser padronizado")
         return None
 
-    # Converte para formato Conta Azul (remove DDI 55 e mantém DDD + número)
-    if len(std_number) == 13:  # Formato completo: 55 + DDD + 9 dígitos
-        conta_azul_number = std_number[2:]  # Remove DDI (55)
-    elif len(std_number) == 12:  # Formato sem nono: 55 + DDD + 8 dígitos
-        # Converte para formato com nono dígito (padrão brasileiro)
-        conta_azul_number = std_number[2:4] + "9" + std_number[4:]
+    directory = get_contact_directory()
+    if directory.has_entity(CONTA_AZUL_PERSONS_ENTITY):
+        person_uuid = directory.find_person_uuid_by_phone(std_number)
     else:
-        logger.warning(f"Formato não suportado: {std_number} (len={len(std_number)})")
-        return None
-
-    logger.debug(f"Buscando cliente no formato Conta Azul: {conta_azul_number}")
-
-    with open(Path("app/database/conta_azul/person.json"), "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for person in data.get("itens", []):
-        person_phone = person.get("telefone")
-        if not person_phone:
-            continue
+        # Diretório ainda não populado por `flask sync`: usa o snapshot JSON
+        person_uuid = get_person_index(PERSONS_FILE_PATH).find_by_phone(std_number)
+    if person_uuid:
+        return person_uuid
 
-        # Padroniza telefone do cliente da Conta Azul
-        person_digits = re.sub(r"\D", "", person_phone)
-
-        # Compara diretamente com o formato Conta Azul
-        if person_digits == conta_azul_number:
-            return person["uuid"]
-
-    logger.warning(f"Cliente não encontrado para: {phone} -> {conta_azul_number}")
+    logger.warning(f"Cliente não encontrado para: {phone} -> {std_number}")
+    record_lookup_miss(CONTA_AZUL_PERSONS_ENTITY)
     return None
 
 
@@ -319,19 +361,16 @@ def find_person_uuid_by_document(document: Optional[str]) -> Optional[str]:
         logger.warning(f"Documento inválido ou vazio após limpeza: {document}")
         return None
 
-    with open(Path("app/database/conta_azul/person.json"), "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for person in data.get("itens", []):
-        raw_doc = person.get("documento")
-        if not isinstance(raw_doc, str):
-            continue  # ignora documentos nulos ou inválidos
-
-        person_doc = re.sub(r"\D", "", raw_doc)
-        if person_doc == digits:
-            return person.get("uuid")
+    directory = get_contact_directory()
+    if directory.has_entity(CONTA_AZUL_PERSONS_ENTITY):
+        person_uuid = directory.find_person_uuid_by_document(digits)
+    else:
+        person_uuid = get_person_index(PERSONS_FILE_PATH).find_by_document(digits)
+    if person_uuid:
+        return person_uuid
 
     logger.warning(f"Cliente não encontrado para documento: {document}")
+    record_lookup_miss(CONTA_AZUL_PERSONS_ENTITY)
     return None
 
 ########################################################################### CONTA AZUL SALE SERVICES
@@ -410,7 +449,7 @@ def build_sale_certif_digital_params(deal_type: str) -> dict:
             }
         )
     else:
-        raise ValueError(f"Tipo de negócio inválido: {deal_type}")
+        raise SaleValidationError(f"Tipo de negócio inválido: {deal_type}")
 
     return base
 
@@ -426,7 +465,9 @@ def create_sale(sale_payload: dict) -> dict:
         logger.debug(f"Headers: {headers}")
         logger.debug(f"Payload: {sale_payload}")
 
-        response = requests.post(url, json=sale_payload, headers=headers, timeout=60)
+        response = get_http_client("conta_azul").post(
+            url, json=sale_payload, headers=headers, timeout=60
+        )
         response.raise_for_status()
 
         # LOG DA RESPOSTA
@@ -451,7 +492,7 @@ def get_sale_details(sale_id: str) -> dict:
 
     try:
         logger.debug(f"GET {url}")
-        response = requests.get(url, headers=headers, timeout=60)
+        response = get_http_client("conta_azul").get(url, headers=headers, timeout=60)
         response.raise_for_status()
         logger.debug(f"Content: {response.content}")
         return response.json()
@@ -470,7 +511,7 @@ def get_fin_event_billings(fin_event_id: str) -> list:
 
     try:
         logger.debug(f"GET {url}")
-        response = requests.get(url, headers=headers, timeout=60)
+        response = get_http_client("conta_azul").get(url, headers=headers, timeout=60)
         response.raise_for_status()
         logger.debug(f"Response:\n{response.json()}")
         return response.json()
@@ -502,7 +543,9 @@ def generate_billing(parcel_id: str, due_date: datetime) -> dict:
     logger.debug(f"POST {url}")
     logger.debug(f"Payload: {payload}")
 
-    response = requests.post(url, json=payload, headers=headers, timeout=60)
+    response = get_http_client("conta_azul").post(
+        url, json=payload, headers=headers, timeout=60
+    )
 
     # Adicione este log para capturar detalhes do erro
     if response.status_code >= 400:
@@ -522,7 +565,7 @@ def get_sale_pdf(sale_id: str) -> bytes:
 
     try:
         logger.debug(f"GET {url}")
-        response = requests.get(url, headers=headers, timeout=60)
+        response = get_http_client("conta_azul").get(url, headers=headers, timeout=60)
         response.raise_for_status()
         return response.content
     except requests.exceptions.RequestException as e:
@@ -542,10 +585,12 @@ def handle_sale_creation_certif_digital(contact_number: str, document: str, deal
     if not pending:
         raise ValueError(f"Nenhuma solicitação pendente para {contact_number}")
 
-    # Busca UUID do cliente
+    # Busca UUID do cliente só pelo documento: um telefone pode atender
+    # várias empresas, e a venda tem que sair para a empresa certa
     client_uuid = find_person_uuid_by_document(document)
     if not client_uuid:
-        raise ValueError(f"Cliente com telefone {contact_number} não encontrado")
+        # Miss no índice pode ser só snapshot defasado: segue com retry
+        raise ValueError(f"Cliente com documento {document} não encontrado")
 
     params = build_sale_certif_digital_params(deal_type)
 
@@ -600,7 +645,3 @@ def extract_billing_info(contact_number: str) -> dict:
         raise ValueError("URL do boleto não encontrada")
 
     return {"financial_event_id": evento_id, "boleto_url": boleto_url}
-
-
-# Carrega tokens do arquivo ao inicializar
-load_tokens_from_file()
@@ -0,0 +1,247 @@
+# app/services/conta_azul/person_index.py
+"""
+In-memory index of Conta Azul persons following Single Responsibility Principle.
+
+Documents (CPF/CNPJ) and phones are normalized once per snapshot version
+instead of on every lookup. The snapshot is rebuilt when the file's
+mtime/size changes and replaced in a single assignment.
+
+Duplicated keys resolve to the last person in the snapshot, which is exported
+oldest-synced first, so the newest synced person wins, as in the directory.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.sync.snapshot import iter_snapshot
+from app.utils.utils import standardize_phone_number
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERSONS_PATH = os.path.join(
+    os.getcwd(), "app", "database", "conta_azul", "person.json"
+)
+
+FileSignature = Optional[Tuple[int, int]]
+
+
+def normalize_document(document: Any) -> Optional[str]:
+    """Return only the digits of a CPF/CNPJ, or None if empty/invalid"""
+    if not isinstance(document, str):
+        return None
+    digits = re.sub(r"\D", "", document)
+    return digits or None
+
+
+class PersonIndexSnapshot:
+    """Lookup tables built from a single version of the persons file"""
+
+    def __init__(
+        self,
+        signature: FileSignature,
+        uuid_by_document: Dict[str, str],
+        uuid_by_phone: Dict[str, str],
+        duplicate_documents: Dict[str, List[str]],
+        duplicate_phones: Dict[str, List[str]],
+    ):
+        self.signature = signature
+        self.uuid_by_document = uuid_by_document
+        self.uuid_by_phone = uuid_by_phone
+        self.duplicate_documents = duplicate_documents
+        self.duplicate_phones = duplicate_phones
+
+
+class ContaAzulPersonIndex:
+    """Document/phone → person UUID index for a Conta Azul persons snapshot"""
+
+    def __init__(self, persons_file_path: str = DEFAULT_PERSONS_PATH):
+        self.persons_file_path = persons_file_path
+        self._snapshot: Optional[PersonIndexSnapshot] = None
+        self._build_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._builds = 0
+
+    def find_by_document(self, document: Optional[str]) -> Optional[str]:
+        """Return the person UUID for a CPF/CNPJ (with or without mask)"""
+        digits = normalize_document(document)
+        if not digits:
+            return None
+        return self._record(self.get_snapshot().uuid_by_document.get(digits))
+
+    def find_by_phone(self, phone: str) -> Optional[str]:
+        """Return the person UUID for a phone number in any format"""
+        std_number = standardize_phone_number(phone, debug=True)
+        if not std_number:
+            return None
+        return self._record(self.get_snapshot().uuid_by_phone.get(std_number))
+
+    def get_snapshot(self) -> PersonIndexSnapshot:
+        """Return the current snapshot, rebuilding it if the file changed"""
+        signature = self._file_signature()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._build_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.signature == signature:
+                return snapshot
+            return self._rebuild(signature)
+
+    def refresh(self) -> PersonIndexSnapshot:
+        """Force a rebuild from the file on disk"""
+        with self._build_lock:
+            return self._rebuild(self._file_signature())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and index sizes"""
+        snapshot = self._snapshot
+        with self._stats_lock:
+            hits, misses, builds = self._hits, self._misses, self._builds
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "builds": builds,
+            "documents": len(snapshot.uuid_by_document) if snapshot else 0,
+            "phones": len(snapshot.uuid_by_phone) if snapshot else 0,
+            "duplicate_documents": (
+                len(snapshot.duplicate_documents) if snapshot else 0
+            ),
+            "duplicate_phones": len(snapshot.duplicate_phones) if snapshot else 0,
+        }
+
+    def _record(self, uuid: Optional[str]) -> Optional[str]:
+        """Update hit/miss counters and pass the result through"""
+        with self._stats_lock:
+            if uuid:
+                self._hits += 1
+            else:
+                self._misses += 1
+        return uuid
+
+    def _rebuild(self, signature: FileSignature) -> PersonIndexSnapshot:
+        """Build a new snapshot and swap it in (caller holds the build lock)"""
+        previous = self._snapshot
+
+        if signature is None:
+            logger.error(f"Persons file not found: {self.persons_file_path}")
+            snapshot = PersonIndexSnapshot(None, {}, {}, {}, {})
+        else:
+            try:
+                persons = self._load_persons()
+            except (json.JSONDecodeError, OSError) as e:
+                logger.error(f"Error loading persons index: {str(e)}")
+                if previous is not None:
+                    snapshot = PersonIndexSnapshot(
+                        signature,
+                        previous.uuid_by_document,
+                        previous.uuid_by_phone,
+                        previous.duplicate_documents,
+                        previous.duplicate_phones,
+                    )
+                else:
+                    snapshot = PersonIndexSnapshot(signature, {}, {}, {}, {})
+            else:
+                snapshot = self._build_snapshot(signature, persons)
+                self._log_build(snapshot)
+
+        with self._stats_lock:
+            self._builds += 1
+        self._snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def _build_snapshot(
+        signature: FileSignature, persons: List[Dict[str, Any]]
+    ) -> PersonIndexSnapshot:
+        """Index persons by digit-only document and canonical phone"""
+        uuid_by_document: Dict[str, str] = {}
+        uuid_by_phone: Dict[str, str] = {}
+        duplicate_documents: Dict[str, List[str]] = {}
+        duplicate_phones: Dict[str, List[str]] = {}
+
+        for person in persons:
+            uuid = person.get("uuid")
+            if not uuid:
+                continue
+
+            doc = normalize_document(person.get("documento"))
+            if doc:
+                _index_latest(uuid_by_document, duplicate_documents, doc, uuid)
+
+            std_phone = standardize_phone_number(person.get("telefone") or "")
+            if std_phone:
+                _index_latest(uuid_by_phone, duplicate_phones, std_phone, uuid)
+
+        return PersonIndexSnapshot(
+            signature,
+            uuid_by_document,
+            uuid_by_phone,
+            duplicate_documents,
+            duplicate_phones,
+        )
+
+    def _log_build(self, snapshot: PersonIndexSnapshot) -> None:
+        """Log index sizes and duplicated keys found while building"""
+        logger.info(
+            f"Conta Azul person index built: {len(snapshot.uuid_by_document)} "
+            f"documents, {len(snapshot.uuid_by_phone)} phones"
+        )
+        if snapshot.duplicate_documents:
+            logger.warning(
+                f"{len(snapshot.duplicate_documents)} duplicated documents in "
+                f"{self.persons_file_path}: {list(snapshot.duplicate_documents)[:10]}"
+            )
+        if snapshot.duplicate_phones:
+            logger.warning(
+                f"{len(snapshot.duplicate_phones)} duplicated phones in "
+                f"{self.persons_file_path}: {list(snapshot.duplicate_phones)[:10]}"
+            )
+
+    def _file_signature(self) -> FileSignature:
+        """Return (mtime_ns, size) of the persons file, or None if missing"""
+        try:
+            stat = os.stat(self.persons_file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_persons(self) -> List[Dict[str, Any]]:
+        """Load persons from the snapshot file (NDJSON, list or {"itens": [...]})"""
+        return list(iter_snapshot(self.persons_file_path))
+
+
+def _index_latest(
+    index: Dict[str, str], duplicates: Dict[str, List[str]], key: str, uuid: str
+) -> None:
+    """Keep the last UUID seen for a key and record every one seen"""
+    existing = index.get(key)
+    if existing is not None and existing != uuid:
+        duplicates.setdefault(key, [existing]).append(uuid)
+    index[key] = uuid
+
+
+_indexes: Dict[str, ContaAzulPersonIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_person_index(
+    persons_file_path: str = DEFAULT_PERSONS_PATH,
+) -> ContaAzulPersonIndex:
+    """Return the process-wide index for a persons file"""
+    key = os.path.abspath(persons_file_path)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = ContaAzulPersonIndex(key)
+                _indexes[key] = index
+    return index
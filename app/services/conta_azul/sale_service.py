@@ -10,6 +10,7 @@ import requests
 
 from app.core.interfaces import ISaleService, ITokenManager
 from app.core.config_provider import ServiceConfiguration
+from app.services.http_client import get_http_client
 from app.utils.utils import debug
 
 
@@ -23,6 +24,7 @@ class ContaAzulSaleService(ISaleService):
         self.token_manager = token_manager
         self.bank_account_uuid = bank_account_uuid
         self.base_url = ServiceConfiguration.CONTA_AZUL_API_BASE_URL
+        self.http = get_http_client("conta_azul")
 
     @debug
     def create_sale(self, sale_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -37,7 +39,7 @@ class ContaAzulSaleService(ISaleService):
             logger.debug(f"Headers: {headers}")
             logger.debug(f"Payload: {payload}")
 
-            response = requests.post(url, json=payload, headers=headers, timeout=60)
+            response = self.http.post(url, json=payload, headers=headers, timeout=60)
             response.raise_for_status()
 
             logger.info(f"HTTP Response {response.status_code}")
@@ -59,7 +61,7 @@ class ContaAzulSaleService(ISaleService):
 
         try:
             logger.debug(f"GET {url}")
-            response = requests.get(url, headers=headers, timeout=60)
+            response = self.http.get(url, headers=headers, timeout=60)
             response.raise_for_status()
             logger.debug(f"Content: {response.content}")
             return response.json()
@@ -77,7 +79,7 @@ class ContaAzulSaleService(ISaleService):
 
         try:
             logger.debug(f"GET {url}")
-            response = requests.get(url, headers=headers, timeout=60)
+            response = self.http.get(url, headers=headers, timeout=60)
             response.raise_for_status()
             return response.content
         except requests.exceptions.RequestException as e:
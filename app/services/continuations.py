@@ -0,0 +1,242 @@
+# app/services/continuations.py
+"""
+Event-driven continuations for flows that wait on Bitrix.
+
+A flow that starts a Bitrix workflow (proposal PDF) or waits for Conta Azul
+to publish a boleto URL calls `schedule_continuation` and returns instead
+of sleeping. Each continuation kind has a handler:
+
+- check(entity_id, params): one read of the CRM field; the value when it
+  is ready, None otherwise
+- resume(value, params): the rest of the flow (download, send, finish)
+- expire(params): optional, runs once when max_wait is exceeded
+
+A resume that fails is retried on the next check, so it must not repeat
+side effects: each step that sends something calls `record_progress`,
+which persists a flag in the continuation params, and skips itself when
+the flag is already set.
+
+The ContinuationWorker runs due continuations. Checks back off
+(CONTINUATION_POLL_BASE_SECONDS doubling up to CONTINUATION_POLL_MAX_SECONDS),
+and the Bitrix update webhook calls `wake_continuations` so a filled field is
+picked up immediately. No request or worker thread sleeps while waiting.
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from app.database.continuations import (
+    STATUS_DONE,
+    STATUS_EXPIRED,
+    STATUS_FAILED,
+    add_continuation,
+    claim_due_continuations,
+    count_continuations_by_status,
+    finish_continuation,
+    next_continuation_due_at,
+    reschedule_continuation,
+    save_continuation_params,
+)
+from app.database.continuations import wake_continuations as _wake_in_db
+
+logger = logging.getLogger(__name__)
+
+CONTINUATION_POLL_BASE_SECONDS = float(
+    os.getenv("CONTINUATION_POLL_BASE_SECONDS", "15")
+)
+CONTINUATION_POLL_MAX_SECONDS = float(os.getenv("CONTINUATION_POLL_MAX_SECONDS", "300"))
+CONTINUATION_MAX_WAIT_SECONDS = float(
+    os.getenv("CONTINUATION_MAX_WAIT_SECONDS", str(30 * 60))
+)
+# Quanto tempo uma continuação reivindicada fica reservada para o processo
+CONTINUATION_LEASE_SECONDS = 120
+# O workflow 556 do Bitrix leva ~45s para gerar a proposta
+PROPOSAL_FIRST_CHECK_SECONDS = 45
+
+# Bitrix entityTypeId das entidades observadas
+ENTITY_DEAL = 2
+ENTITY_CERT_SPA = 137
+
+KIND_PROPOSAL_FILE = "proposal_file"
+KIND_BILLING_PDF = "billing_pdf"
+
+# Acordado por novas continuações e pelo webhook do Bitrix
+continuation_wakeup = threading.Event()
+
+
+@dataclass(frozen=True)
+class ContinuationHandler:
+    check: Callable[[str, Dict[str, Any]], Optional[Any]]
+    resume: Callable[[Any, Dict[str, Any]], None]
+    expire: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+def _default_handlers() -> Dict[str, ContinuationHandler]:
+    # Import tardio: digisac_services depende do Flask e da configuração
+    from app.services.digisac.digisac_services import (
+        check_billing_pdf_url,
+        check_proposal_file_url,
+        deliver_billing_pdf,
+        deliver_proposal_file,
+        expire_billing_pdf,
+        expire_proposal_file,
+    )
+
+    return {
+        KIND_PROPOSAL_FILE: ContinuationHandler(
+            check_proposal_file_url, deliver_proposal_file, expire_proposal_file
+        ),
+        KIND_BILLING_PDF: ContinuationHandler(
+            check_billing_pdf_url, deliver_billing_pdf, expire_billing_pdf
+        ),
+    }
+
+
+def schedule_continuation(
+    kind: str,
+    entity_type_id: int,
+    entity_id: Any,
+    params: Dict[str, Any],
+    delay: float = 0,
+    max_wait: float = CONTINUATION_MAX_WAIT_SECONDS,
+) -> int:
+    """Persist a continuation and wake the worker; returns its id"""
+    continuation_id = add_continuation(
+        kind, entity_type_id, str(entity_id), params, delay, max_wait
+    )
+    logger.info(
+        f"⏸️ Continuation #{continuation_id} ({kind}) waiting on "
+        f"entity {entity_type_id}/{entity_id}"
+    )
+    continuation_wakeup.set()
+    return continuation_id
+
+
+def wake_continuations(entity_type_id: int, entity_id: Any) -> int:
+    """Check the entity's waiting continuations now (Bitrix update webhook)"""
+    woken = _wake_in_db(entity_type_id, str(entity_id))
+    if woken:
+        continuation_wakeup.set()
+    return woken
+
+
+def record_progress(params: Dict[str, Any], step: str) -> None:
+    """Mark a resume step as done and persist it before the next one runs"""
+    params[step] = True
+    save_continuation_params(params["continuation_id"], params)
+
+
+def poll_interval(checks: int) -> float:
+    """Delay before the next check, doubling with each unsuccessful one"""
+    return min(
+        CONTINUATION_POLL_MAX_SECONDS, CONTINUATION_POLL_BASE_SECONDS * 2**checks
+    )
+
+
+class ContinuationRunner:
+    """Claims due continuations and checks, resumes or expires them"""
+
+    def __init__(self, handlers: Optional[Dict[str, ContinuationHandler]] = None):
+        self._handlers = handlers
+        self._stats = {"checks": 0, "resumed": 0, "expired": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def handlers(self) -> Dict[str, ContinuationHandler]:
+        if self._handlers is None:
+            self._handlers = _default_handlers()
+        return self._handlers
+
+    def run_due(self) -> int:
+        """Process every due continuation; returns how many were handled"""
+        continuations = claim_due_continuations(CONTINUATION_LEASE_SECONDS)
+        for continuation in continuations:
+            self._run(continuation)
+        return len(continuations)
+
+    def seconds_until_next(self) -> Optional[float]:
+        due_at = next_continuation_due_at()
+        return None if due_at is None else max(0.0, due_at - time.time())
+
+    def _run(self, continuation: Dict[str, Any]) -> None:
+        continuation_id = continuation["id"]
+        kind = continuation["kind"]
+        # O id vai junto para o resume poder gravar o progresso
+        params = {**continuation["params"], "continuation_id": continuation_id}
+        handler = self.handlers.get(kind)
+        if handler is None:
+            finish_continuation(continuation_id, STATUS_FAILED, f"Unknown kind {kind}")
+            self._count("failed")
+            return
+
+        self._count("checks")
+        error = None
+        try:
+            value = handler.check(continuation["entity_id"], params)
+            if value is not None:
+                handler.resume(value, params)
+                finish_continuation(continuation_id, STATUS_DONE)
+                self._count("resumed")
+                logger.info(f"▶️ Continuation #{continuation_id} ({kind}) resumed")
+                return
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Continuation #{continuation_id} ({kind}) error: {e}")
+
+        if time.time() >= continuation["deadline_at"]:
+            self._expire(continuation, handler, error)
+            return
+
+        delay = poll_interval(continuation["checks"])
+        reschedule_continuation(continuation_id, time.time() + delay, error)
+        logger.debug(
+            f"Continuation #{continuation_id} ({kind}) not ready, "
+            f"next check in {delay:.0f}s"
+        )
+
+    def _expire(
+        self,
+        continuation: Dict[str, Any],
+        handler: ContinuationHandler,
+        error: Optional[str],
+    ) -> None:
+        continuation_id = continuation["id"]
+        logger.error(
+            f"❌ Continuation #{continuation_id} ({continuation['kind']}) gave up "
+            f"after {continuation['checks'] + 1} checks"
+        )
+        finish_continuation(continuation_id, STATUS_EXPIRED, error)
+        self._count("expired")
+        if handler.expire:
+            try:
+                handler.expire(continuation["params"])
+            except Exception as e:
+                logger.error(f"Continuation #{continuation_id} expire hook: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats["by_status"] = count_continuations_by_status()
+        return stats
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+_runner: Optional[ContinuationRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_continuation_runner() -> ContinuationRunner:
+    """Process-wide runner shared by the worker and the health check"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = ContinuationRunner()
+    return _runner
@@ -3,8 +3,6 @@
 Digisac authentication service following Single Responsibility Principle.
 """
 
-import json
-import os
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any
@@ -12,6 +10,8 @@ import requests
 
 from app.core.interfaces import IAuthenticationService, ITokenManager, IConfigProvider
 from app.core.config_provider import ServiceConfiguration
+from app.services.http_client import get_http_client
+from app.services.token_store import get_token_store
 
 
 logger = logging.getLogger(__name__)
@@ -22,28 +22,18 @@ class DigisacTokenManager(ITokenManager):
 
     def __init__(self, tokens_file_path: str):
         self.tokens_file_path = tokens_file_path
-        self.tokens = {"access_token": None, "refresh_token": None, "expires_at": None}
-        os.makedirs(os.path.dirname(tokens_file_path), exist_ok=True)
-        self.load_tokens()
+        # Mesmo store em memória usado por digisac_services (expires_at em UTC)
+        self._store = get_token_store(tokens_file_path, now=datetime.utcnow)
+        self.tokens = self._store.get()
 
     def save_tokens(self, tokens: Dict[str, Any]) -> None:
-        """Save tokens to file"""
-        data = tokens.copy()
-        if isinstance(data.get("expires_at"), datetime):
-            data["expires_at"] = data["expires_at"].isoformat()
-
-        with open(self.tokens_file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        """Save tokens (file is rewritten atomically, only on change)"""
+        self._store.set(tokens)
+        self.tokens = self._store.get()
 
     def load_tokens(self) -> Dict[str, Any]:
-        """Load tokens from file"""
-        if os.path.exists(self.tokens_file_path):
-            with open(self.tokens_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for k in ("access_token", "refresh_token"):
-                    self.tokens[k] = data.get(k)
-                exp = data.get("expires_at")
-                self.tokens["expires_at"] = datetime.fromisoformat(exp) if exp else None
+        """Load tokens from the in-memory store"""
+        self.tokens = self._store.get()
         return self.tokens
 
     def get_auth_headers(self) -> Dict[str, str]:
@@ -60,6 +50,7 @@ class DigisacAuthenticationService(IAuthenticationService):
     def __init__(self, config: IConfigProvider, token_manager: ITokenManager):
         self.config = config
         self.token_manager = token_manager
+        self.http = get_http_client("digisac")
         self.client_id = "api"
         self.client_secret = "secret"
 
@@ -75,7 +66,7 @@ class DigisacAuthenticationService(IAuthenticationService):
         }
 
         try:
-            response = requests.post(url, data=payload, timeout=10)
+            response = self.http.post(url, data=payload, timeout=10)
             response.raise_for_status()
             token_data = response.json()
             self._update_tokens(token_data)
@@ -101,7 +92,7 @@ class DigisacAuthenticationService(IAuthenticationService):
         }
 
         try:
-            response = requests.post(url, data=payload, timeout=60)
+            response = self.http.post(url, data=payload, timeout=60)
             response.raise_for_status()
             token_data = response.json()
             self._update_tokens(token_data)
@@ -0,0 +1,193 @@
+# app/services/digisac/contact_index.py
+"""
+In-memory index of Digisac contacts following Single Responsibility Principle.
+
+The index is built once from the contacts snapshot and rebuilt only when the
+file's mtime/size changes. Each build produces a new immutable snapshot that
+replaces the previous one in a single assignment, so concurrent request
+threads always read a complete index.
+
+The snapshot is exported from the contact directory oldest-synced first and
+the last contact seen for a phone wins, so duplicates resolve as in the
+directory: the newest synced contact wins.
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.services.sync.snapshot import iter_snapshot
+from app.utils.utils import standardize_phone_number
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTACTS_PATH = os.path.join(
+    os.getcwd(), "app", "database", "digisac", "digisac_contacts.json"
+)
+
+FileSignature = Optional[Tuple[int, int]]
+
+
+def phone_variants(std_number: Optional[str]) -> List[str]:
+    """
+    Return the lookup keys for a standardized number: the canonical
+    12-digit form plus the variant with the ninth digit.
+    """
+    if not std_number:
+        return []
+
+    variants = [std_number]
+    if len(std_number) == 12:
+        variants.append(std_number[:4] + "9" + std_number[4:])
+    elif len(std_number) == 13:
+        variants.append(std_number[:4] + std_number[5:])
+    return variants
+
+
+class ContactIndexSnapshot:
+    """Lookup tables built from a single version of the contacts file"""
+
+    def __init__(
+        self,
+        signature: FileSignature,
+        id_by_number: Dict[str, str],
+        number_by_id: Dict[str, str],
+    ):
+        self.signature = signature
+        self.id_by_number = id_by_number
+        self.number_by_id = number_by_id
+
+    def __len__(self) -> int:
+        return len(self.number_by_id)
+
+
+class DigisacContactIndex:
+    """Phone ↔ contact ID index for a Digisac contacts snapshot"""
+
+    def __init__(self, contacts_file_path: str = DEFAULT_CONTACTS_PATH):
+        self.contacts_file_path = contacts_file_path
+        self._snapshot: Optional[ContactIndexSnapshot] = None
+        self._build_lock = threading.Lock()
+
+    def find_contact_id(self, phone: str) -> Optional[str]:
+        """Return the contact ID for a phone number, or None if not indexed"""
+        std_number = standardize_phone_number(phone, debug=True)
+        if not std_number:
+            return None
+
+        snapshot = self.get_snapshot()
+        for candidate in phone_variants(std_number):
+            contact_id = snapshot.id_by_number.get(candidate)
+            if contact_id:
+                return contact_id
+        return None
+
+    def find_contact_number(self, contact_id: str) -> Optional[str]:
+        """Return the raw phone number stored for a contact ID"""
+        if not contact_id:
+            return None
+        return self.get_snapshot().number_by_id.get(contact_id)
+
+    def get_snapshot(self) -> ContactIndexSnapshot:
+        """Return the current snapshot, rebuilding it if the file changed"""
+        signature = self._file_signature()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._build_lock:
+            # Outra thread pode ter reconstruído enquanto aguardávamos o lock
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.signature == signature:
+                return snapshot
+            return self._rebuild(signature)
+
+    def refresh(self) -> ContactIndexSnapshot:
+        """Force a rebuild from the file on disk"""
+        with self._build_lock:
+            return self._rebuild(self._file_signature())
+
+    def _rebuild(self, signature: FileSignature) -> ContactIndexSnapshot:
+        """Build a new snapshot and swap it in (caller holds the build lock)"""
+        previous = self._snapshot
+
+        if signature is None:
+            logger.error(f"Contacts file not found: {self.contacts_file_path}")
+            snapshot = ContactIndexSnapshot(None, {}, {})
+        else:
+            try:
+                contacts = self._load_contacts()
+            except (json.JSONDecodeError, OSError) as e:
+                logger.error(f"Error loading contacts index: {str(e)}")
+                if previous is not None:
+                    # Mantém o índice anterior; nova tentativa na próxima mudança
+                    snapshot = ContactIndexSnapshot(
+                        signature, previous.id_by_number, previous.number_by_id
+                    )
+                else:
+                    snapshot = ContactIndexSnapshot(signature, {}, {})
+            else:
+                snapshot = self._build_snapshot(signature, contacts)
+                logger.info(
+                    f"Digisac contact index built with {len(snapshot)} contacts "
+                    f"({len(snapshot.id_by_number)} phone keys)"
+                )
+
+        self._snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def _build_snapshot(
+        signature: FileSignature, contacts: list
+    ) -> ContactIndexSnapshot:
+        """Index contacts by canonical phone variants and by ID"""
+        id_by_number: Dict[str, str] = {}
+        number_by_id: Dict[str, str] = {}
+
+        for contact in contacts:
+            contact_id = contact.get("id")
+            if not contact_id:
+                continue
+
+            contact_num = (contact.get("data") or {}).get("number")
+            number_by_id[contact_id] = contact_num
+
+            contact_std = standardize_phone_number(contact_num or "", debug=False)
+            for key in phone_variants(contact_std):
+                # O último do arquivo (o sincronizado mais recente) vence
+                id_by_number[key] = contact_id
+
+        return ContactIndexSnapshot(signature, id_by_number, number_by_id)
+
+    def _file_signature(self) -> FileSignature:
+        """Return (mtime_ns, size) of the contacts file, or None if missing"""
+        try:
+            stat = os.stat(self.contacts_file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_contacts(self) -> list:
+        """Load contacts from the snapshot file (NDJSON or legacy JSON list)"""
+        return list(iter_snapshot(self.contacts_file_path))
+
+
+_indexes: Dict[str, DigisacContactIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_contact_index(
+    contacts_file_path: str = DEFAULT_CONTACTS_PATH,
+) -> DigisacContactIndex:
+    """Return the process-wide index for a contacts file"""
+    key = os.path.abspath(contacts_file_path)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = DigisacContactIndex(key)
+                _indexes[key] = index
+    return index
@@ -3,12 +3,17 @@
 Digisac contact service following Single Responsibility Principle.
 """
 
-import json
 import logging
 from typing import Optional
-from pathlib import Path
 
 from app.core.interfaces import IContactService
+from app.database.contact_directory import (
+    DIGISAC_CONTACTS_ENTITY,
+    ContactDirectory,
+    get_contact_directory,
+)
+from app.services.digisac.contact_index import get_contact_index
+from app.services.sync.freshness import record_lookup_miss
 from app.utils.utils import standardize_phone_number
 
 
@@ -18,8 +23,12 @@ logger = logging.getLogger(__name__)
 class DigisacContactService(IContactService):
     """Contact service for Digisac following SRP"""
 
-    def __init__(self, contacts_file_path: str):
+    def __init__(
+        self, contacts_file_path: str, directory: Optional[ContactDirectory] = None
+    ):
         self.contacts_file_path = contacts_file_path
+        self._index = get_contact_index(contacts_file_path)
+        self._directory = directory or get_contact_directory()
 
     def find_contact_by_phone(self, phone: str) -> Optional[str]:
         """Find contact ID by phone number with number variations support"""
@@ -30,33 +39,18 @@ class DigisacContactService(IContactService):
             logger.warning(f"Could not standardize phone number: {phone}")
             return None
 
-        try:
-            # Generate variations for numbers with 13 digits (with ninth digit)
-            possible_numbers = [std_number]
-            if len(std_number) == 13:
-                # Version without ninth digit: 55 (DDI) + 62 (DDD) + 93159124 (number)
-                without_ninth = std_number[:4] + std_number[5:]
-                possible_numbers.append(without_ninth)
-                logger.debug(
-                    f"Generated variation without ninth digit: {without_ninth}"
-                )
-
-            contacts = self._load_contacts()
-
-            for contact in contacts:
-                contact_num = (contact.get("data") or {}).get("number") or ""
-                contact_std = standardize_phone_number(contact_num, debug=False)
-
-                if contact_std in possible_numbers:
-                    logger.debug(f"Contact found: {contact_std} => {contact.get('id')}")
-                    return contact.get("id")
-
-            logger.warning(f"No contact found for: {std_number}")
-            return None
-
-        except (FileNotFoundError, json.JSONDecodeError, OSError) as e:
-            logger.error(f"Error searching contact ID: {str(e)}")
-            return None
+        if self._directory.has_entity(DIGISAC_CONTACTS_ENTITY):
+            contact_id = self._directory.find_digisac_contact_id(phone)
+        else:
+            # Directory not populated yet: fall back to the JSON snapshot
+            contact_id = self._index.find_contact_id(phone)
+        if contact_id:
+            logger.debug(f"Contact found: {std_number} => {contact_id}")
+            return contact_id
+
+        logger.warning(f"No contact found for: {std_number}")
+        record_lookup_miss(DIGISAC_CONTACTS_ENTITY)
+        return None
 
     def find_contact_by_document(self, document: str) -> Optional[str]:
         """Find contact ID by document (not implemented for Digisac)"""
@@ -65,21 +59,6 @@ class DigisacContactService(IContactService):
 
     def get_contact_phone_by_id(self, contact_id: str) -> Optional[str]:
         """Get contact phone number by ID"""
-        try:
-            contacts = self._load_contacts()
-
-            for contact in contacts:
-                if contact.get("id") == contact_id:
-                    return (contact.get("data") or {}).get("number")
-
-        except Exception as e:
-            logger.error(f"Error getting contact by ID: {str(e)}")
-
-        return None
-
-    def _load_contacts(self) -> list:
-        """Load contacts from JSON file"""
-        contacts_path = Path(self.contacts_file_path)
-
-        with open(contacts_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        if self._directory.has_entity(DIGISAC_CONTACTS_ENTITY):
+            return self._directory.find_digisac_contact_number(contact_id)
+        return self._index.find_contact_number(contact_id)
@@ -4,25 +4,53 @@ import os
 import json
 import logging
 import unicodedata
-import time
 import base64
 import urllib.parse
 from functools import wraps
-from typing import Optional
+from typing import Optional, Union
 from datetime import datetime, timedelta
 import requests
 from flask import request, jsonify
 from app.config import Config
+from app.services.http_client import get_http_client
+from app.services.pdf_relay import CachedPDF, get_pdf_relay
+from app.services.continuations import (
+    ENTITY_CERT_SPA,
+    ENTITY_DEAL,
+    KIND_BILLING_PDF,
+    KIND_PROPOSAL_FILE,
+    PROPOSAL_FIRST_CHECK_SECONDS,
+    record_progress,
+    schedule_continuation,
+)
+from app.services.token_store import get_token_store
 from app.utils.utils import retry_with_backoff, standardize_phone_number, debug
+from app.services.digisac.contact_index import get_contact_index
+from app.services.digisac.open_tickets import get_open_ticket_snapshot
+from app.services.digisac.file_upload import post_file_message
+from app.services.digisac.dispatcher import (
+    KIND_CLOSE,
+    KIND_MESSAGE,
+    KIND_PDF,
+    KIND_TRANSFER,
+    get_digisac_dispatcher,
+)
+from app.database.contact_directory import (
+    DIGISAC_CONTACTS_ENTITY,
+    get_contact_directory,
+)
+from app.services.sync.freshness import record_lookup_miss
 from app.services.renewal_services import (
     get_pending,
     add_pending,
+    update_pending,
     insert_ticket_flow_queue,
 )
 from app.services.bitrix24.bitrix_services import (
     start_bitrix_workflow,
     get_crm_item,
     get_deal_item,
+    update_deal_item,
 )
 
 
@@ -46,9 +74,16 @@ logger = logging.getLogger(__name__)
 
 
 TOKENS_FILE = os.path.join("app", "database", "digisac", "digisac_tokens.json")
-os.makedirs(os.path.dirname(TOKENS_FILE), exist_ok=True)
+# Renova o token antes do vencimento (expires_at já desconta 60s)
+DIGISAC_REFRESH_MARGIN_SECONDS = int(os.getenv("DIGISAC_REFRESH_MARGIN_SECONDS", "300"))
+
+CONTACTS_FILE = os.path.join(
+    os.getcwd(), "app", "database", "digisac", "digisac_contacts.json"
+)
 
-digisac_tokens = {"access_token": None, "refresh_token": None, "expires_at": None}
+# Tokens em memória, compartilhados entre threads; o arquivo só é regravado
+# quando mudam (expires_at em UTC)
+digisac_token_store = get_token_store(TOKENS_FILE, now=datetime.utcnow)
 
 
 class QueueingException(Exception):
@@ -134,29 +169,29 @@ def queue_if_open_ticket_route(add_pending_if_missing=False):
 
 
 def get_auth_headers_digisac() -> dict:
-    load_tokens()
-    if not digisac_tokens["access_token"] or (
-        digisac_tokens["expires_at"]
-        and datetime.utcnow() > digisac_tokens["expires_at"]
-    ):
-        refresh_tokens()
+    tokens = digisac_token_store.ensure_fresh(
+        _fetch_digisac_tokens, DIGISAC_REFRESH_MARGIN_SECONDS
+    )
     return {
-        "Authorization": f"Bearer {digisac_tokens['access_token']}",
+        "Authorization": f"Bearer {tokens['access_token']}",
         "Content-Type": "application/json",
     }
 
 
-def refresh_tokens():
+def refresh_tokens() -> dict:
     """
     Atualiza os tokens da Digisac:
       - Usa o refresh_token, se existir
       - Caso contrário, usa as credenciais de usuário
     """
-    load_tokens()
+    return digisac_token_store.force_refresh(_fetch_digisac_tokens)
+
 
+def _fetch_digisac_tokens(current: dict) -> dict:
+    """Obtém novos tokens a partir dos atuais (chamado pelo token store)"""
     # Tenta renovar usando refresh_token
-    if digisac_tokens.get("refresh_token"):
-        token_data = refresh_auth_digisac(digisac_tokens["refresh_token"])
+    if current.get("refresh_token"):
+        token_data = refresh_auth_digisac(current["refresh_token"])
     else:
         token_data = get_auth_digisac()
 
@@ -164,15 +199,12 @@ def refresh_tokens():
     if not token_data or "access_token" not in token_data:
         raise RuntimeError(f"Falha ao atualizar tokens Digisac: {token_data}")
 
-    # Atualiza tokens em memória
-    digisac_tokens["access_token"] = token_data["access_token"]
-    digisac_tokens["refresh_token"] = token_data["refresh_token"]
-    digisac_tokens["expires_at"] = datetime.utcnow() + timedelta(
-        seconds=token_data["expires_in"] - 60
-    )
-
-    # Persiste no JSON
-    save_tokens()
+    return {
+        "access_token": token_data["access_token"],
+        "refresh_token": token_data["refresh_token"],
+        "expires_at": datetime.utcnow()
+        + timedelta(seconds=token_data["expires_in"] - 60),
+    }
 
 
 def get_auth_digisac() -> dict:
@@ -186,7 +218,7 @@ def get_auth_digisac() -> dict:
         "password": DIGISAC_PASSWORD,
     }
     try:
-        response = requests.post(url, data=payload, timeout=10)
+        response = get_http_client("digisac").post(url, data=payload, timeout=10)
         response.raise_for_status()
         logger.debug("Payload\n%s\nResponse:\n%s", payload, response.json())
         return response.json()
@@ -205,7 +237,7 @@ def refresh_auth_digisac(refresh_token: str) -> dict:
         "refresh_token": refresh_token,
     }
     try:
-        response = requests.post(url, data=payload, timeout=60)
+        response = get_http_client("digisac").post(url, data=payload, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -213,83 +245,34 @@ def refresh_auth_digisac(refresh_token: str) -> dict:
         return {"error": str(e)}
 
 
-def load_tokens():
-    if os.path.exists(TOKENS_FILE):
-        with open(TOKENS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for k in ("access_token", "refresh_token"):
-                digisac_tokens[k] = data.get(k)
-            exp = data.get("expires_at")
-            digisac_tokens["expires_at"] = datetime.fromisoformat(exp) if exp else None
-
-
-def save_tokens():
-    data = digisac_tokens.copy()
-    if isinstance(data["expires_at"], datetime):
-        data["expires_at"] = data["expires_at"].isoformat()
-    with open(TOKENS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
 @debug
 def _get_contact_id_by_number(contact_number: str) -> str | None:
     """Privado: retorna contact_id a partir do número, ou None se não existir"""
     std_number = standardize_phone_number(contact_number, debug=True)
     logger.debug(f"Buscando contact ID para número padronizado: {std_number}")
 
-    contacts_json_path = os.path.join(
-        os.getcwd(), "app", "database", "digisac", "digisac_contacts.json"
-    )
-
-    try:
-        # Gera variações para números com 13 dígitos (com nono dígito)
-        possible_numbers = [std_number]
-        if len(std_number) == 13:
-            # Versão sem nono dígito: 55 (DDI) + 62 (DDD) + 93159124 (número)
-            without_ninth = std_number[:4] + std_number[5:]
-            possible_numbers.append(without_ninth)
-            logger.debug(f"Gerada variação sem nono dígito: {without_ninth}")
-
-        with open(contacts_json_path, "r", encoding="utf-8") as f:
-            contacts = json.load(f)
-
-        for contact in contacts:
-            contact_num = (contact.get("data") or {}).get("number") or ""
-            contact_std = standardize_phone_number(contact_num, debug=False)
-
-            if contact_std in possible_numbers:
-                logger.debug(
-                    f"Contato encontrado: {contact_std} => {contact.get('id')}"
-                )
-                return contact.get("id")
-
-        logger.warning(f"Nenhum contato encontrado para: {std_number}")
-        return None
-
-    except (FileNotFoundError, json.JSONDecodeError, OSError) as e:
-        logger.error(f"Erro ao buscar contactId: {str(e)}")
-        return None
+    directory = get_contact_directory()
+    if directory.has_entity(DIGISAC_CONTACTS_ENTITY):
+        contact_id = directory.find_digisac_contact_id(contact_number)
+    else:
+        # Diretório ainda não populado por `flask sync`: usa o snapshot JSON
+        contact_id = get_contact_index(CONTACTS_FILE).find_contact_id(contact_number)
+    if contact_id:
+        logger.debug(f"Contato encontrado: {std_number} => {contact_id}")
+        return contact_id
+
+    logger.warning(f"Nenhum contato encontrado para: {std_number}")
+    record_lookup_miss(DIGISAC_CONTACTS_ENTITY)
+    return None
 
 
 @debug
 def _get_contact_number_by_id(contact_id: str) -> Optional[str]:
     """Obtém o número de telefone de um contato pelo ID do Digisac"""
-    contacts_json_path = os.path.join(
-        os.getcwd(), "app", "database", "digisac", "digisac_contacts.json"
-    )
-
-    try:
-        with open(contacts_json_path, "r", encoding="utf-8") as f:
-            contacts = json.load(f)
-
-        for contact in contacts:
-            if contact.get("id") == contact_id:
-                return (contact.get("data") or {}).get("number")
-
-    except Exception as e:
-        logger.error(f"Erro ao buscar contato por ID: {str(e)}")
-
-    return None
+    directory = get_contact_directory()
+    if directory.has_entity(DIGISAC_CONTACTS_ENTITY):
+        return directory.find_digisac_contact_number(contact_id)
+    return get_contact_index(CONTACTS_FILE).find_contact_number(contact_id)
 
 
 # --- Builders genéricos ---
@@ -329,16 +312,26 @@ def build_message_payload(
 
 @debug
 def build_pdf_payload(
-    contact_id: str, pdf_content: bytes, filename: str, text: str
+    contact_id: str, pdf_content: Union[bytes, CachedPDF], filename: str, text: str
 ) -> dict:
-    """Gera payload para envio de arquivo PDF via Digisac"""
-    pdf_base64 = base64.b64encode(pdf_content).decode("utf-8")
+    """
+    Gera payload para envio de arquivo PDF via Digisac. PDFs do cache do
+    relay vão como caminho e sha256 do blob, lido do disco só no envio
+    (send_pdf_digisac); o relay não remove blobs referenciados pela fila do
+    dispatcher ou pelas dead letters.
+    """
+    file_info = {"mimetype": "application/pdf", "name": filename}
+    if isinstance(pdf_content, CachedPDF):
+        file_info["path"] = pdf_content.path
+        file_info["sha256"] = pdf_content.sha256
+    else:
+        file_info["base64"] = base64.b64encode(pdf_content).decode("utf-8")
     user_id = DIGISAC_USER_ID
     return {
         "text": text,
         "contactId": contact_id,
         "userId": user_id,
-        "file": {"base64": pdf_base64, "mimetype": "application/pdf", "name": filename},
+        "file": file_info,
     }
 
 
@@ -364,11 +357,7 @@ def build_transfer_to_certification(
         comments=CERT_TRANSFER_COMMENTS,
     )
 
-    return (
-        transfer_ticket_digisac(user_payload, contact_id)
-        if not to_queue
-        else transfer_ticket_digisac(queue_payload, contact_id)
-    )
+    return dispatch_digisac(KIND_TRANSFER, queue_payload if to_queue else user_payload)
 
 
 @debug
@@ -380,7 +369,7 @@ def build_transfer_to_group_without_bot(contact_number: str) -> dict:
         department_id=NO_BOT_DEPT_ID,
         comments=NO_BOT_TRANSFER_COMMENTS,
     )
-    return transfer_ticket_digisac(payload, contact_id)
+    return dispatch_digisac(KIND_TRANSFER, payload)
 
 
 @debug
@@ -403,12 +392,12 @@ def build_certification_message(
         user_id=DIGISAC_USER_ID,
     )
 
-    return send_message_digisac(payload)
+    return dispatch_digisac(KIND_MESSAGE, payload)
 
 
 @debug
 def build_proposal_certification_pdf(
-    contact_number: str, pdf_content: bytes, filename: str
+    contact_number: str, pdf_content: Union[bytes, CachedPDF], filename: str
 ) -> dict:
     """Gera payload para envio de proposta comercial (PDF) da Certificação Digital"""
     contact_id = _get_contact_id_by_number(contact_number)
@@ -438,7 +427,7 @@ def build_send_billing_message(contact_number: str, company_name: str) -> dict:
         user_id=DIGISAC_USER_ID,
     )
 
-    return send_message_digisac(payload)
+    return dispatch_digisac(KIND_MESSAGE, payload)
 
 
 @debug
@@ -448,7 +437,11 @@ def send_proposal_file(
     spa_id: int,
     filename: str = "Proposta_certificado_digital_-_Logic_Assessoria_Empresarial.pdf",
 ) -> dict:
-    """Envia proposta de renovação via Digisac, buscando o PDF salvo como documento no CRM."""
+    """
+    Envia proposta de renovação via Digisac. Dispara o workflow do Bitrix que
+    gera o PDF e retorna; o envio fica numa continuação, retomada quando o
+    documento aparece no card (deliver_proposal_file).
+    """
     doc_id = [
         "crm",
         "Bitrix\\Crm\\Integration\\BizProc\\Document\\Dynamic",
@@ -464,152 +457,198 @@ def send_proposal_file(
         text=init_text,
         user_id=DIGISAC_USER_ID,
     )
-    send_message_digisac(init_payload)
+    dispatch_digisac(KIND_MESSAGE, init_payload)
 
     # Inicia workflow para gerar documentação atualizada
     logger.info("Iniciando workflow Bitrix para geração de proposta.")
     start_bitrix_workflow(template_id=556, document_id=doc_id)
-    time.sleep(45)
-
-    # Busca o card no CRM e obtém URL do PDF, aguardando até estar disponível
-    max_retries = 6
-    retries = 0
-    while True:
-        crm = get_crm_item(entity_type_id=137, spa_id=spa_id)
-        doc_info = crm.get("result", {}).get("item", {}).get("UF_CRM_18_1752245366")
-        if doc_info and isinstance(doc_info, dict) and "urlMachine" in doc_info:
-            break
-        retries += 1
-        if retries >= max_retries:
-            error_text = (
-                "*Bot*\n"
-                "Não foi possível gerar a proposta no momento. "
-                "Por favor, tente novamente mais tarde."
-            )
-            error_payload = build_message_payload(
-                contact_id=contact_id,
-                department_id=CERT_DEPT_ID,
-                text=error_text,
-                user_id=DIGISAC_USER_ID,
-            )
-            send_message_digisac(error_payload)
-            logger.error(
-                f"Limite de tentativas ({max_retries}) excedido ao buscar proposta."
-            )
-            return {"error": "Limite de tentativas excedido ao buscar proposta."}
-        logger.warning(
-            f"Proposta não disponível ainda (tentativa {retries}), aguardando 30s para nova verificação."
-        )
-        time.sleep(30)
 
-    # Baixa o PDF via urlMachine
-    try:
-        response = requests.get(doc_info["urlMachine"], timeout=60)
-        response.raise_for_status()
-        pdf_bytes = response.content
-    except Exception as e:
-        logger.exception("Erro ao baixar PDF do Bitrix")
-        return {"error": f"Erro ao baixar PDF: {e}"}
-
-    # Envia o PDF via Digisac
-    pdf_payload = build_proposal_certification_pdf(
-        contact_number=contact_number,
-        pdf_content=pdf_bytes,
-        filename=filename,
+    continuation_id = schedule_continuation(
+        KIND_PROPOSAL_FILE,
+        ENTITY_CERT_SPA,
+        spa_id,
+        {
+            "contact_number": contact_number,
+            "company_name": company_name,
+            "filename": filename,
+        },
+        delay=PROPOSAL_FIRST_CHECK_SECONDS,
     )
-    pdf_response = send_pdf_digisac(pdf_payload)
+    return {"status": "pending", "continuation_id": continuation_id}
+
+
+def check_proposal_file_url(spa_id: str, params: dict) -> Optional[str]:
+    """URL do PDF da proposta no card, se o workflow já o gerou"""
+    crm = get_crm_item(entity_type_id=137, spa_id=int(spa_id))
+    doc_info = crm.get("result", {}).get("item", {}).get("UF_CRM_18_1752245366")
+    if doc_info and isinstance(doc_info, dict) and "urlMachine" in doc_info:
+        return doc_info["urlMachine"]
+    return None
+
+
+@debug
+def deliver_proposal_file(doc_url: str, params: dict) -> None:
+    """
+    Continuação da proposta: baixa o PDF (ou reaproveita do cache) e envia.
+    Cada envio é registrado nos params; uma nova tentativa pula o que já foi.
+    """
+    if not params.get("pdf_sent"):
+        pdf = get_pdf_relay().fetch(doc_url)
+        pdf_payload = build_proposal_certification_pdf(
+            contact_number=params["contact_number"],
+            pdf_content=pdf,
+            filename=params["filename"],
+        )
+        _dispatch_step(KIND_PDF, pdf_payload)
+        record_progress(params, "pdf_sent")
+
+    if params.get("message_sent"):
+        return
 
     # Mensagem final de entrega da proposta
     final_text = (
         "*Bot*\n"
         "Olá! Segue a proposta comercial para renovação do "
-        f"certificado digital da empresa *{company_name}*.\n"
+        f"certificado digital da empresa *{params['company_name']}*.\n"
         "Qualquer dúvida, estamos à disposição."
     )
     final_payload = build_message_payload(
-        contact_id=contact_id,
+        contact_id=_get_contact_id_by_number(params["contact_number"]),
         department_id=CERT_DEPT_ID,
         text=final_text,
         user_id=DIGISAC_USER_ID,
     )
-    send_message_digisac(final_payload)
+    _dispatch_step(KIND_MESSAGE, final_payload)
+    record_progress(params, "message_sent")
+
 
-    return pdf_response
+def expire_proposal_file(params: dict) -> None:
+    """O workflow não gerou a proposta a tempo: avisa o cliente"""
+    error_text = (
+        "*Bot*\n"
+        "Não foi possível gerar a proposta no momento. "
+        "Por favor, tente novamente mais tarde."
+    )
+    error_payload = build_message_payload(
+        contact_id=_get_contact_id_by_number(params["contact_number"]),
+        department_id=CERT_DEPT_ID,
+        text=error_text,
+        user_id=DIGISAC_USER_ID,
+    )
+    dispatch_digisac(KIND_MESSAGE, error_payload)
 
 
 @debug
 def build_billing_certification_pdf(
-    contact_number: str, company_name: str, deal_id: int, filename: str
+    contact_number: str,
+    company_name: str,
+    deal_id: int,
+    filename: str,
+    spa_id: Optional[int] = None,
 ) -> dict:
     """
-    Gera e envia o PDF de cobrança, aguardando a URL no CRM.
-    A lógica foi simplificada para esperar uma URL direta do Conta Azul.
+    Agenda o envio do PDF de cobrança. A continuação aguarda a URL do Conta
+    Azul no negócio, baixa o PDF e envia mensagem + PDF (deliver_billing_pdf).
+    Com `spa_id`, conclui também a etapa: pendência em billing_pdf_sent,
+    negócio em C18:PREPARATION e encerramento do ticket, depois do envio.
     """
-    max_retries = 6
-    retries = 0
-    doc_url = None
-
-    while retries < max_retries:
-        deal = get_deal_item(deal_id=deal_id)
-        # Espera-se que o campo contenha a URL como uma string direta.
-        doc_info_url = deal.get("result", {}).get("UF_CRM_1751478607")
-
-        # Validação simplificada: verifica se é uma string e se é do domínio esperado.
-        if isinstance(doc_info_url, str) and doc_info_url.startswith(
-            "https://public.contaazul.com"
-        ):
-            doc_url = doc_info_url
-            logger.info(
-                f"URL de cobrança do Conta Azul encontrada para o Deal ID: {deal_id}"
-            )
-            break  # Sai do loop, pois a URL foi encontrada e validada.
+    continuation_id = schedule_continuation(
+        KIND_BILLING_PDF,
+        ENTITY_DEAL,
+        deal_id,
+        {
+            "contact_number": contact_number,
+            "company_name": company_name,
+            "deal_id": deal_id,
+            "filename": filename,
+            "spa_id": spa_id,
+        },
+    )
+    return {"status": "pending", "continuation_id": continuation_id}
+
+
+def check_billing_pdf_url(deal_id: str, params: dict) -> Optional[str]:
+    """URL pública da cobrança do Conta Azul no negócio, se já preenchida"""
+    deal = get_deal_item(deal_id=deal_id)
+    doc_url = deal.get("result", {}).get("UF_CRM_1751478607")
+    if isinstance(doc_url, str) and doc_url.startswith("https://public.contaazul.com"):
+        return doc_url
+    return None
+
 
-        retries += 1
-        logger.warning(
-            f"URL de cobrança não encontrada para o Deal ID {deal_id} (tentativa {retries}/{max_retries}). Aguardando 30s."
+@debug
+def deliver_billing_pdf(doc_url: str, params: dict) -> None:
+    """
+    Continuação da cobrança: baixa o boleto em streaming e envia.
+    Cada envio é registrado nos params; uma nova tentativa pula o que já foi.
+    """
+    contact_number = params["contact_number"]
+
+    if not params.get("pdf_sent"):
+        # Falha no download: a continuação tenta de novo mais tarde
+        pdf = get_pdf_relay().fetch(doc_url)
+        logger.info(
+            "URL de cobrança do Conta Azul encontrada para o Deal ID: "
+            f"{params['deal_id']}"
         )
-        time.sleep(30)
+        contact_id = _get_contact_id_by_number(contact_number)
 
-    # Se o loop terminar sem encontrar a URL, retorna um erro.
-    if not doc_url:
-        logger.error(
-            f"Limite de tentativas excedido. URL de cobrança não encontrada para o Deal ID: {deal_id}."
+        if not params.get("message_sent"):
+            # Envia mensagem de texto inicial
+            text = (
+                "*Bot*\n"
+                "Segue boleto para pagamento referente à emissão "
+                f"de certificado digital da empresa *{params['company_name']}*."
+            )
+            message_payload = build_message_payload(
+                contact_id=contact_id,
+                department_id=CERT_DEPT_ID,
+                text=text,
+                user_id=DIGISAC_USER_ID,
+            )
+            _dispatch_step(KIND_MESSAGE, message_payload)
+            record_progress(params, "message_sent")
+
+        # Gera payload e envia o PDF via Digisac
+        payload = build_pdf_payload(
+            contact_id=contact_id,
+            pdf_content=pdf,
+            filename=params["filename"],
+            text="Cobrança",
         )
-        return {"error": "Limite de tentativas excedido ao buscar URL da cobrança."}
+        _dispatch_step(KIND_PDF, payload)
+        record_progress(params, "pdf_sent")
+
+    if params.get("spa_id") and not params.get("stage_finished"):
+        # Erro aqui reagenda a continuação; os envios acima já estão
+        # registrados, então a nova tentativa só refaz a etapa
+        _finish_billing_stage(params["spa_id"], params["deal_id"], contact_number)
+        record_progress(params, "stage_finished")
+
+
+def _finish_billing_stage(spa_id: int, deal_id: int, contact_number: str) -> None:
+    result = update_deal_item(
+        entity_type_id=18,
+        deal_id=deal_id,
+        fields={
+            "STAGE_ID": "C18:PREPARATION",
+        },
+    )
+    if "error" in result:
+        raise RuntimeError(f"Falha ao mover o negócio {deal_id} de stage: {result}")
 
-    # O restante da função para baixar o PDF e enviar via Digisac continua igual.
-    try:
-        response = requests.get(doc_url, timeout=60)
-        response.raise_for_status()
-        pdf_bytes = response.content
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Erro ao baixar o PDF da cobrança da URL: {doc_url}. Erro: {e}")
-        return {"error": f"Falha ao baixar o PDF da cobrança: {e}"}
+    # Estado local só depois que o Bitrix aceitou
+    update_pending(spa_id, status="billing_pdf_sent", last_interaction=datetime.now())
 
-    contact_id = _get_contact_id_by_number(contact_number)
+    # Enfileirado depois da mensagem e do PDF: o ticket só fecha após o envio
+    close_ticket_digisac(contact_number)
 
-    # Envia mensagem de texto inicial
-    text = (
-        "*Bot*\n"
-        "Segue boleto para pagamento referente à emissão "
-        f"de certificado digital da empresa *{company_name}*."
-    )
-    message_payload = build_message_payload(
-        contact_id=contact_id,
-        department_id=CERT_DEPT_ID,
-        text=text,
-        user_id=DIGISAC_USER_ID,
-    )
-    send_message_digisac(message_payload)
 
-    # Gera payload e envia o PDF via Digisac
-    payload = build_pdf_payload(
-        contact_id=contact_id,
-        pdf_content=pdf_bytes,
-        filename=filename,
-        text="Cobrança",
+def expire_billing_pdf(params: dict) -> None:
+    logger.error(
+        "Limite de espera excedido. URL de cobrança não encontrada para o "
+        f"Deal ID: {params['deal_id']}."
     )
-    return send_pdf_digisac(payload)
 
 
 @debug
@@ -631,16 +670,25 @@ def build_form_agendamento(
         text=text,
         user_id=DIGISAC_USER_ID,
     )
-    message_response = send_message_digisac(payload)
-    return message_response
+    return dispatch_digisac(KIND_MESSAGE, payload)
 
 
 # --- Funções de envio/refatoradas ---
 @debug
 @retry_with_backoff(retries=3, backoff_in_seconds=2)
-def fetch_open_ticket_for_user(contact_number: str) -> bool:
-    """Verifica se há chamado aberto para o cliente"""
+def fetch_open_ticket_for_user(contact_number: str) -> Optional[dict]:
+    """
+    Retorna o chamado aberto do cliente, se houver. Responde pelo snapshot
+    em memória dos tickets abertos; só consulta o Digisac se ele estiver velho.
+    """
     contact_id = _get_contact_id_by_number(contact_number)
+    if not contact_id:
+        return None
+
+    known, ticket = get_open_ticket_snapshot().lookup(contact_id)
+    if known:
+        return ticket
+
     query = {
         "where": {"isOpen": True},
         "include": [
@@ -655,7 +703,7 @@ def fetch_open_ticket_for_user(contact_number: str) -> bool:
     encoded_query = urllib.parse.quote(json.dumps(query))
     url = f"{DIGISAC_BASE_API}/tickets?query={encoded_query}"
 
-    resp = requests.get(url, headers=get_auth_headers_digisac())
+    resp = get_http_client("digisac").get(url, headers=get_auth_headers_digisac())
     resp.raise_for_status()
     data = resp.json()
 
@@ -677,12 +725,11 @@ def has_open_ticket_for_user_in_cert_dept(contact_number: str) -> bool:
 
 
 @debug
-@retry_with_backoff(retries=3, backoff_in_seconds=2)
 def transfer_ticket_digisac(payload: dict, contact_id: str) -> dict:
     """Transfere ticket no Digisac usando parâmetros genéricos"""
     url = f"{DIGISAC_BASE_API}/contacts/{contact_id}/ticket/transfer"
     try:
-        response = requests.post(
+        response = get_http_client("digisac").post(
             url, headers=get_auth_headers_digisac(), json=payload, timeout=60
         )
         response.raise_for_status()
@@ -693,12 +740,11 @@ def transfer_ticket_digisac(payload: dict, contact_id: str) -> dict:
 
 
 @debug
-@retry_with_backoff(retries=3, backoff_in_seconds=2)
 def send_message_digisac(payload: dict) -> dict:
     """Envia mensagem automática via Digisac usando parâmetros genéricos"""
     url = f"{DIGISAC_BASE_API}/messages"
     try:
-        response = requests.post(
+        response = get_http_client("digisac").post(
             url, headers=get_auth_headers_digisac(), json=payload, timeout=60
         )
         response.raise_for_status()
@@ -709,14 +755,27 @@ def send_message_digisac(payload: dict) -> dict:
 
 
 @debug
-@retry_with_backoff(retries=3, backoff_in_seconds=2)
 def send_pdf_digisac(payload: dict) -> dict:
-    """Envia PDF via Digisac usando parâmetros genéricos"""
+    """
+    Envia PDF via Digisac usando parâmetros genéricos. Com `file.path`, o
+    arquivo é lido do disco no envio: base64 em blocos ou, com o multipart
+    habilitado (DIGISAC_UPLOAD_MODE), upload em streaming.
+    """
     url = f"{DIGISAC_BASE_API}/messages"
+    file_info = payload.get("file") or {}
+    http = get_http_client("digisac")
     try:
-        response = requests.post(
-            url, headers=get_auth_headers_digisac(), json=payload, timeout=60
-        )
+        if "path" in file_info:
+            message = {**payload, "file": {**file_info}}
+            path = message["file"].pop("path")
+            message["file"].pop("sha256", None)
+            response = post_file_message(
+                http, url, get_auth_headers_digisac(), message, path
+            )
+        else:
+            response = http.post(
+                url, headers=get_auth_headers_digisac(), json=payload, timeout=60
+            )
         response.raise_for_status()
         return _parse_response(response)
     except requests.RequestException as e:
@@ -724,14 +783,41 @@ def send_pdf_digisac(payload: dict) -> dict:
         return {"error": str(e)}
 
 
-@debug
-@retry_with_backoff(retries=3, backoff_in_seconds=2)
+def dispatch_digisac(kind: str, payload: dict) -> dict:
+    """
+    Enfileira a operação no dispatcher e retorna na hora. As operações de um
+    mesmo contato são enviadas na ordem em que foram enfileiradas.
+    """
+    return get_digisac_dispatcher().submit(kind, payload)
+
+
+def _dispatch_step(kind: str, payload: dict) -> None:
+    """
+    Enfileira um passo de continuação; uma rejeição (contato sem contactId)
+    levanta, para que o passo não seja registrado e a continuação tente de novo
+    """
+    result = dispatch_digisac(kind, payload)
+    if isinstance(result, dict) and result.get("error"):
+        raise RuntimeError(result["error"])
+
+
 def close_ticket_digisac(contact_number: str) -> dict:
-    """Encerra o ticket do contato no Digisac"""
+    """Enfileira o encerramento do ticket do contato (após os envios pendentes)"""
     contact_id = _get_contact_id_by_number(contact_number)
+    if not contact_id:
+        logger.warning(f"[CLOSE] Contato não encontrado: {contact_number}")
+        return {"error": f"Contato não encontrado: {contact_number}"}
+    return dispatch_digisac(KIND_CLOSE, {"contactId": contact_id})
+
+
+@debug
+def close_ticket_by_contact_id(contact_id: str) -> dict:
+    """Encerra o ticket do contato no Digisac"""
     url = f"{DIGISAC_BASE_API}/contacts/{contact_id}/ticket/close"
     try:
-        response = requests.post(url, headers=get_auth_headers_digisac(), timeout=60)
+        response = get_http_client("digisac").post(
+            url, headers=get_auth_headers_digisac(), timeout=60
+        )
         response.raise_for_status()
         return _parse_response(response)
     except requests.RequestException as e:
@@ -851,4 +937,4 @@ def send_processing_notification(contact_number: str):
         text=text,
         user_id=DIGISAC_USER_ID,
     )
-    return send_message_digisac(payload)
+    return dispatch_digisac(KIND_MESSAGE, payload)
@@ -0,0 +1,315 @@
+# app/services/digisac/dispatcher.py
+"""
+Outbound queue for Digisac operations (messages, PDFs, transfers, closes).
+
+Webhook handlers enqueue and return immediately; a small thread pool does
+the HTTP calls. Operations for the same contact run strictly in the order
+they were submitted (a transfer, then the message, then the close), while
+different contacts are served concurrently, up to
+DIGISAC_DISPATCH_CONCURRENCY at a time. Every call takes a token from the
+shared "digisac_outbound" bucket, so a campaign burst is spread over time
+instead of hitting the API at once.
+
+A failed operation (exception or `{"error": ...}` response) stays at the
+head of its contact's queue and is retried with exponential backoff; after
+DIGISAC_DISPATCH_MAX_ATTEMPTS it is moved to the dead-letter table and the
+contact's queue moves on. This is the only retry layer: the send functions
+themselves make a single request.
+
+Every operation is written to the digisac_outbound table before it is
+queued and deleted once it is sent (or dead-lettered), so a restart does not
+lose it: `recover()` re-queues the leftovers when the server starts. On
+shutdown the lifecycle manager waits up to DIGISAC_DISPATCH_DRAIN_SECONDS
+for the queues to empty; whatever is left goes out on the next start.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.database.outbound_queue import (
+    add_outbound,
+    dead_letter_outbound,
+    delete_outbound,
+    list_outbound,
+    update_outbound_attempt,
+)
+from app.services.sync.rate_limit import TokenBucket, get_provider_bucket
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_MODE = os.getenv("DIGISAC_DISPATCH_MODE", "queue")  # queue | inline
+DISPATCH_CONCURRENCY = int(os.getenv("DIGISAC_DISPATCH_CONCURRENCY", "4"))
+DISPATCH_MAX_ATTEMPTS = int(os.getenv("DIGISAC_DISPATCH_MAX_ATTEMPTS", "5"))
+DISPATCH_BACKOFF_SECONDS = float(os.getenv("DIGISAC_DISPATCH_BACKOFF_SECONDS", "5"))
+DISPATCH_BACKOFF_MAX_SECONDS = float(
+    os.getenv("DIGISAC_DISPATCH_BACKOFF_MAX_SECONDS", "300")
+)
+
+# Quanto o shutdown espera os envios pendentes saírem
+DISPATCH_DRAIN_SECONDS = float(os.getenv("DIGISAC_DISPATCH_DRAIN_SECONDS", "15"))
+
+KIND_MESSAGE = "message"
+KIND_PDF = "pdf"
+KIND_TRANSFER = "transfer"
+KIND_CLOSE = "close"
+
+Sender = Callable[[Dict[str, Any]], Any]
+
+
+def _default_senders() -> Dict[str, Sender]:
+    # Import tardio: digisac_services depende do Flask e da configuração
+    from app.services.digisac.digisac_services import (
+        close_ticket_by_contact_id,
+        send_message_digisac,
+        send_pdf_digisac,
+        transfer_ticket_digisac,
+    )
+
+    return {
+        KIND_MESSAGE: send_message_digisac,
+        KIND_PDF: send_pdf_digisac,
+        KIND_TRANSFER: lambda payload: transfer_ticket_digisac(
+            payload, payload["contactId"]
+        ),
+        KIND_CLOSE: lambda payload: close_ticket_by_contact_id(payload["contactId"]),
+    }
+
+
+class DigisacDispatcher:
+    """Per-contact FIFO queues drained by a bounded, rate-limited pool"""
+
+    def __init__(
+        self,
+        senders: Optional[Dict[str, Sender]] = None,
+        bucket: Optional[TokenBucket] = None,
+        concurrency: int = DISPATCH_CONCURRENCY,
+        max_attempts: int = DISPATCH_MAX_ATTEMPTS,
+        backoff_seconds: float = DISPATCH_BACKOFF_SECONDS,
+        backoff_max_seconds: float = DISPATCH_BACKOFF_MAX_SECONDS,
+        mode: str = DISPATCH_MODE,
+    ):
+        self._senders = senders
+        self.bucket = bucket or get_provider_bucket("digisac_outbound")
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.mode = mode
+        # contact_id -> operações pendentes; a chave existe enquanto o contato
+        # tem exatamente um "drain" agendado (no pool ou num timer de retry)
+        self._queues: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, concurrency), thread_name_prefix="digisac-dispatch"
+        )
+        self._stats = {
+            "submitted": 0,
+            "sent": 0,
+            "retries": 0,
+            "dead_lettered": 0,
+            "recovered": 0,
+        }
+        self._recovered = False
+
+    @property
+    def senders(self) -> Dict[str, Sender]:
+        if self._senders is None:
+            self._senders = _default_senders()
+        return self._senders
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Persist and queue an operation; returns {"status": "queued",
+        "dispatch_id"}. In inline mode the operation runs now and its
+        response is returned. A payload without contactId is rejected with
+        an {"error": ...} response instead of being queued.
+        """
+        if kind not in self.senders:
+            raise ValueError(f"Unknown Digisac operation: {kind}")
+
+        contact_id = payload.get("contactId")
+        if not contact_id:
+            logger.warning(f"⚠️ Digisac {kind} rejected: payload without contactId")
+            return {"error": f"Digisac {kind} sem contactId"}
+
+        if self.mode == "inline":
+            return self.senders[kind](payload)
+
+        # Gravado antes de entrar na fila: um restart não perde o envio
+        outbound_id = add_outbound(kind, contact_id, payload)
+        self._enqueue(
+            {
+                "id": outbound_id,
+                "kind": kind,
+                "payload": payload,
+                "contact_id": contact_id,
+                "attempts": 0,
+                "submitted_at": time.monotonic(),
+            }
+        )
+        self._count("submitted")
+
+        logger.debug(f"📤 Digisac {kind} queued for contact {contact_id}")
+        return {"status": "queued", "dispatch_id": outbound_id, "kind": kind}
+
+    def recover(self) -> int:
+        """
+        Re-queue the operations a previous run left in digisac_outbound, in
+        their original order. Called once, when the server starts.
+        """
+        if self.mode == "inline":
+            return 0
+        with self._lock:
+            if self._recovered:
+                return 0
+            self._recovered = True
+
+        entries = list_outbound()
+        for entry in entries:
+            self._enqueue(
+                {
+                    "id": entry["id"],
+                    "kind": entry["kind"],
+                    "payload": entry["payload"],
+                    "contact_id": entry["contact_id"],
+                    "attempts": entry["attempts"],
+                    "submitted_at": time.monotonic(),
+                }
+            )
+        if entries:
+            with self._lock:
+                self._stats["recovered"] += len(entries)
+            logger.info(f"📤 Recovered {len(entries)} pending Digisac operations")
+        return len(entries)
+
+    def _enqueue(self, operation: Dict[str, Any]) -> None:
+        contact_id = operation["contact_id"]
+        with self._lock:
+            queue = self._queues.get(contact_id)
+            start = queue is None
+            if start:
+                queue = self._queues[contact_id] = deque()
+            queue.append(operation)
+        if start:
+            self._executor.submit(self._drain, contact_id)
+
+    def _drain(self, contact_id: str) -> None:
+        """Run the head operation of a contact; reschedule or move on"""
+        with self._lock:
+            operation = self._queues[contact_id][0]
+
+        retry_in = None
+        try:
+            retry_in = self._attempt(operation)
+        except Exception as e:
+            # Nunca deixa a fila do contato parada por um erro inesperado
+            logger.exception(f"Digisac dispatcher error on {operation['kind']}: {e}")
+
+        if retry_in is not None:
+            timer = threading.Timer(
+                retry_in, self._executor.submit, args=(self._drain, contact_id)
+            )
+            timer.daemon = True
+            timer.start()
+            return
+
+        with self._lock:
+            queue = self._queues[contact_id]
+            queue.popleft()
+            if not queue:
+                del self._queues[contact_id]
+                if not self._queues:
+                    self._idle.notify_all()
+                return
+        self._executor.submit(self._drain, contact_id)
+
+    def _attempt(self, operation: Dict[str, Any]) -> Optional[float]:
+        """Send once; returns the retry delay, or None when the op is done"""
+        self.bucket.acquire()
+        operation["attempts"] += 1
+        kind = operation["kind"]
+        try:
+            response = self.senders[kind](operation["payload"])
+            error = response.get("error") if isinstance(response, dict) else None
+        except Exception as e:
+            error = str(e)
+
+        if not error:
+            delete_outbound(operation["id"])
+            self._count("sent")
+            return None
+
+        attempts = operation["attempts"]
+        if attempts < self.max_attempts:
+            delay = min(
+                self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempts - 1)
+            )
+            delay *= random.uniform(0.8, 1.2)
+            update_outbound_attempt(operation["id"], attempts, str(error))
+            self._count("retries")
+            logger.warning(
+                f"⚠️ Digisac {kind} for contact {operation['contact_id']} failed "
+                f"(attempt {attempts}/{self.max_attempts}): {error}. "
+                f"Retrying in {delay:.0f}s"
+            )
+            return delay
+
+        contact_id = operation["payload"].get("contactId")
+        dead_letter_id = dead_letter_outbound(
+            operation["id"],
+            kind,
+            contact_id,
+            operation["payload"],
+            str(error),
+            attempts,
+        )
+        self._count("dead_lettered")
+        logger.error(
+            f"❌ Digisac {kind} for contact {contact_id} gave up after "
+            f"{attempts} attempts (dead letter #{dead_letter_id}): {error}"
+        )
+        return None
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued operation finished (True) or timeout"""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._queues, timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["pending"] = sum(len(q) for q in self._queues.values())
+            stats["active_contacts"] = len(self._queues)
+            oldest = min(
+                (q[0]["submitted_at"] for q in self._queues.values()), default=None
+            )
+        stats["oldest_pending_seconds"] = (
+            None if oldest is None else round(now - oldest, 1)
+        )
+        stats["mode"] = self.mode
+        return stats
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+_dispatcher: Optional[DigisacDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_digisac_dispatcher() -> DigisacDispatcher:
+    """Process-wide dispatcher (one pool, one outbound bucket)"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = DigisacDispatcher()
+    return _dispatcher
@@ -0,0 +1,202 @@
+# app/services/digisac/file_upload.py
+"""
+Attachment upload for Digisac `/messages`.
+
+By default files go as the classic JSON body with the file in base64.
+Multipart upload is opt-in until it has been verified against the real API:
+the file is then sent as a streaming multipart/form-data body read straight
+from a file handle (constant memory, no base64 inflation). In "auto" mode,
+if Digisac rejects the multipart request (DIGISAC_UPLOAD_FALLBACK_STATUSES),
+the same message is re-sent as base64 JSON; when that fallback succeeds,
+multipart is switched off for the rest of the process, so the probe costs a
+single extra request (a payload error that fails both ways does not
+disable it).
+
+DIGISAC_UPLOAD_MODE: "base64" (JSON only, default), "auto" (multipart with
+fallback) or "multipart" (never fall back).
+"""
+
+import io
+import os
+import base64
+import uuid
+import logging
+import threading
+from typing import Any, BinaryIO, Dict, List, Union
+
+from requests import Response
+
+from app.services.http_client import HTTPClient
+from app.services.pdf_relay import encode_file_base64
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MODE = os.getenv("DIGISAC_UPLOAD_MODE", "base64")
+UPLOAD_FALLBACK_STATUSES = {
+    int(status)
+    for status in os.getenv(
+        "DIGISAC_UPLOAD_FALLBACK_STATUSES", "400,404,415,422"
+    ).split(",")
+    if status.strip()
+}
+UPLOAD_TIMEOUT = int(os.getenv("DIGISAC_UPLOAD_TIMEOUT", "120"))
+
+MULTIPART_FILE_FIELD = "file"
+
+# Conteúdo do anexo: caminho de um arquivo em disco ou os bytes em memória
+FileSource = Union[str, bytes]
+
+_multipart_rejected = threading.Event()
+
+
+class MultipartFileBody:
+    """
+    multipart/form-data body that streams the file part from a handle.
+    `requests` sends it with a Content-Length (from __len__) and reads it
+    in blocks, so only one block is in memory at a time.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        file_field: str,
+        filename: str,
+        fileobj: BinaryIO,
+        size: int,
+        mimetype: str = "application/octet-stream",
+    ):
+        self.boundary = uuid.uuid4().hex
+        head = b"".join(
+            self._part_header(f'name="{self._quote(name)}"')
+            + value.encode("utf-8")
+            + b"\r\n"
+            for name, value in fields.items()
+        )
+        head += self._part_header(
+            f'name="{self._quote(file_field)}"; filename="{self._quote(filename)}"',
+            mimetype,
+        )
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._parts: List[BinaryIO] = [io.BytesIO(head), fileobj, io.BytesIO(tail)]
+        self._length = len(head) + size + len(tail)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    def _part_header(self, disposition: str, mimetype: str = None) -> bytes:
+        header = (
+            f"--{self.boundary}\r\n"
+            f"Content-Disposition: form-data; {disposition}\r\n"
+        )
+        if mimetype:
+            header += f"Content-Type: {mimetype}\r\n"
+        return (header + "\r\n").encode("utf-8")
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r\n", " ")
+
+
+def _form_fields(payload: Dict[str, Any]) -> Dict[str, str]:
+    """Message fields (all but the file) as form values"""
+    fields = {}
+    for name, value in payload.items():
+        if name == "file" or value is None:
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        fields[name] = str(value)
+    return fields
+
+
+def _open(source: FileSource) -> BinaryIO:
+    return open(source, "rb") if isinstance(source, str) else io.BytesIO(source)
+
+
+def _size(source: FileSource) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+
+def multipart_enabled() -> bool:
+    # Multipart só com opt-in explícito; qualquer outro valor é base64
+    if UPLOAD_MODE == "multipart":
+        return True
+    return UPLOAD_MODE == "auto" and not _multipart_rejected.is_set()
+
+
+def post_file_message(
+    http: HTTPClient,
+    url: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    source: FileSource,
+    timeout: float = UPLOAD_TIMEOUT,
+) -> Response:
+    """
+    POST a message with an attachment. `payload` is the usual JSON message
+    body; its "file" entry only supplies name and mimetype, the content
+    comes from `source`. The caller checks the returned response.
+    """
+    file_info = payload.get("file") or {}
+    filename = file_info.get("name", "arquivo")
+    mimetype = file_info.get("mimetype", "application/octet-stream")
+
+    if multipart_enabled():
+        with _open(source) as fileobj:
+            body = MultipartFileBody(
+                _form_fields(payload),
+                MULTIPART_FILE_FIELD,
+                filename,
+                fileobj,
+                _size(source),
+                mimetype,
+            )
+            response = http.post(
+                url,
+                headers={**headers, "Content-Type": body.content_type},
+                data=body,
+                timeout=timeout,
+            )
+        if (
+            UPLOAD_MODE == "multipart"
+            or response.status_code not in UPLOAD_FALLBACK_STATUSES
+        ):
+            return response
+        multipart_status = response.status_code
+    else:
+        multipart_status = None
+
+    if isinstance(source, str):
+        file_base64 = encode_file_base64(source)
+    else:
+        file_base64 = base64.b64encode(source).decode("utf-8")
+    json_payload = {
+        **payload,
+        "file": {"base64": file_base64, "mimetype": mimetype, "name": filename},
+    }
+    response = http.post(url, headers=headers, json=json_payload, timeout=timeout)
+
+    if multipart_status and response.ok:
+        # Só o multipart falhou: a API não aceita esse formato
+        _multipart_rejected.set()
+        logger.warning(
+            f"⚠️ Digisac rejected multipart upload (HTTP {multipart_status}); "
+            "using base64 JSON from now on"
+        )
+    return response
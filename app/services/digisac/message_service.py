@@ -3,13 +3,15 @@
 Digisac message service following Single Responsibility and Interface Segregation Principles.
 """
 
-import base64
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Union
 import requests
 
 from app.core.interfaces import IMessageService, ITokenManager
 from app.core.config_provider import ServiceConfiguration
+from app.services.http_client import get_http_client
+from app.services.digisac.file_upload import post_file_message
+from app.services.pdf_relay import CachedPDF
 from app.utils.utils import retry_with_backoff
 
 
@@ -22,6 +24,7 @@ class DigisacMessageService(IMessageService):
     def __init__(self, token_manager: ITokenManager):
         self.token_manager = token_manager
         self.base_url = ServiceConfiguration.DIGISAC_BASE_URL
+        self.http = get_http_client("digisac")
 
     @retry_with_backoff(retries=3, backoff_in_seconds=2)
     def send_text_message(
@@ -49,28 +52,38 @@ class DigisacMessageService(IMessageService):
     def send_file_message(
         self,
         contact_id: str,
-        file_content: bytes,
+        file_content: Union[bytes, CachedPDF],
         filename: str,
         message: str,
         user_id: str = None,
     ) -> Dict[str, Any]:
-        """Send file message to contact"""
-        file_base64 = base64.b64encode(file_content).decode("utf-8")
-
+        """
+        Send file message to contact (raw bytes or a PDF from the relay
+        cache), as base64 JSON or, when DIGISAC_UPLOAD_MODE opts in, as a
+        streaming multipart upload
+        """
         payload = {
             "text": message,
             "contactId": contact_id,
-            "file": {
-                "base64": file_base64,
-                "mimetype": "application/pdf",
-                "name": filename,
-            },
+            "file": {"mimetype": "application/pdf", "name": filename},
         }
 
         if user_id:
             payload["userId"] = user_id
 
-        return self._send_message(payload)
+        source = (
+            file_content.path if isinstance(file_content, CachedPDF) else file_content
+        )
+        url = f"{self.base_url}/messages"
+        headers = self.token_manager.get_auth_headers()
+
+        try:
+            response = post_file_message(self.http, url, headers, payload, source)
+            response.raise_for_status()
+            return self._parse_response(response)
+        except requests.RequestException as e:
+            logger.error("Failed to send file message: %s", e)
+            return {"error": str(e)}
 
     def _send_message(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Internal method to send message"""
@@ -78,7 +91,7 @@ class DigisacMessageService(IMessageService):
         headers = self.token_manager.get_auth_headers()
 
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
+            response = self.http.post(url, headers=headers, json=payload, timeout=60)
             response.raise_for_status()
             return self._parse_response(response)
         except requests.RequestException as e:
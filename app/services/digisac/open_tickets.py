@@ -0,0 +1,212 @@
+# app/services/digisac/open_tickets.py
+"""
+In-memory snapshot of every open Digisac ticket, keyed by contact id.
+
+The OpenTicketPollerWorker refreshes it with a few paginated `/tickets`
+queries (isOpen = true), so the `queue_if_open_ticket_route` decorator, the
+ticket-flow worker and DigisacTicketService can answer "does this contact
+have an open ticket, and in which department?" without one request per
+webhook. While the snapshot is older than OPEN_TICKETS_MAX_AGE_SECONDS
+(poller stopped or failing) callers fall back to the per-contact query.
+
+Ticket events from the Digisac webhook are applied immediately with
+`apply_event` and survive a poll that was already in flight; closing a
+ticket sets `ticket_flow_wakeup` so queued flows run without waiting for
+the next worker tick. The webhook must carry DIGISAC_TICKET_EVENT_TOKEN
+(`X-Webhook-Token` header or `token` query parameter); without it a forged
+close or open event could release or block queued renewal flows.
+"""
+
+import os
+import hmac
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.services.http_client import HTTPClient, get_http_client
+
+logger = logging.getLogger(__name__)
+
+OPEN_TICKETS_REFRESH_SECONDS = int(os.getenv("OPEN_TICKETS_REFRESH_SECONDS", "30"))
+OPEN_TICKETS_MAX_AGE_SECONDS = int(os.getenv("OPEN_TICKETS_MAX_AGE_SECONDS", "120"))
+OPEN_TICKETS_PAGE_SIZE = int(os.getenv("OPEN_TICKETS_PAGE_SIZE", "100"))
+# Trava contra paginação infinita se a API ignorar `page`
+OPEN_TICKETS_MAX_PAGES = 200
+
+TICKET_ATTRIBUTES = ["id", "contactId", "departmentId", "userId", "isOpen"]
+
+# Segredo compartilhado com o webhook de eventos de ticket do Digisac
+TICKET_EVENT_TOKEN = os.getenv("DIGISAC_TICKET_EVENT_TOKEN", "")
+
+# Acordado quando um ticket fecha: o TicketFlowWorker processa a fila na hora
+ticket_flow_wakeup = threading.Event()
+
+
+def verify_ticket_event_token(token: Optional[str]) -> bool:
+    """True when `token` matches DIGISAC_TICKET_EVENT_TOKEN (never if unset)"""
+    if not TICKET_EVENT_TOKEN:
+        logger.error("DIGISAC_TICKET_EVENT_TOKEN não configurado")
+        return False
+    return hmac.compare_digest(TICKET_EVENT_TOKEN.encode(), (token or "").encode())
+
+
+def _default_headers() -> Dict[str, str]:
+    # Import tardio: digisac_services depende do Flask e da configuração
+    from app.services.digisac.digisac_services import get_auth_headers_digisac
+
+    return get_auth_headers_digisac()
+
+
+class OpenTicketSnapshot:
+    """Contact id -> open ticket map, replaced wholesale on every refresh"""
+
+    def __init__(
+        self,
+        http: Optional[HTTPClient] = None,
+        headers_func: Callable[[], Dict[str, str]] = _default_headers,
+        page_size: int = OPEN_TICKETS_PAGE_SIZE,
+        max_age: float = OPEN_TICKETS_MAX_AGE_SECONDS,
+    ):
+        self.http = http or get_http_client("digisac")
+        self.headers_func = headers_func
+        self.page_size = page_size
+        self.max_age = max_age
+        self._tickets: Dict[str, Dict[str, Any]] = {}
+        self._refreshed_at: Optional[float] = None
+        # contact_id -> (instante do evento, ticket ou None se fechado)
+        self._events: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "last_refresh_seconds": None,
+            "last_pages": 0,
+            "hits": 0,
+            "fallbacks": 0,
+            "events_applied": 0,
+        }
+
+    def refresh(self) -> int:
+        """Pull all open tickets and swap the map in; returns the count"""
+        started = time.monotonic()
+        tickets: Dict[str, Dict[str, Any]] = {}
+        pages = 0
+        try:
+            for page in range(1, OPEN_TICKETS_MAX_PAGES + 1):
+                items, last_page = self._fetch_page(page)
+                pages += 1
+                for ticket in items:
+                    contact_id = ticket.get("contactId")
+                    if contact_id and ticket.get("isOpen", True):
+                        tickets[contact_id] = {
+                            "id": ticket.get("id"),
+                            "departmentId": ticket.get("departmentId"),
+                            "userId": ticket.get("userId"),
+                        }
+                if len(items) < self.page_size or (last_page and page >= last_page):
+                    break
+        except Exception:
+            with self._lock:
+                self._stats["refresh_failures"] += 1
+            raise
+
+        with self._lock:
+            # Eventos recebidos durante a consulta são mais novos que ela
+            self._events = {
+                contact_id: event
+                for contact_id, event in self._events.items()
+                if event[0] > started
+            }
+            for contact_id, (_, ticket) in self._events.items():
+                self._apply(tickets, contact_id, ticket)
+            self._tickets = tickets
+            self._refreshed_at = time.monotonic()
+            self._stats["refreshes"] += 1
+            self._stats["last_pages"] = pages
+            self._stats["last_refresh_seconds"] = round(time.monotonic() - started, 3)
+        logger.debug(f"Open tickets snapshot: {len(tickets)} tickets in {pages} pages")
+        return len(tickets)
+
+    def _fetch_page(self, page: int) -> Tuple[list, Optional[int]]:
+        query = {
+            "where": {"isOpen": True},
+            "attributes": TICKET_ATTRIBUTES,
+            "order": [["createdAt", "ASC"]],
+            "perPage": self.page_size,
+            "page": page,
+        }
+        response = self.http.get(
+            "tickets",
+            params={"query": json.dumps(query)},
+            headers=self.headers_func(),
+        )
+        response.raise_for_status()
+        body = response.json()
+        return body.get("data", []) or [], body.get("lastPage")
+
+    def apply_event(self, contact_id: str, ticket: Optional[Dict[str, Any]]) -> None:
+        """Record a webhook ticket event (ticket None means it was closed)"""
+        with self._lock:
+            self._events[contact_id] = (time.monotonic(), ticket)
+            self._apply(self._tickets, contact_id, ticket)
+            self._stats["events_applied"] += 1
+
+    @staticmethod
+    def _apply(
+        tickets: Dict[str, Dict[str, Any]],
+        contact_id: str,
+        ticket: Optional[Dict[str, Any]],
+    ) -> None:
+        if ticket:
+            tickets[contact_id] = ticket
+        else:
+            tickets.pop(contact_id, None)
+
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the last successful refresh (None if never)"""
+        with self._lock:
+            refreshed_at = self._refreshed_at
+        return None if refreshed_at is None else time.monotonic() - refreshed_at
+
+    def is_fresh(self) -> bool:
+        age = self.age_seconds()
+        return age is not None and age <= self.max_age
+
+    def lookup(self, contact_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        (known, ticket): known is False when the snapshot is too old to
+        answer and the caller must query Digisac itself.
+        """
+        if not self.is_fresh():
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return False, None
+        with self._lock:
+            self._stats["hits"] += 1
+            ticket = self._tickets.get(contact_id)
+        return True, dict(ticket) if ticket else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        age = self.age_seconds()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open_tickets"] = len(self._tickets)
+        stats["age_seconds"] = None if age is None else round(age, 1)
+        stats["fresh"] = age is not None and age <= self.max_age
+        return stats
+
+
+_snapshot: Optional[OpenTicketSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_open_ticket_snapshot() -> OpenTicketSnapshot:
+    """Process-wide snapshot shared by the poller and the lookups"""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = OpenTicketSnapshot()
+    return _snapshot
@@ -11,6 +11,8 @@ import requests
 
 from app.core.interfaces import ITicketService, ITokenManager
 from app.core.config_provider import ServiceConfiguration
+from app.services.http_client import get_http_client
+from app.services.digisac.open_tickets import get_open_ticket_snapshot
 from app.utils.utils import retry_with_backoff
 
 
@@ -23,6 +25,7 @@ class DigisacTicketService(ITicketService):
     def __init__(self, token_manager: ITokenManager):
         self.token_manager = token_manager
         self.base_url = ServiceConfiguration.DIGISAC_BASE_URL
+        self.http = get_http_client("digisac")
 
     @retry_with_backoff(retries=3, backoff_in_seconds=2)
     def transfer_ticket(
@@ -42,7 +45,7 @@ class DigisacTicketService(ITicketService):
         headers = self.token_manager.get_auth_headers()
 
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
+            response = self.http.post(url, headers=headers, json=payload, timeout=60)
             response.raise_for_status()
             return self._parse_response(response)
         except requests.RequestException as e:
@@ -56,7 +59,7 @@ class DigisacTicketService(ITicketService):
         headers = self.token_manager.get_auth_headers()
 
         try:
-            response = requests.post(url, headers=headers, timeout=60)
+            response = self.http.post(url, headers=headers, timeout=60)
             response.raise_for_status()
             return self._parse_response(response)
         except requests.RequestException as e:
@@ -79,7 +82,11 @@ class DigisacTicketService(ITicketService):
         return True
 
     def _fetch_open_ticket(self, contact_id: str) -> Optional[Dict[str, Any]]:
-        """Fetch open ticket for contact"""
+        """Fetch open ticket for contact (from the open-ticket snapshot if fresh)"""
+        known, ticket = get_open_ticket_snapshot().lookup(contact_id)
+        if known:
+            return ticket
+
         query = {
             "where": {"isOpen": True},
             "include": [
@@ -96,7 +103,7 @@ class DigisacTicketService(ITicketService):
         headers = self.token_manager.get_auth_headers()
 
         try:
-            response = requests.get(url, headers=headers)
+            response = self.http.get(url, headers=headers)
             response.raise_for_status()
             data = response.json()
             items = data.get("data", []) or []
@@ -3,12 +3,14 @@
 External CNPJ API client following Dependency Inversion Principle.
 """
 
-import re
 import logging
 from typing import Dict, Any, Optional
 import requests
 
+from app.core.config_provider import ServiceConfiguration
 from app.core.interfaces import IExternalAPIClient
+from app.services.http_client import get_http_client
+from app.services.external.cnpj_lookup import get_cnpj_lookup_service
 
 
 logger = logging.getLogger(__name__)
@@ -17,20 +19,18 @@ logger = logging.getLogger(__name__)
 class CNPJAPIClient(IExternalAPIClient):
     """CNPJ API client following DIP"""
 
-    def __init__(self, base_url: str = "https://publica.cnpj.ws"):
+    def __init__(self, base_url: str = ServiceConfiguration.CNPJ_API_BASE_URL):
         self.base_url = base_url
+        self.http = get_http_client("cnpj")
 
     def get_cnpj_data(self, cnpj: str) -> Optional[Dict[str, Any]]:
-        """Get CNPJ data from public API"""
-        cnpj_clean = re.sub(r"[\.\/-]", "", str(cnpj))
-        url = f"{self.base_url}/cnpj/{cnpj_clean}"
-
-        return self.make_request("GET", url)
+        """Get CNPJ data from public API (through the persistent cache)"""
+        return get_cnpj_lookup_service().get_data(cnpj)
 
     def make_request(self, method: str, url: str, **kwargs) -> Optional[Dict[str, Any]]:
         """Make HTTP request to external API"""
         try:
-            response = requests.request(method, url, timeout=60, **kwargs)
+            response = self.http.request(method, url, timeout=60, **kwargs)
             response.raise_for_status()
             data = response.json()
 
@@ -0,0 +1,190 @@
+# app/services/external/cnpj_lookup.py
+"""
+Cached, rate-limited CNPJ lookups against the public cnpj.ws API.
+
+Responses are kept in a persistent SQLite cache (CNPJCache). A lookup is
+answered from the cache while the entry is younger than CNPJ_CACHE_TTL; up
+to CNPJ_CACHE_STALE_TTL it is still answered from the cache, but the entry
+is revalidated in the background. Only misses (or entries older than that)
+wait on the API, through the provider token bucket that matches the public
+quota. Every result says where it came from and how old the data is.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set
+
+import requests
+
+from app.database.cnpj_cache import CNPJCache
+from app.services.http_client import get_http_client
+from app.services.sync.rate_limit import (
+    TokenBucket,
+    get_provider_bucket,
+    retry_after_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+CNPJ_CACHE_TTL = int(os.getenv("CNPJ_CACHE_TTL", str(7 * 24 * 3600)))
+# Depois do TTL e até aqui: serve do cache e revalida em segundo plano
+CNPJ_CACHE_STALE_TTL = int(os.getenv("CNPJ_CACHE_STALE_TTL", str(90 * 24 * 3600)))
+# Quanto uma consulta sem cache aceita esperar pela cota da API
+CNPJ_RATE_WAIT_SECONDS = float(os.getenv("CNPJ_RATE_WAIT_SECONDS", "30"))
+
+SOURCE_CACHE = "cache"
+SOURCE_STALE = "stale"
+SOURCE_API = "api"
+
+
+def normalize_cnpj(cnpj: str) -> str:
+    """Digits only, as used in the API path and the cache key"""
+    return re.sub(r"\D", "", str(cnpj))
+
+
+class CNPJLookupService:
+    """Read-through CNPJ cache with stale-while-revalidate and a rate limit"""
+
+    def __init__(
+        self,
+        cache: Optional[CNPJCache] = None,
+        bucket: Optional[TokenBucket] = None,
+        ttl: float = CNPJ_CACHE_TTL,
+        stale_ttl: float = CNPJ_CACHE_STALE_TTL,
+        rate_wait: float = CNPJ_RATE_WAIT_SECONDS,
+    ):
+        self.cache = cache or CNPJCache()
+        self.bucket = bucket or get_provider_bucket("cnpj")
+        self.http = get_http_client("cnpj")
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.rate_wait = rate_wait
+        self._revalidating: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="cnpj-revalidate"
+        )
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "api_calls": 0,
+            "api_errors": 0,
+            "rate_limited": 0,
+            "revalidations": 0,
+        }
+
+    def lookup(self, cnpj: str) -> Optional[Dict[str, Any]]:
+        """
+        Return {"data", "source", "age_seconds"} for the CNPJ, or None when
+        it is neither cached nor obtainable from the API right now.
+        source is "cache" (fresh), "stale" (served while revalidating or
+        because the API was unavailable) or "api".
+        """
+        key = normalize_cnpj(cnpj)
+        cached = self.cache.get(key)
+
+        if cached:
+            data, age = cached
+            if age < self.ttl:
+                self._count("hits")
+                return self._result(data, SOURCE_CACHE, age)
+            if age < self.stale_ttl:
+                self._count("stale_hits")
+                self._revalidate_async(key)
+                return self._result(data, SOURCE_STALE, age)
+
+        self._count("misses")
+        data = self._fetch(key, wait=self.rate_wait)
+        if data is not None:
+            return self._result(data, SOURCE_API, 0.0)
+        if cached:
+            # API fora/sem cota: melhor o dado antigo do que travar o Bitrix
+            logger.warning(f"CNPJ {key}: serving expired cache entry")
+            return self._result(cached[0], SOURCE_STALE, cached[1])
+        return None
+
+    def get_data(self, cnpj: str) -> Optional[Dict[str, Any]]:
+        """Raw API payload only (compatible with the old uncached callers)"""
+        result = self.lookup(cnpj)
+        return result["data"] if result else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["revalidating"] = len(self._revalidating)
+        stats["entries"] = self.cache.count()
+        return stats
+
+    def _fetch(self, key: str, wait: Optional[float]) -> Optional[Dict[str, Any]]:
+        """Call the API under the token bucket and cache a valid payload"""
+        if not self.bucket.acquire(timeout=wait):
+            self._count("rate_limited")
+            logger.warning(f"CNPJ {key}: API quota exhausted, not waiting longer")
+            return None
+
+        self._count("api_calls")
+        try:
+            response = self.http.get(f"cnpj/{key}", timeout=60)
+            if response.status_code == 429:
+                # Cota estourada (outro processo/IP): pausa o bucket inteiro
+                self.bucket.pause(retry_after_seconds(response) or 60)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self._count("api_errors")
+            logger.error(f"CNPJ {key}: request failed: {e}")
+            return None
+
+        if "error" in data:
+            self._count("api_errors")
+            logger.error(f"CNPJ {key}: API error: {json.dumps(data['error'])}")
+            return None
+
+        self.cache.set(key, data)
+        logger.info(f"CNPJ {key}: data obtained from API")
+        return data
+
+    def _revalidate_async(self, key: str) -> None:
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        self._executor.submit(self._revalidate, key)
+
+    def _revalidate(self, key: str) -> None:
+        try:
+            # Segundo plano: pode esperar a cota o quanto for preciso
+            if self._fetch(key, wait=None) is not None:
+                self._count("revalidations")
+        except Exception as e:
+            logger.error(f"CNPJ {key}: background revalidation failed: {e}")
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _result(data: Dict[str, Any], source: str, age: float) -> Dict[str, Any]:
+        return {"data": data, "source": source, "age_seconds": round(age)}
+
+
+_lookup_service: Optional[CNPJLookupService] = None
+_lookup_lock = threading.Lock()
+
+
+def get_cnpj_lookup_service() -> CNPJLookupService:
+    """Shared lookup service (one cache, one bucket per process)"""
+    global _lookup_service
+    if _lookup_service is None:
+        with _lookup_lock:
+            if _lookup_service is None:
+                _lookup_service = CNPJLookupService()
+    return _lookup_service
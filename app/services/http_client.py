@@ -0,0 +1,224 @@
+# app/services/http_client.py
+"""
+Pooled keep-alive HTTP clients, one per provider.
+
+Every integration (Bitrix24, Digisac, Conta Azul, CNPJ API, file downloads)
+goes through a shared `requests.Session` with its own connection pool, so
+consecutive calls to the same host reuse the TCP/TLS connection instead of
+handshaking again. Pool sizes, default timeouts and base URLs are
+configurable per provider through the environment:
+
+- HTTP_POOL_CONNECTIONS_<PROVIDER>: hosts kept in the pool (default 4)
+- HTTP_POOL_MAXSIZE_<PROVIDER>: connections kept per host (default 10; a paginated
+  sync grows it to its concurrency when that is higher)
+- HTTP_TIMEOUT_<PROVIDER>: default timeout in seconds (default 60)
+- HTTP_BASE_URL_<PROVIDER>: overrides the provider base URL
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests import Response
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from app.core.config_provider import ServiceConfiguration
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_TIMEOUT = 60
+
+# Provider name -> base URL used to resolve relative paths
+PROVIDER_BASE_URLS = {
+    "bitrix24": ServiceConfiguration.BITRIX_BASE_URL,
+    "digisac": ServiceConfiguration.DIGISAC_BASE_URL,
+    "conta_azul": ServiceConfiguration.CONTA_AZUL_API_BASE_URL,
+    "conta_azul_auth": ServiceConfiguration.CONTA_AZUL_AUTH_BASE_URL,
+    "cnpj": ServiceConfiguration.CNPJ_API_BASE_URL,
+    # Absolute URLs only (PDF links, health probes)
+    "downloads": None,
+}
+
+
+def _env(provider: str, name: str, default: Any, cast: Callable = int) -> Any:
+    value = os.getenv(f"HTTP_{name}_{provider.upper()}")
+    return cast(value) if value else default
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report every new connection"""
+
+    def __init__(self, on_new_connection: Callable[[], None], **kwargs):
+        # Set before super().__init__, which already builds the pool manager
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_new_connection = self._on_new_connection
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                on_new_connection()
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                on_new_connection()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class HTTPClient:
+    """Keep-alive HTTP client for a single provider"""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: Optional[str] = None,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._connections = 0
+
+        self.session = requests.Session()
+        self._mount_adapter(pool_maxsize)
+
+    def _mount_adapter(self, pool_maxsize: int) -> None:
+        adapter = _CountingAdapter(
+            self._count_connection,
+            pool_connections=self.pool_connections,
+            pool_maxsize=pool_maxsize,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool_maxsize = pool_maxsize
+
+    def ensure_pool_maxsize(self, pool_maxsize: int) -> None:
+        """
+        Grow the per-host pool to at least `pool_maxsize` connections.
+        Requests already running keep the previous adapter until they finish.
+        """
+        with self._lock:
+            if pool_maxsize <= self.pool_maxsize:
+                return
+            previous = self.pool_maxsize
+            self._mount_adapter(pool_maxsize)
+        logger.info(
+            f"HTTP client '{self.name}' pool grown from {previous} to {pool_maxsize}"
+        )
+
+    def _count_connection(self) -> None:
+        with self._lock:
+            self._connections += 1
+
+    def build_url(self, url: str) -> str:
+        """Resolve a path against the base URL; absolute URLs pass through"""
+        if url.startswith(("http://", "https://")) or not self.base_url:
+            return url
+        return f"{self.base_url}/{url.lstrip('/')}"
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        """Send a request through the pooled session with the default timeout"""
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.request(method, self.build_url(url), **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def get(self, url: str, **kwargs) -> Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> Response:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests sent, connections opened and how many requests reused one"""
+        with self._lock:
+            requests_sent = self._requests
+            connections = self._connections
+            errors = self._errors
+        reused = max(0, requests_sent - connections)
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / requests_sent, 3) if requests_sent else 0.0,
+            "errors": errors,
+            "pool_maxsize": self.pool_maxsize,
+        }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_clients: Dict[str, HTTPClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(provider: str) -> HTTPClient:
+    """Return the shared client for a provider, creating it on first use"""
+    client = _clients.get(provider)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(provider)
+            if client is None:
+                client = HTTPClient(
+                    provider,
+                    base_url=_env(
+                        provider, "BASE_URL", PROVIDER_BASE_URLS.get(provider), str
+                    ),
+                    pool_connections=_env(
+                        provider, "POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS
+                    ),
+                    pool_maxsize=_env(provider, "POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE),
+                    timeout=_env(provider, "TIMEOUT", DEFAULT_TIMEOUT, float),
+                )
+                _clients[provider] = client
+                logger.debug(
+                    f"HTTP client '{provider}' created "
+                    f"(pool {client.pool_maxsize}, timeout {client.timeout}s)"
+                )
+    return client
+
+
+def get_http_stats() -> Dict[str, Dict[str, Any]]:
+    """Connection-reuse statistics of every client created so far"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.get_stats() for client in clients}
@@ -0,0 +1,132 @@
+# app/services/jobs.py
+"""
+Durable background jobs for webhook side effects.
+
+Webhooks validate the request, call `enqueue_job` and answer right away;
+the Conta Azul, Digisac and Bitrix calls run in the JobQueueWorker pool.
+Tasks are plain functions registered with `@job_task("name")` that receive
+the job payload. A task that raises is retried with exponential backoff
+(JOB_BACKOFF_SECONDS doubling up to JOB_BACKOFF_MAX_SECONDS, with jitter)
+until JOB_MAX_ATTEMPTS; `PermanentJobError` fails the job at once.
+
+Jobs live in SQLite (app/database/job_queue.py), so they survive restarts:
+a job whose process died mid-run is picked up again once its lease expires.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app.database.job_queue import JobStore
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "10"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "900"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 86400)))
+
+# Prioridades usuais (maior sai primeiro)
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+
+# Acordado a cada job novo
+job_wakeup = threading.Event()
+
+_tasks: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a task when retrying cannot succeed"""
+
+
+def job_task(name: str):
+    """Register the decorated function as the handler of task `name`"""
+
+    def decorator(func: Callable[[Dict[str, Any]], Any]):
+        _tasks[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue_job(
+    task: str,
+    payload: Dict[str, Any],
+    priority: int = PRIORITY_NORMAL,
+    delay: float = 0,
+    idempotency_key: Optional[str] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+) -> int:
+    """Persist a job and wake the worker; returns the job id"""
+    job_id, created = get_job_store().enqueue(
+        task, payload, max_attempts, priority, delay, idempotency_key
+    )
+    if created:
+        logger.info(f"📥 Job #{job_id} ({task}) queued")
+        job_wakeup.set()
+    else:
+        logger.info(f"Job #{job_id} ({task}) already queued for {idempotency_key}")
+    return job_id
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt, after `attempts` failed ones"""
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def execute_job(store: JobStore, job: Dict[str, Any], worker_id: str) -> bool:
+    """Run a claimed job and record the outcome; True when it succeeded"""
+    job_id = job["id"]
+    task = job["task"]
+    handler = _tasks.get(task)
+    if handler is None:
+        store.fail(job_id, worker_id, f"Unknown task {task}")
+        logger.error(f"❌ Job #{job_id}: unknown task {task}")
+        return False
+
+    try:
+        handler(job["payload"])
+    except PermanentJobError as e:
+        store.fail(job_id, worker_id, str(e))
+        logger.error(f"❌ Job #{job_id} ({task}) failed: {e}")
+        return False
+    except Exception as e:
+        if job["attempts"] >= job["max_attempts"]:
+            store.fail(job_id, worker_id, str(e))
+            logger.error(
+                f"❌ Job #{job_id} ({task}) failed after {job['attempts']} attempts: {e}"
+            )
+            return False
+        delay = retry_delay(job["attempts"])
+        store.retry(job_id, worker_id, str(e), time.time() + delay)
+        logger.warning(
+            f"⚠️ Job #{job_id} ({task}) attempt {job['attempts']} failed, "
+            f"retrying in {delay:.0f}s: {e}"
+        )
+        return False
+
+    if not store.complete(job_id, worker_id):
+        # O lease venceu durante a execução e outro consumidor pegou o job
+        logger.warning(f"Job #{job_id} ({task}) finished after losing its lease")
+    return True
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Process-wide job store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore()
+    return _store
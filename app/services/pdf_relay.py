@@ -0,0 +1,246 @@
+# app/services/pdf_relay.py
+"""
+Streaming PDF relay with a content-addressed disk cache.
+
+PDFs sent through Digisac (proposals, boletos) are downloaded in chunks
+straight to a temporary file while their SHA-256 is computed, then stored
+as `<sha256>.pdf` in PDF_CACHE_DIR. A small reference file per source URL
+points to the blob, so a retry or a re-send of the same document is served
+from disk for PDF_CACHE_URL_TTL seconds without downloading it again, and
+identical documents behind different URLs share one blob.
+
+The cache is bounded by PDF_CACHE_MAX_MB; least recently used blobs are
+evicted first. Blobs still referenced by queued or dead-lettered Digisac
+sends are pinned and never evicted, since those payloads carry only the
+blob's path. Base64 for the Digisac payload is produced from the file in
+chunks, so the raw bytes are never held in memory alongside the encoding.
+"""
+
+import os
+import time
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set
+
+from app.database.database import DB_DIR
+from app.database.outbound_queue import pinned_pdf_blobs
+from app.services.http_client import HTTPClient, get_http_client
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(DB_DIR, "pdf_cache"))
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "200"))
+PDF_CACHE_URL_TTL = int(os.getenv("PDF_CACHE_URL_TTL", str(24 * 3600)))
+
+CHUNK_SIZE = 64 * 1024
+# Múltiplo de 3: cada bloco vira base64 sem padding no meio
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+PDF_MAGIC = b"%PDF-"
+
+
+def encode_file_base64(path: str) -> str:
+    """Base64 of a file, encoded chunk by chunk"""
+    parts = []
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(BASE64_CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
+
+
+@dataclass(frozen=True)
+class CachedPDF:
+    """A PDF stored in the relay cache"""
+
+    path: str
+    sha256: str
+    size: int
+    source: str  # "cache" | "download"
+
+    def read_base64(self) -> str:
+        return encode_file_base64(self.path)
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class PDFRelay:
+    """Download-once PDF cache keyed by source URL and content hash"""
+
+    def __init__(
+        self,
+        cache_dir: str = PDF_CACHE_DIR,
+        max_bytes: int = PDF_CACHE_MAX_MB * 1024 * 1024,
+        url_ttl: float = PDF_CACHE_URL_TTL,
+        http: Optional[HTTPClient] = None,
+        pinned: Callable[[], Set[str]] = pinned_pdf_blobs,
+    ):
+        self.cache_dir = cache_dir
+        self.pinned = pinned
+        self.refs_dir = os.path.join(cache_dir, "urls")
+        self.max_bytes = max_bytes
+        self.url_ttl = url_ttl
+        self.http = http or get_http_client("downloads")
+        os.makedirs(self.refs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # Uma trava por URL: downloads simultâneos do mesmo PDF viram um só
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._stats = {"hits": 0, "downloads": 0, "bytes_downloaded": 0, "evicted": 0}
+
+    def fetch(self, url: str, timeout: float = 60) -> CachedPDF:
+        """
+        Return the cached PDF for `url`, downloading it if needed.
+        Raises requests' exceptions on HTTP errors and ValueError when the
+        response is not a PDF (nothing is cached in that case).
+        """
+        url_key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with self._url_lock(url_key):
+            cached = self._lookup(url_key)
+            if cached:
+                self._count("hits")
+                return cached
+            pdf = self._download(url, timeout)
+            self._write_ref(url_key, pdf.sha256)
+
+        self._evict(keep=pdf.path)
+        return pdf
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+        blobs = self._blobs()
+        stats["entries"] = len(blobs)
+        stats["bytes"] = sum(size for _, size, _ in blobs)
+        return stats
+
+    def _url_lock(self, url_key: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url_key, threading.Lock())
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{sha256}.pdf")
+
+    def _lookup(self, url_key: str) -> Optional[CachedPDF]:
+        ref_path = os.path.join(self.refs_dir, url_key)
+        try:
+            if time.time() - os.path.getmtime(ref_path) > self.url_ttl:
+                return None
+            with open(ref_path, encoding="ascii") as f:
+                sha256 = f.read().strip()
+            path = self._blob_path(sha256)
+            size = os.path.getsize(path)
+            os.utime(path)  # marca uso recente para o LRU
+        except OSError:
+            return None
+        return CachedPDF(path=path, sha256=sha256, size=size, source="cache")
+
+    def _download(self, url: str, timeout: float) -> CachedPDF:
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with self.http.get(url, stream=True, timeout=timeout) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        if size == 0 and not chunk.startswith(PDF_MAGIC):
+                            raise ValueError(
+                                f"Response from {url} is not a PDF "
+                                f"({response.headers.get('Content-Type')})"
+                            )
+                        digest.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+            if size == 0:
+                raise ValueError(f"Empty response from {url}")
+
+            sha256 = digest.hexdigest()
+            path = self._blob_path(sha256)
+            if os.path.exists(path):
+                # Mesmo conteúdo já guardado (outra URL): reaproveita o blob
+                os.remove(tmp_path)
+                os.utime(path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._stats["downloads"] += 1
+            self._stats["bytes_downloaded"] += size
+        logger.info(f"📄 PDF downloaded ({size} bytes, sha256 {sha256[:12]})")
+        return CachedPDF(path=path, sha256=sha256, size=size, source="download")
+
+    def _write_ref(self, url_key: str, sha256: str) -> None:
+        ref_path = os.path.join(self.refs_dir, url_key)
+        tmp_path = f"{ref_path}.tmp"
+        with open(tmp_path, "w", encoding="ascii") as f:
+            f.write(sha256)
+        os.replace(tmp_path, ref_path)
+
+    def _blobs(self):
+        """(path, size, last use) of every cached PDF"""
+        blobs = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                blobs.append((entry.path, stat.st_size, stat.st_mtime))
+        return blobs
+
+    def _evict(self, keep: str) -> None:
+        """
+        Remove least recently used PDFs (but `keep` and pinned ones) until
+        under max_bytes
+        """
+        blobs = [blob for blob in self._blobs() if blob[0] != keep]
+        total = sum(size for _, size, _ in blobs) + os.path.getsize(keep)
+        if total <= self.max_bytes:
+            return
+        try:
+            pinned = {self._blob_path(sha256) for sha256 in self.pinned()}
+        except Exception as e:
+            # Sem saber o que está fixado, não remove nada
+            logger.warning(f"Could not read pinned PDFs, skipping eviction: {e}")
+            return
+        # Referências sem blob viram miss no _lookup; só removemos os PDFs
+        for path, size, _ in sorted(blobs, key=lambda blob: blob[2]):
+            if total <= self.max_bytes:
+                break
+            if path in pinned:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # em uso (Windows) ou já removido
+            total -= size
+            self._count("evicted")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+_relay: Optional[PDFRelay] = None
+_relay_lock = threading.Lock()
+
+
+def get_pdf_relay() -> PDFRelay:
+    """Process-wide PDF relay"""
+    global _relay
+    if _relay is None:
+        with _relay_lock:
+            if _relay is None:
+                _relay = PDFRelay()
+    return _relay
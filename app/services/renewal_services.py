@@ -13,6 +13,7 @@ from typing import Optional, Dict, Any, List, Protocol
 from abc import ABC, abstractmethod
 
 from app.database.database import get_db_connection
+from app.database.identity_links import get_identity_links
 from app.utils.utils import standardize_phone_number, debug
 
 
@@ -539,9 +540,11 @@ def add_pending(
     """Legacy wrapper for add_pending"""
     repository = SQLitePendingRenewalRepository()
     service = PendingRenewalService(repository)
-    return service.add_pending(
+    result = service.add_pending(
         company_name, document, contact_number, contact_name, deal_type, spa_id, status
     )
+    get_identity_links().link_renewal(contact_number, document, spa_id)
+    return result
 
 
 def update_pending(spa_id: int, **kwargs) -> bool:
@@ -751,6 +754,19 @@ def get_waiting_ticket_flows() -> List[Dict[str, Any]]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+def count_waiting_ticket_flows(contact_number: str) -> int:
+    """Count waiting ticket flows for a contact"""
+    with get_db_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) FROM ticket_flow_queue
+            WHERE contact_number = ? AND status = 'waiting' AND retry_count < 5
+            """,
+            (contact_number,),
+        ).fetchone()
+        return row[0]
+
+
 def insert_ticket_flow_queue(
     spa_id: int, contact_number: str, func_name: str, func_args: str
 ) -> None:
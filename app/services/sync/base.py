@@ -4,11 +4,18 @@ import os
 import json
 import time
 import logging
-from typing import Any, Dict, List, Optional
-import requests
-from requests import Session, Response
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+from requests import Response
 
 from app.config import Config
+from app.database.contact_directory import ContactDirectory, get_contact_directory
+from app.database.identity_links import get_identity_links
+from app.services.http_client import get_http_client
+from app.services.sync.snapshot import SnapshotWriter
+from app.services.sync.rate_limit import get_provider_bucket, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -16,16 +23,24 @@ logger = logging.getLogger(__name__)
 class BaseSyncManager:
     """
     Base para sync paginado de API REST:
-    - Reuso de Session
-    - Retry simples
+    - Session keep-alive compartilhada por provedor (app.services.http_client)
+    - Retry com backoff exponencial; 429/503 respeitam Retry-After
+    - Token bucket por provedor
+    - Tamanho de página adaptativo (cresce enquanto a latência está baixa)
     - Timeout padrão
-    - Paginação genérica
-    - Persistência de JSON
+    - Paginação genérica (sequencial ou N páginas em paralelo)
+    - Modo delta: só registros alterados desde a última execução completa
+    - Persistência por página no diretório SQLite (executemany)
+    - Exportação opcional de snapshot NDJSON (atômica, gzip opcional)
     """
 
     DEFAULT_TIMEOUT = 30
     MAX_RETRIES = 3
-    RETRY_BACKOFF = 2  # segundos
+    MAX_THROTTLE_RETRIES = 6  # 429/503 não consomem as tentativas normais
+    RETRY_BACKOFF = 2  # segundos, dobrado a cada tentativa
+    THROTTLE_STATUSES = (429, 503)
+    LATENCY_TARGET = 2.0  # segundos; acima disso a página para de crescer
+    DELTA_OVERLAP = timedelta(minutes=10)  # folga para relógios e atrasos de indexação
 
     def __init__(
         self,
@@ -39,6 +54,12 @@ class BaseSyncManager:
         data_relpath: str,
         state_relpath: Optional[str] = None,
         list_key: str = "itens",
+        id_key: str = "id",
+        export_json: bool = True,
+        export_gzip: bool = False,
+        directory: Optional[ContactDirectory] = None,
+        provider: str = "default",
+        page_size_steps: Sequence[int] = (),
     ):
         self.entity = entity
         self.url = endpoint
@@ -47,7 +68,17 @@ class BaseSyncManager:
         self.page_param = page_param
         self.page_size_param = page_size_param
         self.page_size = page_size
+        # Tamanhos aceitos pela API, em ordem crescente (último = máximo)
+        self.page_size_steps = sorted(set(page_size_steps))
+        self.provider = provider
+        self.bucket = get_provider_bucket(provider)
+        self._last_latency: Optional[float] = None
         self.list_key = list_key
+        self.id_key = id_key
+        self.export_json = export_json
+        self.export_gzip = export_gzip
+        self.directory = directory or get_contact_directory()
+        self.identities = get_identity_links()
 
         # Paths absolutos
         self.data_path = os.path.join(Config.SYNC_DATA_DIR, data_relpath)
@@ -63,11 +94,17 @@ class BaseSyncManager:
         # Estado opcional
         self.state = self._load_state() if self.state_path else {"last_page": 0}
 
-        # Dados em memória
-        self.data: List[Any] = []
+        # Itens gravados nesta execução (os dados ficam no diretório, não em memória)
+        self.synced_count = 0
 
-        # Session única
-        self.session: Session = requests.Session()
+        # Filtros extras da execução atual (ex.: delta) e se ela grava last_page
+        self._run_params: Dict[str, Any] = {}
+        self._checkpoint_pages = True
+        # Página ilegível encerra o sync cedo: não dá para saber o que sumiu
+        self._page_errors = False
+
+        # Pool de conexões compartilhado com os demais módulos do provedor
+        self.http = get_http_client(provider)
 
     def _load_state(self) -> Dict[str, Any]:
         try:
@@ -80,36 +117,68 @@ class BaseSyncManager:
         with open(self.state_path, "w", encoding="utf-8") as f:
             json.dump(self.state, f, ensure_ascii=False, indent=2)
 
+    def delta_params(self, since: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Parâmetros que filtram registros alterados desde `since` (UTC).
+        None quando a API não oferece esse filtro.
+        """
+        return None
+
+    def _store_batch(self, batch: List[Any]):
+        stored = self.directory.upsert(self.entity, batch, self.id_key)
+        self.identities.link_batch(self.entity, batch)
+        self.synced_count += stored
+
     def _save_data(self):
-        with open(self.data_path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-        logger.info(
-            f"[{self.entity}] salvou {len(self.data)} itens em {self.data_path}"
-        )
+        """Exporta o conteúdo do diretório para snapshot NDJSON, um item por vez"""
+        with SnapshotWriter(self.data_path, compress=self.export_gzip) as writer:
+            writer.write_many(self.directory.iter_records(self.entity))
+        logger.info(f"[{self.entity}] exportou {writer.count} itens em {writer.path}")
 
     def _request_with_retry(self, params: Dict[str, Any]) -> Response:
         last_exc = None
-        for attempt in range(1, self.MAX_RETRIES + 1):
+        attempt = throttled = 0
+        while attempt < self.MAX_RETRIES:
+            self.bucket.acquire()
+            started = time.monotonic()
             try:
-                resp = self.session.get(
+                resp = self.http.get(
                     self.url,
                     headers=self.get_headers(),
                     params=params,
                     timeout=self.DEFAULT_TIMEOUT,
                 )
+                if (
+                    resp.status_code in self.THROTTLE_STATUSES
+                    and throttled < self.MAX_THROTTLE_RETRIES
+                ):
+                    throttled += 1
+                    delay = retry_after_seconds(resp)
+                    if delay is None:
+                        delay = self.RETRY_BACKOFF * 2 ** (throttled - 1)
+                    logger.warning(
+                        f"[{self.entity}] HTTP {resp.status_code}; aguardando "
+                        f"{delay:.1f}s ({throttled}/{self.MAX_THROTTLE_RETRIES})"
+                    )
+                    self.bucket.pause(delay)
+                    continue
                 resp.raise_for_status()
+                self._last_latency = time.monotonic() - started
                 return resp
             except Exception as e:
+                attempt += 1
                 last_exc = e
                 logger.warning(
                     f"[{self.entity}] tentativa {attempt}/{self.MAX_RETRIES} falhou: {e}"
                 )
-                time.sleep(self.RETRY_BACKOFF)
+                if attempt < self.MAX_RETRIES:
+                    time.sleep(self.RETRY_BACKOFF * 2 ** (attempt - 1))
         logger.error(f"[{self.entity}] todas tentativas falharam: {last_exc}")
         raise last_exc
 
     def fetch_page(self, page: int) -> List[Any]:
         params = self.params_template.copy()
+        params.update(self._run_params)
         params[self.page_param] = page
         params[self.page_size_param] = self.page_size
 
@@ -118,6 +187,7 @@ class BaseSyncManager:
             payload = resp.json()
         except ValueError as e:
             logger.error(f"[{self.entity}] JSON inválido na página {page}: {e}")
+            self._page_errors = True
             return []
 
         # extrai lista
@@ -126,24 +196,163 @@ class BaseSyncManager:
         if isinstance(payload, list):
             return payload
         logger.warning(f"[{self.entity}] payload inesperado: {type(payload)}")
+        self._page_errors = True
         return []
 
-    def run_sync(self):
-        logger.info(f"[{self.entity}] iniciando sync paginado")
-        page = self.state.get("last_page", 0) + 1
-        while True:
-            batch = self.fetch_page(page)
-            if not batch:
-                logger.info(f"[{self.entity}] fim do sync (página {page} vazia)")
-                break
-            self.data.extend(batch)
-            if self.state_path:
-                self.state["last_page"] = page
-                self._save_state()
-            page += 1
-            if len(batch) < self.page_size:
-                logger.info(f"[{self.entity}] última página detectada ({page-1})")
-                break
-
-        self._save_data()
-        logger.info(f"[{self.entity}] sincronização concluída")
+    def _process_page(self, page: int, batch: List[Any]) -> bool:
+        """Grava uma página na ordem; retorna False quando o sync terminou"""
+        if not batch:
+            logger.info(f"[{self.entity}] fim do sync (página {page} vazia)")
+            return False
+        self._store_batch(batch)
+        if self.state_path and self._checkpoint_pages:
+            self.state["last_page"] = page
+            self.state["page_size"] = self.page_size
+            self._save_state()
+        if len(batch) < self.page_size:
+            logger.info(f"[{self.entity}] última página detectada ({page})")
+            return False
+        return True
+
+    def _prepare_run(self, delta: bool) -> int:
+        """Define filtros e página inicial; retorna a primeira página"""
+        self._run_params = {}
+        self._checkpoint_pages = True
+        self._page_errors = False
+
+        if not delta:
+            return self._resume_page()
+
+        mark = self.state.get("high_water_mark")
+        if not mark:
+            logger.info(
+                f"[{self.entity}] sem high-water mark; executando sync completo"
+            )
+            return self._resume_page()
+
+        since = datetime.fromisoformat(mark) - self.DELTA_OVERLAP
+        params = self.delta_params(since)
+        if params is None:
+            # API sem filtro por alteração: baixa tudo e mescla por ID no diretório
+            logger.info(
+                f"[{self.entity}] API sem filtro de alteração; rebaixando e mesclando"
+            )
+        else:
+            logger.info(f"[{self.entity}] delta desde {since.isoformat()}")
+            self._run_params = params
+        # Páginas do delta não são checkpoint do sync completo
+        self._checkpoint_pages = False
+        return 1
+
+    def _resume_page(self) -> int:
+        """Próxima página do checkpoint, no tamanho de página em que foi salvo"""
+        last_page = self.state.get("last_page", 0)
+        if last_page:
+            self.page_size = self.state.get("page_size", self.page_size)
+        return last_page + 1
+
+    def _adapt_page_size(self, page: int) -> int:
+        """
+        Cresce a página para o próximo tamanho aceito enquanto a latência
+        estiver abaixo do alvo. Só troca quando o deslocamento já lido é
+        múltiplo do novo tamanho, para a numeração continuar alinhada.
+        Retorna o número da próxima página.
+        """
+        offset = page * self.page_size
+        larger = [size for size in self.page_size_steps if size > self.page_size]
+        if (
+            larger
+            and self._last_latency is not None
+            and self._last_latency < self.LATENCY_TARGET
+            and offset % larger[0] == 0
+        ):
+            logger.info(
+                f"[{self.entity}] página {self.page_size} → {larger[0]} "
+                f"(latência {self._last_latency:.2f}s)"
+            )
+            self.page_size = larger[0]
+            return offset // self.page_size + 1
+        return page + 1
+
+    def _finish_run(self, started_at: datetime):
+        """
+        Registra o high-water mark de uma execução concluída. Num sync
+        completo, remove do diretório o que a origem não devolveu mais.
+        """
+        if self._checkpoint_pages and not self._page_errors:
+            # Sem arquivo de estado o sync sempre começa da primeira página
+            run_started_at = (
+                self.state.get("run_started_at")
+                if self.state_path
+                else started_at.isoformat()
+            )
+            if run_started_at:
+                pruned = self.directory.prune(
+                    self.entity, datetime.fromisoformat(run_started_at)
+                )
+                if pruned:
+                    # Vínculos não podem apontar para registros removidos
+                    self.identities.unlink_missing(self.entity)
+        if not self.state_path:
+            return
+        if self._checkpoint_pages:
+            # Sync completo retomado vale desde o início da primeira tentativa
+            mark = self.state.pop("run_started_at", None) or started_at.isoformat()
+            # Sync completo concluído: o próximo recomeça da primeira página
+            self.state["last_page"] = 0
+        else:
+            mark = started_at.isoformat()
+        self.state["high_water_mark"] = mark
+        self._save_state()
+
+    def run_sync(self, concurrency: int = 1, delta: bool = False):
+        """
+        Sincroniza a partir da última página salva.
+        Com concurrency > 1 mantém até N páginas em voo no pool do provedor;
+        as páginas são gravadas em ordem e as requisições excedentes são
+        descartadas assim que uma página curta ou vazia aparece.
+        Com delta=True busca apenas o que mudou desde a última execução
+        completa; os registros são mesclados por ID no diretório.
+        """
+        concurrency = max(1, concurrency)
+        started_at = datetime.now(timezone.utc)
+        logger.info(
+            f"[{self.entity}] iniciando sync paginado (concorrência {concurrency})"
+        )
+        # Cada página em voo precisa da sua conexão no pool do provedor
+        self.http.ensure_pool_maxsize(concurrency)
+
+        next_page = self._prepare_run(delta)
+        if self._checkpoint_pages and next_page == 1 and self.state_path:
+            self.state["run_started_at"] = started_at.isoformat()
+            self._save_state()
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix=f"sync-{self.entity}"
+        ) as pool:
+            in_flight = deque()
+            for _ in range(concurrency):
+                in_flight.append((next_page, pool.submit(self.fetch_page, next_page)))
+                next_page += 1
+
+            try:
+                while in_flight:
+                    page, future = in_flight.popleft()
+                    if not self._process_page(page, future.result()):
+                        break
+                    if concurrency == 1 and self.page_size_steps:
+                        next_page = self._adapt_page_size(page)
+                    in_flight.append(
+                        (next_page, pool.submit(self.fetch_page, next_page))
+                    )
+                    next_page += 1
+            finally:
+                for _, future in in_flight:
+                    future.cancel()
+
+        self._finish_run(started_at)
+        if self.export_json:
+            self._save_data()
+        logger.info(
+            f"[{self.entity}] sincronização concluída ({self.synced_count} itens gravados)"
+        )
+        return self.synced_count
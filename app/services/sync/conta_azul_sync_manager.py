@@ -1,5 +1,8 @@
 # app/services/sync/conta_azul_sync_manager.py
 import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
 from app.services.sync.base import BaseSyncManager
 from app.services.conta_azul.conta_azul_services import (
     get_auth_headers_conta_azul as get_ca_headers,
@@ -14,9 +17,17 @@ PERSON_STATE = os.path.join("conta_azul", "person_state.json")
 ACCOUNT_STATE = os.path.join("conta_azul", "accounts_state.json")
 SERVICE_STATE = os.path.join("conta_azul", "services_state.json")
 
+# A API da Conta Azul lê datas sem fuso no horário de Brasília
+CA_TIMEZONE = ZoneInfo("America/Sao_Paulo")
+
+# Valores aceitos por `tamanho_pagina` na API v2 (o último é o máximo)
+CA_PAGE_SIZES = (10, 20, 50, 100, 200, 500, 1000)
+
 
 class PersonsSyncManager(BaseSyncManager):
-    def __init__(self, page_size: int = 10):
+    def __init__(
+        self, page_size: int = 10, export_json: bool = True, export_gzip: bool = False
+    ):
         super().__init__(
             entity="CA::Pessoas",
             endpoint="https://api-v2.contaazul.com/v1/pessoa",
@@ -28,11 +39,22 @@ class PersonsSyncManager(BaseSyncManager):
             data_relpath=PERSON_PATH,
             state_relpath=PERSON_STATE,
             list_key="itens",
+            provider="conta_azul",
+            page_size_steps=CA_PAGE_SIZES,
+            id_key="uuid",
+            export_json=export_json,
+            export_gzip=export_gzip,
         )
 
+    def delta_params(self, since: datetime) -> Optional[Dict[str, Any]]:
+        local_since = since.astimezone(CA_TIMEZONE)
+        return {"data_alteracao_de": local_since.strftime("%Y-%m-%dT%H:%M:%S")}
+
 
 class AccountsSyncManager(BaseSyncManager):
-    def __init__(self, page_size: int = 10):
+    def __init__(
+        self, page_size: int = 10, export_json: bool = True, export_gzip: bool = False
+    ):
         super().__init__(
             entity="CA::Contas",
             endpoint="https://api-v2.contaazul.com/v1/conta-financeira",
@@ -44,11 +66,17 @@ class AccountsSyncManager(BaseSyncManager):
             data_relpath=ACCOUNT_PATH,
             state_relpath=ACCOUNT_STATE,
             list_key="itens",
+            provider="conta_azul",
+            page_size_steps=CA_PAGE_SIZES,
+            export_json=export_json,
+            export_gzip=export_gzip,
         )
 
 
 class ServicesSyncManager(BaseSyncManager):
-    def __init__(self, page_size: int = 10):
+    def __init__(
+        self, page_size: int = 10, export_json: bool = True, export_gzip: bool = False
+    ):
         super().__init__(
             entity="CA::Servicos",
             endpoint="https://api-v2.contaazul.com/v1/servicos",
@@ -60,4 +88,8 @@ class ServicesSyncManager(BaseSyncManager):
             data_relpath=SERVICE_PATH,
             state_relpath=SERVICE_STATE,
             list_key="itens",
+            provider="conta_azul",
+            page_size_steps=CA_PAGE_SIZES,
+            export_json=export_json,
+            export_gzip=export_gzip,
         )
@@ -1,5 +1,8 @@
 # app/services/sync/digisac_sync_manager.py
 import os
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
 from app.services.sync.base import BaseSyncManager
 from app.services.digisac.digisac_services import get_auth_headers_digisac
 
@@ -12,9 +15,14 @@ CONTACT_STATE = os.path.join("digisac", "contacts_state.json")
 DEPT_STATE = os.path.join("digisac", "departments_state.json")
 USER_STATE = os.path.join("digisac", "users_state.json")
 
+# Tamanhos de `perPage` usados pelo sync adaptativo (o último é o máximo da API)
+DS_PAGE_SIZES = (40, 100)
+
 
 class ContactsSyncManager(BaseSyncManager):
-    def __init__(self, page_size: int = 40):
+    def __init__(
+        self, page_size: int = 40, export_json: bool = True, export_gzip: bool = False
+    ):
         super().__init__(
             entity="DS::Contacts",
             endpoint="https://logicassessoria.digisac.chat/api/v1/contacts",
@@ -26,11 +34,22 @@ class ContactsSyncManager(BaseSyncManager):
             data_relpath=CONTACT_PATH,
             state_relpath=CONTACT_STATE,
             list_key="data",
+            provider="digisac",
+            page_size_steps=DS_PAGE_SIZES,
+            export_json=export_json,
+            export_gzip=export_gzip,
         )
 
+    def delta_params(self, since: datetime) -> Optional[Dict[str, Any]]:
+        # Filtro no formato `where` da API do Digisac
+        where = {"updatedAt": {"$gte": since.strftime("%Y-%m-%dT%H:%M:%S.000Z")}}
+        return {"where": json.dumps(where)}
+
 
 class DepartmentsSyncManager(BaseSyncManager):
-    def __init__(self, page_size: int = 40):
+    def __init__(
+        self, page_size: int = 40, export_json: bool = True, export_gzip: bool = False
+    ):
         super().__init__(
             entity="DS::Departments",
             endpoint="https://logicassessoria.digisac.chat/api/v1/departments",
@@ -42,11 +61,17 @@ class DepartmentsSyncManager(BaseSyncManager):
             data_relpath=DEPT_PATH,
             state_relpath=DEPT_STATE,
             list_key="data",
+            provider="digisac",
+            page_size_steps=DS_PAGE_SIZES,
+            export_json=export_json,
+            export_gzip=export_gzip,
         )
 
 
 class UsersSyncManager(BaseSyncManager):
-    def __init__(self, page_size: int = 40):
+    def __init__(
+        self, page_size: int = 40, export_json: bool = True, export_gzip: bool = False
+    ):
         super().__init__(
             entity="DS::Users",
             endpoint="https://logicassessoria.digisac.chat/api/v1/users",
@@ -58,4 +83,8 @@ class UsersSyncManager(BaseSyncManager):
             data_relpath=USER_PATH,
             state_relpath=USER_STATE,
             list_key="data",
+            provider="digisac",
+            page_size_steps=DS_PAGE_SIZES,
+            export_json=export_json,
+            export_gzip=export_gzip,
         )
@@ -0,0 +1,122 @@
+# app/services/sync/freshness.py
+"""
+Frescor dos snapshots sincronizados.
+
+- Idade de cada snapshot, lida do high-water mark gravado no arquivo de
+  estado ao fim de cada sync completo ou delta (CLI ou worker).
+- Monitor de buscas sem resultado: quando os webhooks deixam de achar
+  contatos/pessoas em sequência, é sinal de cliente novo ainda não
+  sincronizado e o worker de sync é acordado para um refresh imediato.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional
+
+from app.database.database import DB_DIR
+from app.database.contact_directory import (
+    CONTA_AZUL_PERSONS_ENTITY,
+    DIGISAC_CONTACTS_ENTITY,
+)
+
+logger = logging.getLogger(__name__)
+
+# Arquivos de estado (relativos a app/database) das entidades monitoradas
+STATE_RELPATHS = {
+    CONTA_AZUL_PERSONS_ENTITY: os.path.join("conta_azul", "person_state.json"),
+    "CA::Contas": os.path.join("conta_azul", "accounts_state.json"),
+    "CA::Servicos": os.path.join("conta_azul", "services_state.json"),
+    DIGISAC_CONTACTS_ENTITY: os.path.join("digisac", "contacts_state.json"),
+    "DS::Departments": os.path.join("digisac", "departments_state.json"),
+    "DS::Users": os.path.join("digisac", "users_state.json"),
+}
+
+MISS_WINDOW_SECONDS = int(os.getenv("SYNC_MISS_WINDOW_SECONDS", "300"))
+MISS_SPIKE_THRESHOLD = int(os.getenv("SYNC_MISS_SPIKE_THRESHOLD", "5"))
+
+
+def get_snapshot_age(entity: str) -> Optional[float]:
+    """Segundos desde o último sync concluído da entidade; None se nunca"""
+    relpath = STATE_RELPATHS.get(entity)
+    if not relpath:
+        return None
+    try:
+        with open(os.path.join(DB_DIR, relpath), "r", encoding="utf-8") as f:
+            mark = json.load(f).get("high_water_mark")
+    except (OSError, ValueError):
+        return None
+    if not mark:
+        return None
+    synced_at = datetime.fromisoformat(mark)
+    return (datetime.now(timezone.utc) - synced_at).total_seconds()
+
+
+def get_snapshot_ages() -> Dict[str, Optional[float]]:
+    return {entity: get_snapshot_age(entity) for entity in STATE_RELPATHS}
+
+
+class LookupMissMonitor:
+    """Conta buscas sem resultado por entidade numa janela deslizante"""
+
+    def __init__(
+        self,
+        window_seconds: int = MISS_WINDOW_SECONDS,
+        threshold: int = MISS_SPIKE_THRESHOLD,
+    ):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self._misses: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        # Acordado quando alguma entidade atinge o limite de misses
+        self.spike_event = threading.Event()
+
+    def record_miss(self, entity: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            misses = self._misses.setdefault(entity, deque())
+            misses.append(now)
+            self._expire(misses, now)
+            spiking = len(misses) >= self.threshold
+        if spiking and not self.spike_event.is_set():
+            logger.warning(
+                f"Pico de buscas sem resultado em {entity} "
+                f"({len(misses)} em {self.window_seconds}s); solicitando refresh"
+            )
+            self.spike_event.set()
+
+    def pop_spiking(self) -> list:
+        """Entidades em pico; zera a contagem delas e o evento"""
+        now = time.monotonic()
+        with self._lock:
+            spiking = []
+            for entity, misses in self._misses.items():
+                self._expire(misses, now)
+                if len(misses) >= self.threshold:
+                    spiking.append(entity)
+                    misses.clear()
+            self.spike_event.clear()
+        return spiking
+
+    def get_counts(self) -> Dict[str, int]:
+        now = time.monotonic()
+        with self._lock:
+            for misses in self._misses.values():
+                self._expire(misses, now)
+            return {entity: len(misses) for entity, misses in self._misses.items()}
+
+    def _expire(self, misses: Deque[float], now: float) -> None:
+        while misses and now - misses[0] > self.window_seconds:
+            misses.popleft()
+
+
+lookup_miss_monitor = LookupMissMonitor()
+
+
+def record_lookup_miss(entity: str) -> None:
+    """Registra uma busca sem resultado (usado pelos fluxos de webhook)"""
+    lookup_miss_monitor.record_miss(entity)
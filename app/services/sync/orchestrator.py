@@ -0,0 +1,179 @@
+# app/services/sync/orchestrator.py
+"""
+Orquestrador de syncs em DAG.
+
+Cada tarefa declara seu provedor e suas dependências. Tarefas prontas
+(dependências concluídas) rodam em paralelo, respeitando um limite de
+tarefas simultâneas por provedor — Conta Azul e Digisac são hosts
+independentes, com limites de requisição próprios.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SyncTask:
+    """Nó do DAG: `run` executa o sync e retorna a quantidade de itens gravados"""
+
+    def __init__(
+        self,
+        name: str,
+        provider: str,
+        run: Callable[[], int],
+        depends_on: Iterable[str] = (),
+    ):
+        self.name = name
+        self.provider = provider
+        self.run = run
+        self.depends_on = tuple(depends_on)
+
+
+class SyncResult:
+    """Resultado de uma tarefa do orquestrador"""
+
+    def __init__(self, name: str, provider: str):
+        self.name = name
+        self.provider = provider
+        self.status = "pending"  # pending | running | ok | failed | skipped
+        self.records = 0
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def throughput(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+
+class SyncOrchestrator:
+    """Executa um DAG de SyncTask com limites de concorrência por provedor"""
+
+    def __init__(
+        self,
+        tasks: List[SyncTask],
+        provider_limits: Optional[Dict[str, int]] = None,
+        default_limit: int = 1,
+    ):
+        self.tasks = {task.name: task for task in tasks}
+        self.provider_limits = provider_limits or {}
+        self.default_limit = default_limit
+        self._validate()
+
+    def _validate(self):
+        for task in self.tasks.values():
+            missing = [d for d in task.depends_on if d not in self.tasks]
+            if missing:
+                raise ValueError(
+                    f"Tarefa {task.name} depende de {missing} (inexistente)"
+                )
+
+        # Detecção de ciclo (ordenação topológica)
+        remaining = {name: set(t.depends_on) for name, t in self.tasks.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Ciclo de dependências entre: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def run(self) -> List[SyncResult]:
+        results = {name: SyncResult(name, t.provider) for name, t in self.tasks.items()}
+        running: Dict[str, int] = {}
+        lock = threading.Lock()
+        max_workers = max(
+            1,
+            sum(
+                self.provider_limits.get(p, self.default_limit)
+                for p in {t.provider for t in self.tasks.values()}
+            ),
+        )
+
+        def execute(task: SyncTask):
+            result = results[task.name]
+            started = time.monotonic()
+            try:
+                result.records = task.run() or 0
+                result.status = "ok"
+            except Exception as e:
+                logger.exception(f"[{task.name}] sync falhou: {e}")
+                result.status = "failed"
+                result.error = str(e)
+            finally:
+                result.seconds = time.monotonic() - started
+                with lock:
+                    running[task.provider] -= 1
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sync-dag"
+        ) as pool:
+            futures = set()
+            while True:
+                self._skip_blocked(results)
+                for task in self._ready(results):
+                    limit = self.provider_limits.get(task.provider, self.default_limit)
+                    with lock:
+                        if running.get(task.provider, 0) >= limit:
+                            continue
+                        running[task.provider] = running.get(task.provider, 0) + 1
+                    results[task.name].status = "running"
+                    logger.info(f"[{task.name}] iniciado ({task.provider})")
+                    futures.add(pool.submit(execute, task))
+
+                if not futures:
+                    break
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+
+        return [results[name] for name in self.tasks]
+
+    def _ready(self, results: Dict[str, SyncResult]) -> List[SyncTask]:
+        return [
+            task
+            for task in self.tasks.values()
+            if results[task.name].status == "pending"
+            and all(results[d].status == "ok" for d in task.depends_on)
+        ]
+
+    def _skip_blocked(self, results: Dict[str, SyncResult]):
+        """Marca como ignoradas as tarefas cuja dependência falhou"""
+        changed = True
+        while changed:
+            changed = False
+            for task in self.tasks.values():
+                result = results[task.name]
+                if result.status != "pending":
+                    continue
+                failed = [
+                    d
+                    for d in task.depends_on
+                    if results[d].status in ("failed", "skipped")
+                ]
+                if failed:
+                    result.status = "skipped"
+                    result.error = f"dependência não concluída: {', '.join(failed)}"
+                    changed = True
+
+
+def format_summary(results: List[SyncResult]) -> List[str]:
+    """Linhas do resumo por entidade: status, tempo, itens e itens/s"""
+    lines = [
+        f"{'entidade':<18} {'provedor':<10} {'status':<8} "
+        f"{'tempo(s)':>9} {'itens':>8} {'itens/s':>9}"
+    ]
+    for r in results:
+        line = (
+            f"{r.name:<18} {r.provider:<10} {r.status:<8} "
+            f"{r.seconds:>9.1f} {r.records:>8} {r.throughput:>9.1f}"
+        )
+        if r.error:
+            line += f"  ({r.error})"
+        lines.append(line)
+
+    total_records = sum(r.records for r in results)
+    lines.append(f"total: {total_records} itens")
+    return lines
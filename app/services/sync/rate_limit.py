@@ -0,0 +1,117 @@
+# app/services/sync/rate_limit.py
+"""
+Controle de taxa para os syncs e demais clientes de APIs com cota.
+
+Um token bucket por provedor limita as requisições de todos os managers e
+threads que falam com o mesmo host. Quando o servidor responde 429/503, o
+bucket inteiro é pausado pelo tempo pedido em `Retry-After`, para que as
+demais threads também parem de insistir.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from requests import Response
+
+# Requisições por segundo (taxa, rajada) por provedor; sobrescrevíveis por env
+PROVIDER_RATES = {
+    "conta_azul": (
+        float(os.getenv("SYNC_RATE_CONTA_AZUL", "8")),
+        int(os.getenv("SYNC_BURST_CONTA_AZUL", "8")),
+    ),
+    "digisac": (
+        float(os.getenv("SYNC_RATE_DIGISAC", "5")),
+        int(os.getenv("SYNC_BURST_DIGISAC", "5")),
+    ),
+    # Envios do dispatcher (mensagens, PDFs, transferências) ao Digisac
+    "digisac_outbound": (
+        float(os.getenv("DIGISAC_SEND_RATE", "5")),
+        int(os.getenv("DIGISAC_SEND_BURST", "10")),
+    ),
+    # API pública cnpj.ws: 3 consultas por minuto por IP
+    "cnpj": (
+        float(os.getenv("CNPJ_RATE_PER_MINUTE", "3")) / 60,
+        int(os.getenv("CNPJ_RATE_BURST", "3")),
+    ),
+}
+DEFAULT_RATE = (5.0, 5)
+
+
+class TokenBucket:
+    """Token bucket bloqueante e thread-safe"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda até haver um token disponível e o consome. Com `timeout`,
+        desiste (False) se o token não sair a tempo, sem consumi-lo.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Suspende o bucket (ex.: Retry-After) e zera a rajada acumulada"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_provider_bucket(provider: str) -> TokenBucket:
+    """Retorna o bucket compartilhado do provedor"""
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            rate, burst = PROVIDER_RATES.get(provider, DEFAULT_RATE)
+            bucket = TokenBucket(rate, burst)
+            _buckets[provider] = bucket
+        return bucket
+
+
+def retry_after_seconds(resp: Response) -> Optional[float]:
+    """Interpreta `Retry-After` (segundos ou data HTTP); None se ausente"""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,129 @@
+# app/services/sync/snapshot.py
+"""
+Snapshots dos syncs em NDJSON (um registro JSON por linha).
+
+A escrita vai para um arquivo temporário no mesmo diretório, que recebe
+fsync e só então substitui o snapshot anterior com os.replace — um sync
+interrompido nunca deixa um arquivo truncado. A leitura é um gerador, então
+o consumo de memória não depende do tamanho da coleção.
+"""
+
+import os
+import gzip
+import json
+import logging
+import tempfile
+from typing import Any, Dict, IO, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotWriter:
+    """
+    Escritor atômico de snapshot NDJSON (opcionalmente gzip).
+
+    Uso:
+        with SnapshotWriter(path) as writer:
+            writer.write_many(registros)
+    O arquivo só é publicado se o bloco terminar sem exceção.
+    """
+
+    def __init__(self, path: str, compress: bool = False):
+        self.path = path + ".gz" if compress and not path.endswith(".gz") else path
+        self.compress = compress
+        self.count = 0
+        self._tmp_path = None
+        self._raw: IO[bytes] = None
+        self._stream: IO[bytes] = None
+
+    def __enter__(self) -> "SnapshotWriter":
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", dir=directory
+        )
+        self._raw = os.fdopen(fd, "wb")
+        self._stream = (
+            gzip.GzipFile(fileobj=self._raw, mode="wb") if self.compress else self._raw
+        )
+        return self
+
+    def write(self, record: Any):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._stream.write(line.encode("utf-8"))
+        self.count += 1
+
+    def write_many(self, records: Iterable[Any]):
+        for record in records:
+            self.write(record)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._stream is not self._raw:
+                self._stream.close()
+            self._raw.flush()
+            if exc_type is None:
+                os.fsync(self._raw.fileno())
+        finally:
+            self._raw.close()
+
+        if exc_type is not None:
+            os.unlink(self._tmp_path)
+            logger.warning(f"Snapshot {self.path} descartado: {exc}")
+            return False
+
+        os.replace(self._tmp_path, self.path)
+        _fsync_dir(os.path.dirname(self.path) or ".")
+        return False
+
+
+def _fsync_dir(directory: str):
+    """Garante que o rename sobreviva a uma queda de energia (POSIX)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Windows não abre diretórios
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def iter_snapshot(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Itera os registros de um snapshot.
+    Aceita NDJSON (com ou sem .gz) e o formato antigo: lista JSON ou
+    objeto {"itens": [...]}.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if not first:
+            return
+
+        if first == "[":
+            # Formato antigo (json.dump de uma lista inteira)
+            yield from json.loads(first + f.read())
+            return
+
+        head = first + f.readline()
+        try:
+            record = json.loads(head)
+        except json.JSONDecodeError:
+            # Objeto JSON multi-linha do formato antigo
+            data = json.loads(head + f.read())
+            yield from (data.get("itens", []) or [])
+            return
+
+        if isinstance(record, dict) and isinstance(record.get("itens"), list):
+            yield from record["itens"]
+            return
+
+        yield record
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,201 @@
+# app/services/token_store.py
+"""
+Thread-safe OAuth token store shared by the Digisac and Conta Azul clients.
+
+Tokens live in memory; the JSON file is re-read only when its mtime changes
+(another process or the CLI refreshed it) and rewritten atomically only when
+the tokens actually change. `ensure_fresh` refreshes single-flight: one
+thread calls the provider while callers holding an expired token wait for
+its result, and callers whose token is merely close to expiry keep using it.
+When the TokenRefreshWorker owns a store (`background_refresh`), request
+threads stop refreshing early and only refresh a token that already expired.
+"""
+
+import os
+import json
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_KEYS = ("access_token", "refresh_token", "id_token", "expires_at")
+
+
+class TokenStore:
+    """In-memory token cache backed by an atomically written JSON file"""
+
+    def __init__(self, path: str, now: Callable[[], datetime] = datetime.now):
+        self.path = os.path.abspath(path)
+        # Relógio usado no cálculo de expiração (Digisac grava em UTC)
+        self.now = now
+        self._tokens: Dict[str, Any] = {key: None for key in TOKEN_KEYS}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.refresh_count = 0
+        # Set by TokenRefreshWorker: early refreshes happen in the background
+        self.background_refresh = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def get(self) -> Dict[str, Any]:
+        """Copy of the current tokens (reloaded if the file changed on disk)"""
+        with self._lock:
+            self._reload_if_changed()
+            return dict(self._tokens)
+
+    def set(self, tokens: Dict[str, Any]) -> None:
+        """Replace the tokens; the file is rewritten only if something changed"""
+        new_tokens = {key: tokens.get(key) for key in TOKEN_KEYS}
+        with self._lock:
+            if new_tokens == self._tokens:
+                return
+            self._tokens = new_tokens
+            self._write()
+
+    def reload(self) -> Dict[str, Any]:
+        """Force a re-read of the file"""
+        with self._lock:
+            self._mtime = None
+            self._reload_if_changed()
+            return dict(self._tokens)
+
+    def seconds_to_expiry(self, tokens: Optional[Dict[str, Any]] = None):
+        """Seconds until expiry (negative when expired); None if unknown"""
+        expires_at = (tokens or self.get()).get("expires_at")
+        if not isinstance(expires_at, datetime):
+            return None
+        return (expires_at - self.now()).total_seconds()
+
+    def ensure_fresh(
+        self,
+        refresh: Callable[[Dict[str, Any]], Dict[str, Any]],
+        margin: float = 0,
+    ) -> Dict[str, Any]:
+        """
+        Return valid tokens, calling `refresh(current_tokens)` when they are
+        within `margin` seconds of expiry. Only one thread refreshes at a time.
+        """
+        if self.background_refresh:
+            margin = 0
+        tokens = self.get()
+        if self._is_fresh(tokens, margin):
+            return tokens
+
+        expired = not self._is_fresh(tokens, 0)
+        # Token ainda válido e outra thread já renovando: segue com o atual
+        if not self._refresh_lock.acquire(blocking=expired):
+            return tokens
+        try:
+            # Outra thread pode ter renovado enquanto esperávamos o lock
+            tokens = self.get()
+            if self._is_fresh(tokens, margin):
+                return tokens
+            try:
+                new_tokens = refresh(tokens)
+            except Exception as e:
+                if self._is_fresh(tokens, 0):
+                    logger.warning(
+                        f"Early token refresh failed for {self.path}, "
+                        f"keeping current token: {e}"
+                    )
+                    return tokens
+                raise
+            self.refresh_count += 1
+            self.set(new_tokens)
+            return self.get()
+        finally:
+            self._refresh_lock.release()
+
+    def force_refresh(
+        self, refresh: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Refresh unconditionally (still single-flight)"""
+        with self._refresh_lock:
+            new_tokens = refresh(self.get())
+            self.refresh_count += 1
+            self.set(new_tokens)
+            return self.get()
+
+    def try_refresh(self, refresh: Callable[[Dict[str, Any]], Dict[str, Any]]) -> bool:
+        """
+        Refresh now unless another thread already is (returns False then).
+        Errors from `refresh` propagate; used by the background worker.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            new_tokens = refresh(self.get())
+            self.refresh_count += 1
+            self.set(new_tokens)
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def _is_fresh(self, tokens: Dict[str, Any], margin: float) -> bool:
+        if not tokens.get("access_token"):
+            return False
+        remaining = self.seconds_to_expiry(tokens)
+        # Sem expires_at conhecido o token é usado até a API recusá-lo
+        return remaining is None or remaining > margin
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read tokens from {self.path}: {e}")
+            return
+        expires_at = data.get("expires_at")
+        self._tokens = {key: data.get(key) for key in TOKEN_KEYS}
+        self._tokens["expires_at"] = (
+            datetime.fromisoformat(expires_at) if expires_at else None
+        )
+        self._mtime = mtime
+
+    def _write(self) -> None:
+        data = dict(self._tokens)
+        if isinstance(data["expires_at"], datetime):
+            data["expires_at"] = data["expires_at"].isoformat()
+
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tokens-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._mtime = os.stat(self.path).st_mtime
+        logger.info(f"Tokens saved to {self.path}")
+
+
+_stores: Dict[str, TokenStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_token_store(
+    path: str, now: Callable[[], datetime] = datetime.now
+) -> TokenStore:
+    """Shared store per token file, so every module sees the same tokens"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = TokenStore(key, now=now)
+            _stores[key] = store
+        return store
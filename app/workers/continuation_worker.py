@@ -0,0 +1,77 @@
+# app/workers/continuation_worker.py
+"""
+Continuation Worker following SOLID principles.
+Resumes persisted flow continuations when their Bitrix field is filled.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+from app.core.interfaces import IWorker
+from app.services.continuations import (
+    ContinuationRunner,
+    continuation_wakeup,
+    get_continuation_runner,
+)
+
+logger = logging.getLogger(__name__)
+
+# Teto de espera entre rodadas (novas continuações e webhooks acordam antes)
+IDLE_SECONDS = 60
+
+
+class ContinuationWorker(IWorker):
+    """
+    Worker responsible for running due continuations.
+    Sleeps until the next continuation is due, a new one is scheduled or
+    the Bitrix update webhook wakes it.
+    """
+
+    def __init__(
+        self,
+        runner: Optional[ContinuationRunner] = None,
+        idle_seconds: float = IDLE_SECONDS,
+    ):
+        self._runner = runner or get_continuation_runner()
+        self._idle_seconds = idle_seconds
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the worker in a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run_loop, name="continuation-worker", daemon=True
+        )
+        self._thread.start()
+        logger.info("⏯️ Starting continuation worker")
+
+    def stop(self) -> None:
+        """Stop the worker"""
+        self._running = False
+        continuation_wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("🛑 Continuation worker stopped")
+
+    def _run_loop(self) -> None:
+        while self._running:
+            timeout = self._idle_seconds
+            try:
+                self._runner.run_due()
+                next_due = self._runner.seconds_until_next()
+                if next_due is not None:
+                    timeout = min(timeout, next_due)
+            except Exception as e:
+                logger.error(f"Error running continuations: {e}")
+            continuation_wakeup.wait(timeout=timeout)
+            continuation_wakeup.clear()
+
+
+# Factory function for creating continuation worker
+def create_continuation_worker() -> ContinuationWorker:
+    """Factory function for creating continuation worker"""
+    return ContinuationWorker()
@@ -0,0 +1,149 @@
+# app/workers/job_worker.py
+"""
+Job Queue Worker following SOLID principles.
+Runs durable webhook jobs on a bounded thread pool.
+"""
+
+import os
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from app.core.interfaces import IWorker
+from app.database.job_queue import JobStore
+from app.services.jobs import (
+    JOB_LEASE_SECONDS,
+    JOB_RETENTION_SECONDS,
+    JOB_WORKERS,
+    execute_job,
+    get_job_store,
+    job_wakeup,
+)
+
+logger = logging.getLogger(__name__)
+
+# Teto de espera entre rodadas (jobs novos acordam antes)
+IDLE_SECONDS = 30
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class JobQueueWorker(IWorker):
+    """
+    Worker responsible for claiming due jobs and running them.
+    Claims only as many jobs as there are free pool threads and keeps the
+    leases of running jobs alive, so another process only takes over a job
+    whose consumer died.
+    """
+
+    def __init__(
+        self,
+        flask_app=None,
+        store: Optional[JobStore] = None,
+        max_workers: int = JOB_WORKERS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        idle_seconds: float = IDLE_SECONDS,
+    ):
+        self._flask_app = flask_app
+        self._store = store or get_job_store()
+        self._max_workers = max_workers
+        self._lease_seconds = lease_seconds
+        self._idle_seconds = idle_seconds
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker in a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="job"
+        )
+        self._thread = threading.Thread(
+            target=self._run_loop, name="job-queue-worker", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"📦 Starting job queue worker ({self._max_workers} threads)")
+
+    def stop(self) -> None:
+        """Stop claiming jobs; running ones finish or are reclaimed after the lease"""
+        self._running = False
+        job_wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        logger.info("🛑 Job queue worker stopped")
+
+    def _run_loop(self) -> None:
+        # Renova os leases bem antes de vencerem
+        renew_every = self._lease_seconds / 3
+        last_renew = last_purge = time.monotonic()
+        while self._running:
+            timeout = min(self._idle_seconds, renew_every)
+            try:
+                self._claim_and_submit()
+
+                now = time.monotonic()
+                if now - last_renew >= renew_every:
+                    self._store.extend_leases(
+                        self._in_flight_ids(), self._worker_id, self._lease_seconds
+                    )
+                    last_renew = now
+                if now - last_purge >= PURGE_INTERVAL_SECONDS:
+                    purged = self._store.purge_finished(JOB_RETENTION_SECONDS)
+                    if purged:
+                        logger.info(f"🧹 Purged {purged} finished jobs")
+                    last_purge = now
+
+                next_run_at = self._store.next_run_at()
+                if next_run_at is not None and self._free_slots():
+                    timeout = min(timeout, max(0.0, next_run_at - time.time()))
+            except Exception as e:
+                logger.error(f"Error in job queue worker: {e}")
+            job_wakeup.wait(timeout=timeout)
+            job_wakeup.clear()
+
+    def _claim_and_submit(self) -> None:
+        jobs = self._store.claim(
+            self._worker_id, self._free_slots(), self._lease_seconds
+        )
+        for job in jobs:
+            future = self._executor.submit(self._execute, job)
+            with self._lock:
+                self._in_flight[job["id"]] = future
+            future.add_done_callback(lambda _, job_id=job["id"]: self._on_done(job_id))
+
+    def _execute(self, job) -> None:
+        if self._flask_app is None:
+            execute_job(self._store, job, self._worker_id)
+            return
+        with self._flask_app.app_context():
+            execute_job(self._store, job, self._worker_id)
+
+    def _on_done(self, job_id: int) -> None:
+        with self._lock:
+            self._in_flight.pop(job_id, None)
+        # Uma thread livre: já pode pegar o próximo job
+        job_wakeup.set()
+
+    def _in_flight_ids(self):
+        with self._lock:
+            return list(self._in_flight)
+
+    def _free_slots(self) -> int:
+        with self._lock:
+            return self._max_workers - len(self._in_flight)
+
+
+# Factory function for creating job queue worker
+def create_job_queue_worker(flask_app=None) -> JobQueueWorker:
+    """Factory function for creating job queue worker"""
+    return JobQueueWorker(flask_app)
@@ -0,0 +1,75 @@
+# app/workers/open_ticket_worker.py
+"""
+Open Ticket Poller Worker following SOLID principles.
+Keeps the in-memory open-ticket snapshot refreshed in the background.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+from app.core.interfaces import IWorker
+from app.services.digisac.open_tickets import (
+    OPEN_TICKETS_REFRESH_SECONDS,
+    OpenTicketSnapshot,
+    get_open_ticket_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OpenTicketPollerWorker(IWorker):
+    """
+    Worker responsible for polling Digisac open tickets.
+    Failures keep the previous snapshot; once it is older than the maximum
+    age, lookups fall back to per-contact queries on their own.
+    """
+
+    def __init__(
+        self,
+        snapshot: Optional[OpenTicketSnapshot] = None,
+        interval_seconds: int = OPEN_TICKETS_REFRESH_SECONDS,
+    ):
+        self._snapshot = snapshot or get_open_ticket_snapshot()
+        self._interval_seconds = interval_seconds
+        self._running = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start polling in a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="open-ticket-poller", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"🎫 Starting open ticket poller (interval: {self._interval_seconds}s)"
+        )
+
+    def stop(self) -> None:
+        """Stop the poller"""
+        self._running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("🛑 Open ticket poller stopped")
+
+    def _run_loop(self) -> None:
+        while self._running:
+            try:
+                self._snapshot.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing open tickets snapshot: {e}")
+            self._stop_event.wait(timeout=self._interval_seconds)
+
+
+# Factory function for creating open ticket poller worker
+def create_open_ticket_poller_worker(
+    interval_seconds: int = OPEN_TICKETS_REFRESH_SECONDS,
+) -> OpenTicketPollerWorker:
+    """Factory function for creating open ticket poller worker"""
+    return OpenTicketPollerWorker(interval_seconds=interval_seconds)
@@ -0,0 +1,182 @@
+# app/workers/sync_scheduler_worker.py
+"""
+Sync Scheduler Worker following SOLID principles.
+Runs periodic delta syncs and targeted refreshes on lookup-miss spikes.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from app.core.interfaces import IWorker
+from app.database.contact_directory import (
+    CONTA_AZUL_PERSONS_ENTITY,
+    DIGISAC_CONTACTS_ENTITY,
+)
+from app.services.sync.freshness import (
+    LookupMissMonitor,
+    get_snapshot_ages,
+    lookup_miss_monitor,
+)
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL_SECONDS = int(os.getenv("SYNC_INTERVAL_SECONDS", "900"))
+SYNC_SLOW_INTERVAL_SECONDS = int(os.getenv("SYNC_SLOW_INTERVAL_SECONDS", "21600"))
+# Intervalo mínimo entre refreshes disparados por misses da mesma entidade
+SYNC_TARGETED_COOLDOWN_SECONDS = int(os.getenv("SYNC_TARGETED_COOLDOWN_SECONDS", "120"))
+
+
+def _default_jobs() -> Dict[str, Callable[[], object]]:
+    """Managers por entidade (import tardio: dependem dos serviços de auth)"""
+    from app.services.sync.conta_azul_sync_manager import (
+        PersonsSyncManager,
+        AccountsSyncManager,
+        ServicesSyncManager,
+    )
+    from app.services.sync.digisac_sync_manager import (
+        ContactsSyncManager,
+        DepartmentsSyncManager,
+        UsersSyncManager,
+    )
+
+    return {
+        CONTA_AZUL_PERSONS_ENTITY: PersonsSyncManager,
+        "CA::Contas": AccountsSyncManager,
+        "CA::Servicos": ServicesSyncManager,
+        DIGISAC_CONTACTS_ENTITY: ContactsSyncManager,
+        "DS::Departments": DepartmentsSyncManager,
+        "DS::Users": UsersSyncManager,
+    }
+
+
+class SyncSchedulerWorker(IWorker):
+    """
+    Worker responsible for keeping synced snapshots fresh.
+    Contacts and persons follow the short interval, the other entities the
+    slow one; a lookup-miss spike triggers an immediate delta for the entity.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int = SYNC_INTERVAL_SECONDS,
+        slow_interval_seconds: int = SYNC_SLOW_INTERVAL_SECONDS,
+        miss_monitor: LookupMissMonitor = lookup_miss_monitor,
+        jobs: Optional[Dict[str, Callable[[], object]]] = None,
+    ):
+        self._interval_seconds = interval_seconds
+        self._slow_interval_seconds = slow_interval_seconds
+        self._miss_monitor = miss_monitor
+        self._jobs = jobs
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._last_run: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the scheduler loop in a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run_loop, name="sync-scheduler", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"🔁 Starting sync scheduler (interval: {self._interval_seconds}s, "
+            f"slow: {self._slow_interval_seconds}s)"
+        )
+
+    def stop(self) -> None:
+        """Stop the scheduler loop"""
+        self._running = False
+        self._miss_monitor.spike_event.set()  # acorda o loop
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("🛑 Sync scheduler stopped")
+
+    def get_status(self) -> Dict[str, Dict[str, object]]:
+        """Snapshot age and time since the last scheduled run per entity"""
+        return {
+            entity: {
+                "age_seconds": age,
+                "last_run_seconds_ago": self._seconds_since_run(entity),
+            }
+            for entity, age in get_snapshot_ages().items()
+        }
+
+    def _seconds_since_run(self, entity: str) -> Optional[float]:
+        with self._lock:
+            last = self._last_run.get(entity)
+        return None if last is None else time.monotonic() - last
+
+    def _run_loop(self) -> None:
+        while self._running:
+            try:
+                for entity in self._miss_monitor.pop_spiking():
+                    since_run = self._seconds_since_run(entity)
+                    if since_run is not None and since_run < (
+                        SYNC_TARGETED_COOLDOWN_SECONDS
+                    ):
+                        continue
+                    logger.info(f"🔄 Targeted refresh for {entity} (lookup misses)")
+                    self._sync(entity)
+
+                for entity in self._due_entities():
+                    self._sync(entity)
+            except Exception as e:
+                logger.error(f"Error in sync scheduler: {e}")
+
+            # Dorme até o próximo ciclo curto ou até um pico de misses
+            self._miss_monitor.spike_event.wait(timeout=self._tick_seconds())
+
+    def _tick_seconds(self) -> float:
+        return max(1.0, min(60.0, self._interval_seconds / 4))
+
+    def _due_entities(self):
+        fast = (CONTA_AZUL_PERSONS_ENTITY, DIGISAC_CONTACTS_ENTITY)
+        ages = get_snapshot_ages()
+        for entity in self._get_jobs():
+            interval = (
+                self._interval_seconds
+                if entity in fast
+                else self._slow_interval_seconds
+            )
+            age = ages.get(entity)
+            since_run = self._seconds_since_run(entity)
+            # Respeita syncs feitos pelo CLI (idade do estado) e falhas recentes
+            if (age is None or age >= interval) and (
+                since_run is None or since_run >= interval
+            ):
+                yield entity
+
+    def _sync(self, entity: str) -> None:
+        if not self._running:
+            return
+        with self._lock:
+            self._last_run[entity] = time.monotonic()
+        started = time.monotonic()
+        try:
+            manager = self._get_jobs()[entity]()
+            count = manager.run_sync(delta=True)
+            logger.info(
+                f"✅ {entity}: {count} records synced in "
+                f"{time.monotonic() - started:.1f}s"
+            )
+        except Exception as e:
+            logger.error(f"❌ Scheduled sync failed for {entity}: {e}")
+
+    def _get_jobs(self) -> Dict[str, Callable[[], object]]:
+        if self._jobs is None:
+            self._jobs = _default_jobs()
+        return self._jobs
+
+
+# Factory function for creating sync scheduler worker
+def create_sync_scheduler_worker(
+    interval_seconds: int = SYNC_INTERVAL_SECONDS,
+) -> SyncSchedulerWorker:
+    """Factory function for creating sync scheduler worker"""
+    return SyncSchedulerWorker(interval_seconds)
@@ -4,13 +4,13 @@ Ticket Flow Worker following SOLID principles.
 Implements Single Responsibility and Dependency Inversion.
 """
 
-import time
 import json
 import logging
-from typing import Protocol, Dict, Any, Callable
+from typing import Protocol, Dict, Any, Callable, Optional
 from abc import ABC, abstractmethod
 
 from app.core.interfaces import IWorker, ILogger
+from app.services.digisac.open_tickets import ticket_flow_wakeup
 from app.utils.utils import debug
 
 
@@ -42,6 +42,8 @@ class TicketFlowWorker(IWorker):
     """
     Worker responsible for processing ticket flow queue.
     Follows Single Responsibility Principle.
+    Rows whose contact still has an open ticket elsewhere stay waiting;
+    `open_ticket_check` answers from the in-memory open-ticket snapshot.
     """
 
     def __init__(
@@ -50,11 +52,13 @@ class TicketFlowWorker(IWorker):
         route_registry: Dict[str, IRouteHandler],
         logger: ILogger,
         interval_seconds: int = 60,
+        open_ticket_check: Optional[Callable[[str], bool]] = None,
     ):
         self._queue_service = queue_service
         self._route_registry = route_registry
         self._logger = logger
         self._interval_seconds = interval_seconds
+        self._open_ticket_check = open_ticket_check
         self._running = False
 
     @debug
@@ -71,11 +75,14 @@ class TicketFlowWorker(IWorker):
             except Exception as e:
                 self._logger.error(f"Error in ticket flow worker: {e}")
 
-            time.sleep(self._interval_seconds)
+            # Dorme até o próximo ciclo ou até o webhook avisar que um ticket fechou
+            ticket_flow_wakeup.wait(timeout=self._interval_seconds)
+            ticket_flow_wakeup.clear()
 
     def stop(self) -> None:
         """Stop the ticket flow worker"""
         self._running = False
+        ticket_flow_wakeup.set()
         self._logger.info("🛑 Ticket flow worker stopped")
 
     @debug
@@ -84,6 +91,8 @@ class TicketFlowWorker(IWorker):
         waiting_tickets = self._queue_service.get_waiting_tickets()
 
         for ticket in waiting_tickets:
+            if self._still_blocked(ticket):
+                continue
             try:
                 self._process_ticket(ticket)
             except Exception as e:
@@ -92,6 +101,20 @@ class TicketFlowWorker(IWorker):
                 if queue_id:
                     self._queue_service.update_retry_count(queue_id)
 
+    def _still_blocked(self, ticket: Dict[str, Any]) -> bool:
+        """True if the contact still has an open ticket in another department"""
+        contact_number = ticket.get("contact_number")
+        if not self._open_ticket_check or not contact_number:
+            return False
+        try:
+            blocked = self._open_ticket_check(contact_number)
+        except Exception as e:
+            self._logger.error(f"Error checking open ticket for {contact_number}: {e}")
+            return True
+        if blocked:
+            self._logger.debug(f"Ticket {ticket.get('id')} still waiting: open ticket")
+        return blocked
+
     @debug
     def _process_ticket(self, ticket: Dict[str, Any]) -> None:
         """Process a single ticket"""
@@ -150,14 +173,20 @@ def create_ticket_flow_worker(
     route_registry: Dict[str, IRouteHandler],
     logger: ILogger,
     interval_seconds: int = 30,
+    open_ticket_check: Optional[Callable[[str], bool]] = None,
 ) -> TicketFlowWorker:
     """Factory function for creating ticket flow worker"""
-    return TicketFlowWorker(queue_service, route_registry, logger, interval_seconds)
+    return TicketFlowWorker(
+        queue_service, route_registry, logger, interval_seconds, open_ticket_check
+    )
 
 
 def create_ticket_flow_worker_with_defaults(logger: ILogger) -> TicketFlowWorker:
     """Factory function with default dependencies"""
     from app.database.database import Database
+    from app.services.digisac.digisac_services import (
+        has_open_ticket_for_user_in_cert_dept,
+    )
 
     class DefaultQueueService:
         def get_waiting_tickets(self) -> list:
@@ -176,6 +205,7 @@ def create_ticket_flow_worker_with_defaults(logger: ILogger) -> TicketFlowWorker
         queue_service=DefaultQueueService(),
         route_registry={},  # Empty registry for now
         logger=logger,
+        open_ticket_check=has_open_ticket_for_user_in_cert_dept,
     )
 
 
@@ -1,95 +1,275 @@
 # app/workers/token_refresh_worker.py
 """
 Token Refresh Worker following SOLID principles.
-Implements Single Responsibility and Dependency Inversion.
+Refreshes the Digisac and Conta Azul tokens ahead of expiry, one wake-up
+timer per token, so request threads never wait on a refresh.
 """
 
+import os
 import time
+import random
 import logging
-from typing import Protocol
-from abc import ABC, abstractmethod
+import threading
+from typing import Any, Callable, Dict, List, Optional, Protocol
 
-from app.core.interfaces import ILogger
-from app.workers.session_worker import IScheduledWorker
-from app.core.interfaces import ITokenManager
-from app.utils.utils import debug
+from app.core.interfaces import IWorker
+from app.services.token_store import TokenStore
+
+logger = logging.getLogger(__name__)
+
+# Antecedência (mais jitter aleatório) com que o token é renovado
+TOKEN_REFRESH_LEAD_SECONDS = int(os.getenv("TOKEN_REFRESH_LEAD_SECONDS", "600"))
+TOKEN_REFRESH_JITTER_SECONDS = int(os.getenv("TOKEN_REFRESH_JITTER_SECONDS", "120"))
+TOKEN_REFRESH_RETRY_SECONDS = int(os.getenv("TOKEN_REFRESH_RETRY_SECONDS", "30"))
+TOKEN_REFRESH_RETRY_MAX_SECONDS = int(
+    os.getenv("TOKEN_REFRESH_RETRY_MAX_SECONDS", "300")
+)
+# Reavaliação de tokens sem expires_at conhecido (ou ainda inexistentes)
+TOKEN_REFRESH_IDLE_SECONDS = int(os.getenv("TOKEN_REFRESH_IDLE_SECONDS", "600"))
 
 
 class ITokenRefreshService(Protocol):
     """Interface for token refresh operations"""
 
+    name: str
+
     def refresh_tokens_safely(self) -> bool:
         """Refresh tokens safely"""
         ...
 
-    def get_token_expiry_time(self) -> int:
-        """Get time until token expires in seconds"""
+    def get_token_expiry_time(self) -> Optional[float]:
+        """Get time until token expires in seconds (None if unknown)"""
+        ...
+
+    def set_background_refresh(self, enabled: bool) -> None:
+        """Tell the request path that early refreshes happen in background"""
         ...
 
 
+class TokenStoreRefreshService:
+    """ITokenRefreshService for a TokenStore and its provider refresh call"""
+
+    def __init__(
+        self,
+        name: str,
+        store: TokenStore,
+        refresh: Callable[[Dict[str, Any]], Dict[str, Any]],
+    ):
+        self.name = name
+        self.store = store
+        self.refresh = refresh
+
+    def refresh_tokens_safely(self) -> bool:
+        try:
+            refreshed = self.store.try_refresh(self.refresh)
+        except Exception as e:
+            logger.error(f"❌ {self.name} token refresh failed: {e}")
+            return False
+        if not refreshed:
+            logger.debug(f"{self.name} token refresh already in progress")
+        return refreshed
+
+    def get_token_expiry_time(self) -> Optional[float]:
+        tokens = self.store.get()
+        if not tokens.get("access_token"):
+            return None
+        return self.store.seconds_to_expiry(tokens)
+
+    def set_background_refresh(self, enabled: bool) -> None:
+        self.store.background_refresh = enabled
+
+
+def _default_services() -> List[ITokenRefreshService]:
+    """Digisac and Conta Azul (import tardio: dependem da configuração)"""
+    from app.services.digisac.digisac_services import (
+        _fetch_digisac_tokens,
+        digisac_token_store,
+    )
+    from app.services.conta_azul.conta_azul_services import (
+        _renew_conta_azul_tokens,
+        conta_azul_token_store,
+    )
+
+    return [
+        TokenStoreRefreshService("digisac", digisac_token_store, _fetch_digisac_tokens),
+        TokenStoreRefreshService(
+            "conta_azul", conta_azul_token_store, _renew_conta_azul_tokens
+        ),
+    ]
+
+
 class TokenRefreshWorker(IWorker):
     """
     Worker responsible for automatic token refresh.
-    Follows Single Responsibility Principle.
+    Each token gets its own wake-up time (expiry minus a jittered lead);
+    failures are retried with exponential backoff until the token expires,
+    and only then do request threads fall back to refreshing themselves.
     """
 
     def __init__(
         self,
-        token_service: ITokenRefreshService,
-        logger: ILogger,
-        interval_seconds: int = 600,
+        token_services: Optional[List[ITokenRefreshService]] = None,
+        lead_seconds: int = TOKEN_REFRESH_LEAD_SECONDS,
+        jitter_seconds: int = TOKEN_REFRESH_JITTER_SECONDS,
+        retry_seconds: int = TOKEN_REFRESH_RETRY_SECONDS,
+        retry_max_seconds: int = TOKEN_REFRESH_RETRY_MAX_SECONDS,
+        idle_seconds: int = TOKEN_REFRESH_IDLE_SECONDS,
     ):
-        self._token_service = token_service
-        self._logger = logger
-        self._interval_seconds = interval_seconds
+        self._token_services = token_services
+        self._lead_seconds = lead_seconds
+        self._jitter_seconds = jitter_seconds
+        self._retry_seconds = retry_seconds
+        self._retry_max_seconds = retry_max_seconds
+        self._idle_seconds = idle_seconds
         self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._due: Dict[str, float] = {}
+        self._leads: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+        self._last_refresh: Dict[str, float] = {}
 
-    @debug
     def start(self) -> None:
-        """Start the token refresh worker"""
+        """Start the refresh scheduler in a background thread"""
+        if self._running:
+            return
         self._running = True
-        self._logger.info(
-            f"🔑 Starting token refresh worker (interval: {self._interval_seconds}s)"
+        services = self._get_services()
+        now = time.monotonic()
+        with self._lock:
+            for service in services:
+                service.set_background_refresh(True)
+                self._leads[service.name] = self._draw_lead()
+                self._due[service.name] = now
+        self._thread = threading.Thread(
+            target=self._run_loop, name="token-refresh", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"🔑 Starting token refresh worker ({len(services)} tokens, "
+            f"lead: {self._lead_seconds}s + {self._jitter_seconds}s jitter)"
         )
-
-        while self._running:
-            try:
-                self._refresh_tokens()
-            except Exception as e:
-                self._logger.error(f"Error in token refresh worker: {e}")
-
-            time.sleep(self._interval_seconds)
 
     def stop(self) -> None:
         """Stop the token refresh worker"""
         self._running = False
-        self._logger.info("🛑 Token refresh worker stopped")
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        # Sem o worker, o caminho da requisição volta a renovar antes do fim
+        for service in self._get_services():
+            service.set_background_refresh(False)
+        logger.info("🛑 Token refresh worker stopped")
 
-    @debug
-    def _refresh_tokens(self) -> None:
-        """Refresh tokens if needed"""
-        try:
-            expiry_time = self._token_service.get_token_expiry_time()
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """Seconds to expiry, next wake-up and failure count per token"""
+        now = time.monotonic()
+        status = {}
+        for service in self._get_services():
+            with self._lock:
+                due = self._due.get(service.name)
+                last = self._last_refresh.get(service.name)
+                failures = self._failures.get(service.name, 0)
+            expiry = service.get_token_expiry_time()
+            status[service.name] = {
+                "expires_in_seconds": None if expiry is None else round(expiry),
+                "next_check_in_seconds": (
+                    None if due is None else round(max(0.0, due - now))
+                ),
+                "last_refresh_seconds_ago": (
+                    None if last is None else round(now - last)
+                ),
+                "consecutive_failures": failures,
+            }
+        return status
 
-            # Refresh if token expires in less than 10 minutes
-            if expiry_time < 600:
-                self._logger.info(f"🔄 Token expires in {expiry_time}s, refreshing...")
-                success = self._token_service.refresh_tokens_safely()
+    def _run_loop(self) -> None:
+        while self._running:
+            for service in self._get_services():
+                if not self._running:
+                    return
+                with self._lock:
+                    due = self._due.get(service.name, 0.0)
+                if due <= time.monotonic():
+                    try:
+                        self._check(service)
+                    except Exception as e:
+                        logger.error(f"Error in token refresh worker: {e}")
+                        self._schedule(service.name, self._retry_seconds)
 
-                if success:
-                    self._logger.info("✅ Token refreshed successfully")
-                else:
-                    self._logger.warning("⚠️ Token refresh failed")
-            else:
-                self._logger.debug(f"🔑 Token valid for {expiry_time}s")
+            with self._lock:
+                next_due = min(self._due.values(), default=None)
+            timeout = (
+                self._idle_seconds
+                if next_due is None
+                else max(0.0, next_due - time.monotonic())
+            )
+            self._wake.wait(timeout=timeout)
+            self._wake.clear()
 
-        except Exception as e:
-            self._logger.error(f"❌ Error during token refresh: {e}")
+    def _check(self, service: ITokenRefreshService) -> None:
+        """Refresh the token if it is inside its lead window, then reschedule"""
+        name = service.name
+        remaining = service.get_token_expiry_time()
+        if remaining is None:
+            self._schedule(name, self._idle_seconds)
+            return
+
+        with self._lock:
+            lead = self._leads[name]
+        if remaining > lead:
+            # Renovado por outra thread/processo ou ainda longe do vencimento
+            self._schedule(name, remaining - lead)
+            return
+
+        logger.info(f"🔄 {name} token expires in {remaining:.0f}s, refreshing...")
+        if service.refresh_tokens_safely():
+            remaining = service.get_token_expiry_time()
+            lead = self._draw_lead(remaining)
+            with self._lock:
+                self._leads[name] = lead
+                self._failures[name] = 0
+                self._last_refresh[name] = time.monotonic()
+            logger.info(f"✅ {name} token refreshed")
+            self._schedule(
+                name,
+                self._idle_seconds if remaining is None else remaining - lead,
+            )
+            return
+
+        with self._lock:
+            failures = self._failures.get(name, 0) + 1
+            self._failures[name] = failures
+        backoff = min(
+            self._retry_max_seconds, self._retry_seconds * 2 ** (failures - 1)
+        )
+        logger.warning(
+            f"⚠️ {name} token refresh failed ({failures}x), retrying in {backoff}s"
+        )
+        self._schedule(name, backoff)
+
+    def _draw_lead(self, lifetime: Optional[float] = None) -> float:
+        lead = self._lead_seconds + random.uniform(0, self._jitter_seconds)
+        if lifetime and lifetime > 0:
+            # Tokens de vida curta: renova na metade da validade
+            lead = min(lead, lifetime / 2)
+        return lead
+
+    def _schedule(self, name: str, delay: float) -> None:
+        with self._lock:
+            self._due[name] = time.monotonic() + max(0.0, delay)
+
+    def _get_services(self) -> List[ITokenRefreshService]:
+        if self._token_services is None:
+            self._token_services = _default_services()
+        return self._token_services
 
 
 # Factory function for creating token refresh worker
 def create_token_refresh_worker(
-    token_service: ITokenRefreshService, logger: ILogger, interval_seconds: int = 600
+    token_services: Optional[List[ITokenRefreshService]] = None,
+    lead_seconds: int = TOKEN_REFRESH_LEAD_SECONDS,
 ) -> TokenRefreshWorker:
     """Factory function for creating token refresh worker"""
-    return TokenRefreshWorker(token_service, logger, interval_seconds)
+    return TokenRefreshWorker(token_services, lead_seconds)
@@ -17,6 +17,10 @@ from app.services.tunnel_service import TunnelService
 from app.workers.ticket_flow_worker import TicketFlowWorker
 from app.workers.session_worker import SessionWorker
 from app.workers.token_refresh_worker import TokenRefreshWorker
+from app.workers.sync_scheduler_worker import SyncSchedulerWorker
+from app.workers.open_ticket_worker import OpenTicketPollerWorker
+from app.workers.continuation_worker import ContinuationWorker
+from app.workers.job_worker import JobQueueWorker
 from app.database.database import init_db
 from app import create_app
 
@@ -95,7 +99,11 @@ class ApplicationBootstrapper:
         workers = [
             TicketFlowWorker(flask_app),
             SessionWorker(flask_app),
-            TokenRefreshWorker(flask_app),
+            TokenRefreshWorker(),
+            SyncSchedulerWorker(),
+            OpenTicketPollerWorker(),
+            ContinuationWorker(),
+            JobQueueWorker(flask_app),
         ]
 
         for worker in workers: